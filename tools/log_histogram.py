@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright(c) 2025 Intel Corporation. All rights reserved.
+
+'''Mergeable fixed log-bucket histogram for latency and load statistics.
+
+The bucket layout is fixed by (lowest, highest, buckets_per_octave), so two
+histograms with the same layout can be merged by adding their counts. This
+makes the histogram usable when samples are streamed or are collected by
+several processes, without keeping every sample. Quantiles are estimated
+with a relative error of about 2**(1 / buckets_per_octave / 2) - 1, which is
+about 1.1% with the default 32 buckets per octave.
+'''
+
+import math
+
+import numpy as np
+
+# pylint: disable=R0902
+class LogHistogram:
+    '''Histogram with logarithmically sized buckets.
+
+    Bucket 0 counts values below `lowest` (including zero and negative values),
+    bucket i >= 1 counts values in [lowest * 2**((i-1)/bpo), lowest * 2**(i/bpo)),
+    and the last bucket also counts every value above `highest`.
+    '''
+    def __init__(self, lowest: float = 1e-3, highest: float = 1e7,
+                 buckets_per_octave: int = 32):
+        self.lowest = lowest
+        self.highest = highest
+        self.buckets_per_octave = buckets_per_octave
+        self.counts = np.zeros(math.ceil(math.log2(highest / lowest) * buckets_per_octave) + 2,
+                               dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def __len__(self) -> int:
+        return self.count
+
+    def layout(self) -> tuple:
+        '''Bucket layout, histograms are mergeable only with identical layouts'''
+        return (self.lowest, self.highest, self.buckets_per_octave)
+
+    def bucket_index(self, value: float) -> int:
+        '''Index of the bucket counting value'''
+        if value < self.lowest:
+            return 0
+        index = int(math.log2(value / self.lowest) * self.buckets_per_octave) + 1
+        return min(index, len(self.counts) - 1)
+
+    def bucket_bounds(self, index: int) -> tuple[float, float]:
+        '''Lower and upper bound of the bucket at index'''
+        if index == 0:
+            return (0.0, self.lowest)
+        return (self.lowest * 2 ** ((index - 1) / self.buckets_per_octave),
+                self.lowest * 2 ** (index / self.buckets_per_octave))
+
+    def add(self, value: float):
+        '''Add a single sample'''
+        self.counts[self.bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def add_many(self, values):
+        '''Add an array of samples at once'''
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return
+        with np.errstate(divide='ignore', invalid='ignore'):
+            index = np.floor(np.log2(values / self.lowest) * self.buckets_per_octave) + 1
+        index = np.where(values < self.lowest, 0, np.clip(index, 0, len(self.counts) - 1))
+        self.counts += np.bincount(index.astype(np.int64), minlength=len(self.counts))
+        self.count += values.size
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other: 'LogHistogram') -> 'LogHistogram':
+        '''Add the samples of other histogram to this one'''
+        if self.layout() != other.layout():
+            raise ValueError(f'Cannot merge histograms with layout {self.layout()} '
+                             f'and {other.layout()}')
+        self.counts += other.counts
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def mean(self) -> float:
+        '''Exact mean of the samples'''
+        return self.total / self.count if self.count else math.nan
+
+    def quantile(self, q: float) -> float:
+        '''Estimate the q quantile (0 <= q <= 1), the geometric center of the
+        bucket holding the quantile is returned, clamped to the exact min/max'''
+        if self.count == 0:
+            return math.nan
+        rank = max(1, math.ceil(q * self.count))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        low, high = self.bucket_bounds(index)
+        estimate = math.sqrt(low * high) if index > 0 else low
+        return min(max(estimate, self.min), self.max)
+
+    def buckets(self, merge: int = 1) -> list[tuple[float, float, int]]:
+        '''Non-empty buckets as (lower bound, upper bound, count), every `merge`
+        neighbouring fine buckets are merged into one for a coarser display'''
+        result = []
+        for start in range(0, len(self.counts), merge):
+            count = int(self.counts[start:start + merge].sum())
+            if count:
+                end = min(start + merge, len(self.counts)) - 1
+                result.append((self.bucket_bounds(start)[0], self.bucket_bounds(end)[1], count))
+        return result
+
+    def to_dict(self) -> dict:
+        '''Serializable form of the histogram, for JSON output'''
+        return {
+            'lowest': self.lowest,
+            'highest': self.highest,
+            'buckets_per_octave': self.buckets_per_octave,
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'counts': {str(i): int(c) for i, c in enumerate(self.counts) if c},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LogHistogram':
+        '''Re-create the histogram from the to_dict() form'''
+        hist = cls(data['lowest'], data['highest'], data['buckets_per_octave'])
+        for index, count in data['counts'].items():
+            hist.counts[int(index)] = count
+        hist.count = data['count']
+        hist.total = data['sum']
+        if hist.count:
+            hist.min = data['min']
+            hist.max = data['max']
+        return hist
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright(c) 2025 Intel Corporation. All rights reserved.
+
+'''Throughput benchmark suite for sof_perf_analyzer.py and sof-ipc-timer.py.
+
+Generates a synthetic firmware trace and a kernel log with the matching
+firmware IPC timing log with sof_trace_gen, then runs every analyzer stage
+on them and reports wall time, lines/s and peak RSS of each stage:
+    perf.tokenize-old  trace tokenizer of sof_perf_analyzer before TRACE_LINE_RE
+    perf.tokenize      sof_perf_analyzer trace tokenizer only, as process_trace_file()
+    perf.collect       tokenize and collect the trace, as process_trace_file()
+    perf.analyze       statistics of the collected trace
+    ipc.parse          sof-ipc-timer kernel log parsing
+    ipc.parse+fwlog    sof-ipc-timer kernel log parsing with firmware log lookup
+    ipc.summary        sof-ipc-timer summary output
+    ipc.ts-strptime    IPC line time stamps decoded with datetime.strptime()
+    ipc.ts-decode      IPC line time stamps decoded with sof-ipc-timer JournalTimestamp
+
+Peak RSS is the high-water mark of the process during the stage, it is
+reset before every stage through /proc/self/clear_refs on Linux. Memory of
+--jobs worker processes is not included.
+
+Example:
+    sof-analyzer-bench.py --lines 1000000 --cycles 2000 --json results.json
+'''
+
+import io
+import re
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import resource
+import contextlib
+from pathlib import Path
+from datetime import datetime, timedelta
+
+import sof_perf_analyzer
+import sof_timeline
+import sof_trace_gen
+
+def reset_peak_rss() -> bool:
+    '''Reset the peak RSS of this process, return False if not supported'''
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='utf8') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mib() -> float:
+    '''Peak RSS of this process in MiB'''
+    try:
+        with open('/proc/self/status', encoding='utf8') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_stage(name: str, lines: int, func) -> dict:
+    '''Run a benchmark stage with its stdout discarded, and return its results'''
+    reset_peak_rss()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+    wall = time.perf_counter() - start
+    result = {'stage': name, 'lines': lines, 'wall_s': wall, 'lines_per_s': lines / wall,
+              'peak_rss_mib': peak_rss_mib()}
+    print(f'{name:<16} {lines:>10} lines {wall:>9.3f} s {lines / wall:>12.0f} lines/s '
+          f'{result["peak_rss_mib"]:>9.1f} MiB', flush=True)
+    return result
+
+def bench_perf_analyzer(trace: Path, lines: int, jobs: int) -> list[dict]:
+    '''Run the sof_perf_analyzer stages on the generated trace'''
+    def tokenize_old():
+        # the trace tokenizer of sof_perf_analyzer before TRACE_LINE_RE
+        with open(trace, 'r', encoding='utf8', errors='ignore') as f:
+            for line in f:
+                if match_obj := re.search(r'\[.+\] <(dbg|inf|wrn|err)>', line):
+                    try:
+                        span_end_pos = match_obj.span()[1]
+                        trace_lvl = line[span_end_pos - 4: span_end_pos - 1]
+                        try:
+                            timestamp = float(line[span_end_pos - 19: span_end_pos - 7].strip())
+                        except ValueError:
+                            h, m, rest = line[span_end_pos - 23: span_end_pos - 7].strip() \
+                                .split(':')
+                            s1, s2 = rest.split(',')
+                            timestamp = timedelta(hours=int(h), minutes=int(m),
+                                                  seconds=float(s1 + s2)).total_seconds()
+                        rest = line[span_end_pos + 1:].split(': ')
+                        ctx, func = rest[0:2]
+                        msg = ': '.join(rest[2:]).strip()
+                        _ = sof_perf_analyzer.TraceItem(timestamp, trace_lvl, ctx, func, msg)
+                    except Exception as e: # pylint: disable=W0718
+                        print(f"WARNING: Couldn't parse line: {line}, error: {e}")
+
+    def tokenize():
+        with open(trace, 'r', encoding='utf8', errors='ignore') as f:
+            for _ in sof_perf_analyzer.make_trace_item(f, dispatched_only=True):
+                pass
+
+    sof_perf_analyzer.args = argparse.Namespace(filename=trace, skip_to_first_trace=False,
+                                                 jobs=jobs)
+    results = [run_stage('perf.tokenize-old', lines, tokenize_old),
+               run_stage('perf.tokenize', lines, tokenize)]
+    print(f'tokenizer speedup {results[0]["wall_s"] / results[1]["wall_s"]:.1f}x, '
+          f'{results[0]["wall_s"] / lines * 1e9:.0f} -> '
+          f'{results[1]["wall_s"] / lines * 1e9:.0f} ns per line')
+    results += [run_stage('perf.collect', lines, sof_perf_analyzer.process_trace_file),
+                run_stage('perf.analyze', lines, sof_perf_analyzer.analyze_perf_info)]
+    return results
+
+def bench_ipc_timer(klog: Path, fw_log: Path, lines: int) -> list[dict]:
+    '''Run the sof-ipc-timer stages on the generated kernel and firmware logs'''
+    ipc_timer = sof_timeline.load_ipc_timer()
+    args = argparse.Namespace(case_start=None, case_end=None, trigger_nessages=False,
+                              pipeline_msgs=False, init_messages=False, config_messages=False,
+                              binding_messages=False, reply_timings=False, summary=True,
+                              fw_only=False)
+
+    def parse(fw_log_file=None):
+        parser = ipc_timer.SOFLinuxLogParser(args, fw_log_file)
+        with open(klog, 'r', encoding='utf8') as f:
+            parser.read_log_data(f)
+        return parser
+
+    def parse_with_fw_log():
+        with open(fw_log, 'rb') as fw_log_file:
+            parse(fw_log_file)
+
+    with open(klog, 'r', encoding='utf8') as f:
+        ipc_lines = [line for line in f if ' ipc tx ' in line]
+
+    def strptime_timestamps():
+        # the time stamp parsing of sof-ipc-timer before JournalTimestamp
+        for line in ipc_lines:
+            dt_object = datetime.strptime(line.split()[2], "%H:%M:%S.%f")
+            _ = (dt_object.second + dt_object.minute * 60 + dt_object.hour * 3600) * 1000000 \
+                + dt_object.microsecond
+
+    def decode_timestamps():
+        timestamp = ipc_timer.JournalTimestamp()
+        for line in ipc_lines:
+            timestamp.decode(line)
+
+    results = [run_stage('ipc.parse', lines, parse),
+               run_stage('ipc.parse+fwlog', lines, parse_with_fw_log)]
+    parser = parse()
+    results.append(run_stage('ipc.summary', lines, parser.summary))
+    results.append(run_stage('ipc.ts-strptime', len(ipc_lines), strptime_timestamps))
+    results.append(run_stage('ipc.ts-decode', len(ipc_lines), decode_timestamps))
+    print(f'time stamp decoding speedup {results[-2]["wall_s"] / results[-1]["wall_s"]:.1f}x, '
+          f'{results[-2]["wall_s"] / len(ipc_lines) * 1e9:.0f} -> '
+          f'{results[-1]["wall_s"] / len(ipc_lines) * 1e9:.0f} ns per line')
+    return results
+
+def parse_args():
+    '''Parse command line arguments'''
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                     description=__doc__)
+    parser.add_argument('-n', '--lines', type=int, default=1000000,
+                        help='Number of perf trace lines to generate')
+    parser.add_argument('-t', '--time-format', choices=['float', 'hms'], default='float',
+                        help='Timestamp format of the generated trace')
+    parser.add_argument('-c', '--cycles', type=int, default=1000,
+                        help='Number of IPC test cycles in the generated kernel log')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of sof_perf_analyzer parsing jobs')
+    parser.add_argument('--corrupt-ratio', type=float, default=0.01,
+                        help='Ratio of corrupt lines in the generated trace')
+    parser.add_argument('--other-ratio', type=float, default=0.0,
+                        help='Ratio of traces without a sof_perf_analyzer handler\n'
+                        'in the generated trace')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the log generator')
+    parser.add_argument('--only', choices=['perf', 'ipc'], required=False,
+                        help='Only benchmark one of the analyzers')
+    parser.add_argument('--keep', type=Path, required=False,
+                        help='Write the generated logs to this directory and keep them')
+    parser.add_argument('--json', type=Path, required=False,
+                        help='Write the results with the benchmark parameters to json file')
+    return parser.parse_args()
+
+def main():
+    '''The main entry'''
+    args = parse_args()
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        logdir = args.keep if args.keep is not None else Path(tmpdir)
+        logdir.mkdir(parents=True, exist_ok=True)
+        if args.only != 'ipc':
+            trace = logdir / 'mtrace.txt'
+            counts = sof_trace_gen.write_mtrace(trace, args.lines, args.time_format,
+                                                corrupt_ratio=args.corrupt_ratio,
+                                                seed=args.seed, other_ratio=args.other_ratio)
+            results += bench_perf_analyzer(trace, counts['lines'], args.jobs)
+            collected = len(sof_perf_analyzer.perf_info)
+            assert collected == counts['perf'], \
+                f'collected {collected} of {counts["perf"]} perf traces'
+        if args.only != 'perf':
+            klog, fw_log = logdir / 'dmesg.txt', logdir / 'fw-ipc.txt'
+            counts = sof_trace_gen.write_journal(klog, args.cycles, fw_log, seed=args.seed)
+            results += bench_ipc_timer(klog, fw_log, counts['lines'])
+
+    if args.json is not None:
+        with open(args.json, 'w', encoding='utf8') as f:
+            json.dump({'params': {key: str(value) for key, value in vars(args).items()},
+                       'python': sys.version, 'platform': platform.platform(),
+                       'results': results}, f, indent=2)
+            f.write('\n')
+
+if __name__ == "__main__":
+    main()
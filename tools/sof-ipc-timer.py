@@ -8,8 +8,9 @@
 # pylint: disable=too-many-public-methods, consider-using-dict-items, consider-using-with
 
 '''The sof-ipc-timer collects module initialization and configuration
-timings from 'journalctl -k -o short-precise' output if SOF IPC debug
-is enabled.
+timings from 'journalctl -k -o short-precise' or 'journalctl -k -o
+short-monotonic' output if SOF IPC debug is enabled. Tests may run over
+midnight with short-precise output, the day rollover is detected.
 
 Without any flags there is no output. If you want it all, just put
 everything on the command line: -t -i -c -b -p -s
@@ -17,6 +18,15 @@ everything on the command line: -t -i -c -b -p -s
 Add firmware log from the same test sequence to get more accurate
 processing times: -f <fw log file>
 
+With --journal the kernel log is read straight from the systemd journal
+of the current boot, with --cursor-file only the entries after the
+previous run. Add --follow to keep reading the journal while a stress
+test is running and print the summary every --interval seconds.
+
+With --baseline the timings are compared by entity name with the --json
+output of a previous run, and the exit status is 1 if any of them got
+significantly slower, for example to block a FW change in CI.
+
 Note! Thw FW log file should be generated with FW built with
 CONFIG_DEBUG_IPC_TIMINGS Kconfig option.
 
@@ -29,29 +39,136 @@ For example: -C "0x11000007|0x200000" -E "0x12010000|0x0"
 
 '''
 
+import io
 import re
+import csv
+import array
 import sys
+import glob
+import json
+import math
+import time
+import bisect
+import pathlib
 import argparse
-from datetime import datetime
+import functools
+import contextlib
+import statistics
+import concurrent.futures
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from log_histogram import LogHistogram
+
+# IPC header of form '0x40000004|0x15' in the FW log
+FW_LOG_HEADER_RE = re.compile(r'0x[0-9a-fA-F]+\|0x[0-9a-fA-F]+')
+# FW log timestamp of form '[    4.612041]'
+FW_LOG_TIMESTAMP_RE = re.compile(r'\[\s*(\d+\.\d+)\]')
+# The FW log line of an IPC message must be within this many microseconds
+# from the kernel log timing, once the offset of the clocks is known. It must be
+# shorter than the interval of repeated messages with the same header
+FW_LOG_MATCH_TOLERANCE = 5000
+# The SOF kernel function tags of the lines parsed, of form
+# 'snd_sof:sof_ipc4_log_header:', see SOFLinuxLogParser.parse_line()
+KERNEL_TAG_RE = re.compile(r':(sof_ipc4_widget_setup|sof_ipc4_log_header|hda_dai_trigger|'
+                           r'sof_ipc4_trigger_pipelines|sof_ipc4_set_multi_pipeline_state):')
+# The messages of the lines parsed, for kernel logs without the function tags
+# (plain 'dyndbg=+p'). The name of the matching group is the function tag.
+KERNEL_MSG_RE = re.compile(r': (?:(?P<sof_ipc4_widget_setup>Create (?:pipeline|widget) )|'
+                           r'(?P<sof_ipc4_log_header>ipc tx )|'
+                           r'(?P<hda_dai_trigger>cmd=\d+ dai )|'
+                           r'(?P<sof_ipc4_set_multi_pipeline_state>Set pipelines ))|'
+                           r'(?P<sof_ipc4_trigger_pipelines>, dir \d+: cmd: )')
+# Fixed substrings of the lines of KERNEL_TAG_RE, the module name before the
+# tag, and of KERNEL_MSG_RE, the SOF device name, e.g. 'sof-audio-pci-intel-tgl
+# 0000:00:1f.3:'. The searches only run for the lines containing them.
+KERNEL_TAG_SENTINEL = 'snd_sof'
+KERNEL_MSG_SENTINEL = 'sof'
+# The IPC message header line type, see IpcMsgParser.parse_ipc_headers_line()
+IPC_HEADER_RE = re.compile(r" ipc tx (     |reply|done )")
+# Percentiles of the timings in --json and --csv output
+TIMING_PERCENTILES = [50, 95, 99]
+# Number of fine histogram buckets merged into one bucket in --csv output
+HIST_CSV_MERGE = 8
+# A run of batch mode is an outlier for a message when its mean timing is this
+# many (normal scaled) median absolute deviations above the median of the runs
+BATCH_OUTLIER_MADS = 5
+# Default idle time in milliseconds of the IPC link that ends a --waterfall sequence
+WATERFALL_SEQUENCE_GAP = 100
+# Number of the most time consuming messages reported per --waterfall phase
+WATERFALL_TOP_MESSAGES = 5
+# A message taking at least this percentage of the time of its --waterfall
+# phase dominates the phase and is marked critical
+WATERFALL_CRITICAL_PERCENT = 10
+# The --waterfall phases of the SNDRV_PCM_TRIGGER_* commands in the trigger
+# lines, other commands are named by their number
+TRIGGER_PHASES = {0: "stop", 1: "start", 3: "pause push", 4: "pause release",
+                  5: "suspend", 6: "resume", 7: "drain"}
+# Consecutive timestamp mismatches after which the clock offset is dropped
+# and the next message is matched by order again, e.g. after a FW reboot
+FW_LOG_RESYNC_MISSES = 3
+
+class TimingSamples:
+    '''Timing samples in microseconds of a message. With keep_samples set
+    the samples are kept in a compact typed array, for the percentiles and
+    histograms of --json, --csv and --batch. Otherwise only the count, sum,
+    min and max are accumulated, which is all the summary needs. '''
+    def __init__(self, keep_samples=True):
+        self.samples = array.array('q') if keep_samples else None
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        if self.samples is None:
+            raise ValueError("timing samples are not kept")
+        return iter(self.samples)
+
+    def append(self, usecs):
+        if self.samples is not None:
+            self.samples.append(usecs)
+        self.count = self.count + 1
+        self.total = self.total + usecs
+        if self.min is None or usecs < self.min:
+            self.min = usecs
+        if self.max is None or usecs > self.max:
+            self.max = usecs
+
+    def extend(self, other):
+        if self.samples is not None:
+            self.samples.extend(other)
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self.count = self.count + other.count
+        self.total = self.total + other.total
+
+    def mean(self):
+        return self.total / self.count
 
 class Component:
     '''SOF audio component storage class'''
     pipe_id: int
     comp_id: int
     wname: str
-    init_times: list
-    conf_times: list
-    fw_init_times: list
-    fw_conf_times: list
+    init_times: TimingSamples
+    conf_times: TimingSamples
+    fw_init_times: TimingSamples
+    fw_conf_times: TimingSamples
 
-    def __init__(self, pipe_id, comp_id, wname):
+    def __init__(self, pipe_id, comp_id, wname, keep_samples=True):
         self.pipe_id = pipe_id
         self.comp_id = comp_id
         self.wname = wname
-        self.init_times = []
-        self.conf_times = []
-        self.fw_init_times = []
-        self.fw_conf_times = []
+        self.init_times = TimingSamples(keep_samples)
+        self.conf_times = TimingSamples(keep_samples)
+        self.fw_init_times = TimingSamples(keep_samples)
+        self.fw_conf_times = TimingSamples(keep_samples)
 
     def __str__(self) -> str:
         return f'{self.pipe_id}-{self.comp_id:#08x}'
@@ -63,51 +180,52 @@ class Pipeline:
     comps: list
     state_times: dict
     fw_state_times: dict
-    create_times: list
-    fw_create_times: list
-    delete_times: list
-    fw_delete_times: list
+    create_times: TimingSamples
+    fw_create_times: TimingSamples
+    delete_times: TimingSamples
+    fw_delete_times: TimingSamples
 
-    def __init__(self, pipe_id):
+    def __init__(self, pipe_id, keep_samples=True):
         self.pipe_id = pipe_id
         self.pipe_inst = -1
         self.comps = []
+        self.keep_samples = keep_samples
         self.state_times = {}
         self.fw_state_times = {}
-        self.create_times = []
-        self.fw_create_times = []
-        self.delete_times = []
-        self.fw_delete_times = []
+        self.create_times = TimingSamples(keep_samples)
+        self.fw_create_times = TimingSamples(keep_samples)
+        self.delete_times = TimingSamples(keep_samples)
+        self.fw_delete_times = TimingSamples(keep_samples)
 
     def __str__(self) -> str:
         return f'pipeline.{self.pipe_id}'
 
     def add_state_timing(self, state, usecs):
         if self.state_times.get(state) is None:
-            self.state_times[state] = []
+            self.state_times[state] = TimingSamples(self.keep_samples)
         self.state_times[state].append(usecs)
 
     def add_fw_state_timing(self, state, usecs):
         if self.fw_state_times.get(state) is None:
-            self.fw_state_times[state] = []
+            self.fw_state_times[state] = TimingSamples(self.keep_samples)
         self.fw_state_times[state].append(usecs)
 
 class Binding:
     '''SOF audio storage class for multi pipeline trigger messages'''
     src_id: int
     sink_id: int
-    bind_times: list
-    fw_bind_times: list
-    unbind_times: list
-    fw_unbind_times: list
+    bind_times: TimingSamples
+    fw_bind_times: TimingSamples
+    unbind_times: TimingSamples
+    fw_unbind_times: TimingSamples
 
-    def __init__(self, src_id, sink_id):
+    def __init__(self, src_id, sink_id, keep_samples=True):
         self.src_id = src_id
         self.sink_id = sink_id
-        self.bind_times =  []
-        self.fw_bind_times =  []
-        self.unbind_times =  []
-        self.fw_unbind_times =  []
+        self.bind_times = TimingSamples(keep_samples)
+        self.fw_bind_times = TimingSamples(keep_samples)
+        self.unbind_times = TimingSamples(keep_samples)
+        self.fw_unbind_times = TimingSamples(keep_samples)
 
 class MultiPipe:
     '''SOF audio storage class for multi pipeline trigger messages'''
@@ -115,8 +233,9 @@ class MultiPipe:
     state_times: dict
     fw_state_times: dict
 
-    def __init__(self, pipe_ids):
+    def __init__(self, pipe_ids, keep_samples=True):
         self.pipe_ids = pipe_ids
+        self.keep_samples = keep_samples
         self.state_times = {}
         self.fw_state_times = {}
 
@@ -131,12 +250,12 @@ class MultiPipe:
 
     def add_state_timing(self, state, usecs):
         if self.state_times.get(state) is None:
-            self.state_times[state] = []
+            self.state_times[state] = TimingSamples(self.keep_samples)
         self.state_times[state].append(usecs)
 
     def add_fw_state_timing(self, state, usecs):
         if self.fw_state_times.get(state) is None:
-            self.fw_state_times[state] = []
+            self.fw_state_times[state] = TimingSamples(self.keep_samples)
         self.fw_state_times[state].append(usecs)
 
 class LogLineParser:
@@ -151,25 +270,31 @@ class LogLineParser:
         self.bind_data = None
         self.case_times = None
         self.fw_case_times = None
+        self.pipe_insts = None
+        self.keep_samples = True
 
-    def initialize(self, args, comp_data, pipe_data, multip_data, bind_data, case_times,
-                   fw_case_times):
+    def initialize(self, args, *, comp_data, pipe_data, multip_data, bind_data, case_times,
+                   fw_case_times, pipe_insts, keep_samples):
         self.args = args
         self.comp_data = comp_data
         self.pipe_data = pipe_data
+        self.pipe_insts = pipe_insts
         self.multip_data = multip_data
         self.bind_data = bind_data
         self.case_times = case_times
         self.fw_case_times = fw_case_times
+        self.keep_samples = keep_samples
 
     def copy(self, template):
         self.args = template.args
         self.comp_data = template.comp_data
         self.pipe_data = template.pipe_data
+        self.pipe_insts = template.pipe_insts
         self.multip_data = template.multip_data
         self.bind_data = template.bind_data
         self.case_times = template.case_times
         self.fw_case_times = template.fw_case_times
+        self.keep_samples = template.keep_samples
 
 class PipelineParser(LogLineParser):
     '''Parse line of form
@@ -189,8 +314,13 @@ class PipelineParser(LogLineParser):
             pipe_id = int(line_split[2].rstrip(")"))
             pipe_inst = int(line_split[5].rstrip(","))
             if self.pipe_data.get(pipe_id) is None:
-                self.pipe_data[pipe_id] = Pipeline(pipe_id)
+                self.pipe_data[pipe_id] = Pipeline(pipe_id, self.keep_samples)
+            # keep the pipe_inst -> pipe_id index up to date, the instance IDs are reused
+            old_inst = self.pipe_data[pipe_id].pipe_inst
+            if self.pipe_insts.get(old_inst) == pipe_id:
+                del self.pipe_insts[old_inst]
             self.pipe_data[pipe_id].pipe_inst = pipe_inst
+            self.pipe_insts[pipe_inst] = pipe_id
             return True
         return False
 
@@ -220,12 +350,136 @@ class WidgetParser(LogLineParser):
             widget_id |= module_instance_id << 16
             # do not overwire data we have colledted, only add new items to dictionary
             if self.comp_data.get(widget_id) is None:
-                self.comp_data[widget_id] = Component(pipe_id, widget_id, widget_name)
+                self.comp_data[widget_id] = Component(pipe_id, widget_id, widget_name,
+                                                        self.keep_samples)
                 if not self.pipe_data.get(pipe_id) is None:
                     self.pipe_data[pipe_id].comps.append(self.comp_data[widget_id])
             return True
         return False
 
+class FwLogIndex:
+    '''Index of the IPC timing lines in the FW log, built in one pass:
+
+    [    0.000550] <inf> ipc: ipc_cmd: rx-done	: 0x40000004|0x15 in 266 us
+
+    For every IPC header string there is a list of line offsets, FW
+    timestamps and the handling times in 'usecs'. A lookup takes the
+    first line of the header after the previously matched line. Once the
+    offset between the kernel and FW clocks is known from the previous
+    match, the line with the nearest FW timestamp is taken instead, and
+    a message without any line within FW_LOG_MATCH_TOLERANCE is a miss
+    that does not move the position. So holes in the mtrace neither shift
+    the following matches nor cause rescans of the file.
+    '''
+    def __init__(self, fwlog_file):
+        self.entries = {}
+        self.pos = 0
+        self.clock_offset = None
+        self.misses = 0
+        offset = 0
+        for line in fwlog_file:
+            text = line.decode('utf8', errors='replace').strip()
+            offset = offset + len(line)
+            timestamp = None
+            if match_obj := FW_LOG_TIMESTAMP_RE.match(text):
+                timestamp = round(float(match_obj.group(1)) * 1000000)
+            for match_obj in FW_LOG_HEADER_RE.finditer(text):
+                fields = text[match_obj.start():].split()
+                if len(fields) < 3 or not fields[2].isdigit():
+                    continue
+                offsets, timestamps, usecs = self.entries.setdefault(match_obj.group(), ([], [], []))
+                # the line end offset, the position is moved past the matched line
+                offsets.append(offset)
+                timestamps.append(timestamp)
+                usecs.append(int(fields[2]))
+        # the end of the monotonic run of timestamps from every line on, a
+        # FW reboot or a line without a timestamp ends the run
+        self.run_ends = {}
+        for header, (_, timestamps, _) in self.entries.items():
+            run_ends = list(range(1, len(timestamps) + 1))
+            for i in range(len(timestamps) - 2, -1, -1):
+                if timestamps[i] is not None and timestamps[i + 1] is not None and \
+                   timestamps[i + 1] >= timestamps[i]:
+                    run_ends[i] = run_ends[i + 1]
+            self.run_ends[header] = run_ends
+
+    def nearest(self, timestamps, run_ends, first, expected):
+        '''Index of the line with the timestamp nearest to expected, from
+        first onwards within the monotonic run of first, None if none is
+        within FW_LOG_MATCH_TOLERANCE. The earlier line wins a tie.'''
+        end = run_ends[first]
+        low = bisect.bisect_left(timestamps, expected - FW_LOG_MATCH_TOLERANCE, first, end)
+        # the lines before and after expected are the only candidates
+        after = bisect.bisect_left(timestamps, expected, low, end)
+        best = None
+        if after > low:
+            best = bisect.bisect_left(timestamps, timestamps[after - 1], low, after)
+        if after < end and (best is None or
+                            timestamps[after] - expected < expected - timestamps[best]):
+            best = after
+        if best is None or abs(timestamps[best] - expected) > FW_LOG_MATCH_TOLERANCE:
+            return None
+        return best
+
+    def lookup(self, msg_str, usecs):
+        '''Return the FW handling time of msg_str message, which is done at
+        'usecs' kernel time, or None if it is not found'''
+        offsets, timestamps, fw_usecs = self.entries.get(msg_str, ([], [], []))
+        first = bisect.bisect_left(offsets, self.pos + 1)
+        if first == len(offsets):
+            return None
+        index = first
+        if self.clock_offset is not None and timestamps[first] is not None:
+            index = self.nearest(timestamps, self.run_ends[msg_str], first,
+                                 usecs - self.clock_offset)
+            if index is None:
+                self.misses = self.misses + 1
+                if self.misses >= FW_LOG_RESYNC_MISSES:
+                    self.clock_offset = None
+                return None
+        if offsets[index] - self.pos > 10000:
+            print("Warning: position jumping a lot %d" % (offsets[index] - self.pos))
+        self.pos = offsets[index]
+        self.misses = 0
+        if timestamps[index] is not None:
+            self.clock_offset = usecs - timestamps[index]
+        return fw_usecs[index]
+
+USECS_PER_DAY = 24 * 3600 * 1000000
+
+class JournalTimestamp:
+    '''Decode the time stamp of a kernel log line to integer microseconds.
+    The journalctl short-precise time stamp is at fixed offsets:
+
+    Feb 25 23:17:00.598919 lnlm-rvp-sdw kernel: ...
+
+    so the fields are sliced out without datetime.strptime(). A wall clock
+    time going back more than half a day is a rollover over midnight, and
+    a day is added to that and all following time stamps. The
+    short-monotonic (and dmesg) time stamp is seconds since boot:
+
+    [   59.622645] lnlm-rvp-sdw kernel: ...
+    '''
+    def __init__(self):
+        self.prev_usecs = None
+        self.day_usecs = 0
+
+    def decode(self, line):
+        if line[0] == '[':
+            secs, _, fraction = line[1:line.index(']')].strip().partition('.')
+            return int(secs) * 1000000 + int(fraction.ljust(6, '0')[:6])
+        if line[9] == ':' and line[12] == ':' and line[15] == '.':
+            usecs = ((int(line[7:9]) * 60 + int(line[10:12])) * 60 + int(line[13:15])) * 1000000 \
+                + int(line[16:22])
+        else:
+            dt_object = datetime.strptime(line.split()[2], "%H:%M:%S.%f")
+            secs = dt_object.second + dt_object.minute * 60 + dt_object.hour * 3600
+            usecs = secs * 1000000 + dt_object.microsecond
+        if self.prev_usecs is not None and usecs < self.prev_usecs - USECS_PER_DAY // 2:
+            self.day_usecs = self.day_usecs + USECS_PER_DAY
+        self.prev_usecs = usecs
+        return usecs + self.day_usecs
+
 def state_str(state):
     if state == 0:
         return "INVALID_STATE"
@@ -264,9 +518,15 @@ class IpcMsgParser(LogLineParser):
         super().__init__()
         super().copy(template)
         self.reset()
-        self.fwlog_file = fwlog_file
-        self.fwlog_pos = 0
+        self.fwlog_index = None if fwlog_file is None else FwLogIndex(fwlog_file)
         self.fwlog_err_count = 0
+        self.timestamp = JournalTimestamp()
+        # (phase hint, msg_name, msg_str, entity, tx, reply, done, fw usecs) of
+        # every done IPC message for --waterfall, see IpcWaterfall
+        self.timeline = [] if args_waterfall(self.args) else None
+        self.timeline_phase = None
+        self.reply = -1
+        self.last_fw_usec = None
         self.case_time_sum = -1
         self.case_time_fw_sum = -1
         self.multip_ids = None
@@ -274,17 +534,21 @@ class IpcMsgParser(LogLineParser):
     def state_s(self):
         return state_str(self.state)
 
+    def set_trigger_cmd(self, cmd):
+        self.trigger_cmd = cmd
+        # the following IPC messages carry out the trigger
+        self.timeline_phase = TRIGGER_PHASES.get(cmd, "trigger %d" % cmd)
+
     def parse_dai_trigger_cmd_line(self, line):
         ''' Parse line of form:
 
         Mar 20 18:22:49.887735 lnlm-rvp-sdw kernel: snd_sof_intel_hda_common:hda_dai_trigger: sof-audio-pci-intel-lnl 0000:00:1f.3: cmd=1 dai SSP2 Pin direction 0
 
         To extract cmd code, 0 for stopping, 1 for starting. '''
-        if line.find(":hda_dai_trigger:") >= 0:
-            find_str = ": cmd="
-            index = line.find(find_str)
-            if index >= 0:
-                self.trigger_cmd = int(line[index + len(find_str):].split()[0])
+        find_str = ": cmd="
+        index = line.find(find_str)
+        if index >= 0:
+            self.set_trigger_cmd(int(line[index + len(find_str):].split()[0]))
             return True
         return False
 
@@ -294,11 +558,10 @@ class IpcMsgParser(LogLineParser):
         Mar 20 18:22:49.890322 lnlm-rvp-sdw kernel: snd_sof:sof_ipc4_trigger_pipelines: sof-audio-pci-intel-lnl 0000:00:1f.3: pcm2 (Port2), dir 0: cmd: 1, state: 4
 
         To extract cmd code, 0 for stopping, 1 for starting. '''
-        if line.find(":sof_ipc4_trigger_pipelines:") >= 0:
-            find_str = ": cmd: "
-            index = line.find(find_str)
-            if index >= 0:
-                self.trigger_cmd = int(line[index + len(find_str):].split()[0].rstrip(","))
+        find_str = ": cmd: "
+        index = line.find(find_str)
+        if index >= 0:
+            self.set_trigger_cmd(int(line[index + len(find_str):].split()[0].rstrip(",")))
             return True
         return False
 
@@ -309,51 +572,51 @@ class IpcMsgParser(LogLineParser):
 
         To extract pipeline instances included into multi pipeline
         GLB_SET_PIPELINE_STATE message. '''
-        if line.find(":sof_ipc4_set_multi_pipeline_state:") >= 0:
-            start_str = "Set pipelines "
-            index = line.find(start_str)
-            end_pos = line.find(" to state ")
-            if index >= 0 and end_pos >= 0:
-                pipe_ids = []
-                start_pos = index + len(start_str)
-                for inst_str in line[start_pos:end_pos].split():
-                    for pipe_id in self.pipe_data:
-                        if self.pipe_data[pipe_id].pipe_inst == int(inst_str):
-                            pipe_ids.append(pipe_id)
-                self.multip_ids = pipe_ids
-                return True
+        start_str = "Set pipelines "
+        index = line.find(start_str)
+        end_pos = line.find(" to state ")
+        if index >= 0 and end_pos >= 0:
+            pipe_ids = []
+            start_pos = index + len(start_str)
+            for inst_str in line[start_pos:end_pos].split():
+                pipe_id = self.pipe_insts.get(int(inst_str))
+                if pipe_id is not None:
+                    pipe_ids.append(pipe_id)
+            self.multip_ids = pipe_ids
+            return True
         return False
 
 
-    def parse_ipc_headers_line(self, line):
+    def parse_ipc_headers_line(self, line, usecs=None):
         '''Parse three consequtive lines of form:
 
         Feb 25 23:17:00.599946 lnlm-rvp-sdw kernel: snd_sof:sof_ipc4_log_header: sof-audio-pci-intel-lnl 0000:00:1f.3: ipc tx      : 0x40000004|0x15: MOD_INIT_INSTANCE [data size: 84]
         Feb 25 23:17:00.600048 lnlm-rvp-sdw kernel: snd_sof:sof_ipc4_log_header: sof-audio-pci-intel-lnl 0000:00:1f.3: ipc tx reply: 0x60000000|0x15: MOD_INIT_INSTANCE
         Feb 25 23:17:00.600185 lnlm-rvp-sdw kernel: snd_sof:sof_ipc4_log_header: sof-audio-pci-intel-lnl 0000:00:1f.3: ipc tx done : 0x40000004|0x15: MOD_INIT_INSTANCE [data size: 84]
 
-        'usecs' from '23:17:00.599946' (please do not run your tests over midnight)
+        'usecs' from '23:17:00.599946', see JournalTimestamp, unless given
         'msg_type' from 5 letters following " ipc tx ", either "     ", "reply", or "done "
         'msg_str' from '0x40000004|0x15'
         'msg_name' from 'MOD_INIT_INSTANCE' ('MOD_LARGE_CONFIG_SET' or 'GLB_SET_PIPELINE_STATE')
         'primary' integer from '0x40000004'
         'extension' integer from '0x15'
         '''
-        if match_obj := re.search(r" ipc tx (     |reply|done )", line):
+        if match_obj := IPC_HEADER_RE.search(line):
             match_start_pos = match_obj.span()[0]
             match_end_pos = match_obj.span()[1]
-            line_split = line.split()
-            dt_object = datetime.strptime(line_split[2], "%H:%M:%S.%f")
-            secs = dt_object.second + dt_object.minute * 60 + dt_object.hour * 3600
-            usecs = secs * 1000000 + dt_object.microsecond
+            if usecs is None:
+                usecs = self.timestamp.decode(line)
             msg_type = line[match_start_pos + 8 : match_end_pos]
             msg_part = line[match_end_pos:].split()
             msg_str = msg_part[1].rstrip(":")
             msg_name = msg_part[2]
             primary = int(msg_str.split('|')[0], 16)
             extension = int(msg_str.split('|')[1], 16)
-            if msg_type == "     ":
-                self.start = usecs
+            self.track_message(msg_type, usecs)
+            start = self.start
+            entity = None
+            if self.timeline is not None and msg_type == "done ":
+                entity = self.timeline_entity(msg_name, primary, extension)
             if msg_name == "GLB_CREATE_PIPELINE":
                 self.glb_create_pipe_msg_parse(msg_type, msg_str, usecs, primary)
             elif msg_name == "GLB_DELETE_PIPELINE":
@@ -368,17 +631,8 @@ class IpcMsgParser(LogLineParser):
                 self.mod_unbind_msg_parse(msg_type, msg_str, usecs, primary, extension)
             elif msg_name == "GLB_SET_PIPELINE_STATE":
                 self.glb_set_pipe_msg_parse(msg_type, msg_str, usecs, primary, extension)
-            return True
-        return False
-
-    def parse_line(self, line):
-        if self.parse_dai_trigger_cmd_line(line):
-            return True
-        if self.parse_multi_pipe_trigger_cmd_line(line):
-            return True
-        if self.parse_multi_pipe_trigger_params_line(line):
-            return True
-        if self.parse_ipc_headers_line(line):
+            if entity is not None and start >= 0:
+                self.add_timeline(msg_name, msg_str, entity, start, usecs)
             return True
         return False
 
@@ -400,30 +654,57 @@ class IpcMsgParser(LogLineParser):
             if not fw_usec is None:
                 self.case_time_fw_sum = self.case_time_fw_sum + fw_usec
 
-    def fw_lookup(self, msg_str):
-        ''' To make this function work robustly also with the mtrace files,
-        that quite often have holes in them, some kind of time stamp
-        comparison should be done to see that the corresponding FW message
-        in the FW logs was found in approximately at correct timing time
-        stamp. '''
-        if not self.fwlog_file is None:
-            prev_pos = self.fwlog_pos
-            for line in self.fwlog_file:
-                self.fwlog_pos = self.fwlog_pos + len(line)
-                line = line.decode('utf8').strip()
-                index = line.find(msg_str)
-                if index > 0:
-                    if self.fwlog_pos - prev_pos > 10000:
-                        print("Warning: position jumping a lot %d" % (self.fwlog_pos - prev_pos))
-                    usecs = int(line[index:].split()[2])
-                    return usecs
-            self.fwlog_file.seek(prev_pos)
-            self.fwlog_pos = prev_pos
+    def fw_lookup(self, msg_str, usecs):
+        ''' Look up the FW log line of the msg_str message done at 'usecs'
+        kernel time, see FwLogIndex. The time stamp comparison makes this
+        work robustly also with the mtrace files, that quite often have
+        holes in them. '''
+        self.last_fw_usec = None
+        if not self.fwlog_index is None:
+            fw_usec = self.fwlog_index.lookup(msg_str, usecs)
+            if not fw_usec is None:
+                self.last_fw_usec = fw_usec
+                return fw_usec
             if self.fwlog_err_count == 0:
                 print("Warning matching line for %s message not found" % msg_str)
             self.fwlog_err_count = self.fwlog_err_count + 1
         return None
 
+    def track_message(self, msg_type, usecs):
+        if msg_type == "     ":
+            self.start = usecs
+            self.reply = -1
+        elif msg_type == "reply":
+            self.reply = usecs
+        else:
+            self.last_fw_usec = None
+
+    def timeline_entity(self, msg_name, primary, extension):
+        '''Name of the pipeline(s) or module(s) the message is about'''
+        if msg_name in ("MOD_BIND", "MOD_UNBIND"):
+            src = self.comp_data.get(primary & 0xFFFFFF)
+            sink = self.comp_data.get(extension & 0xFFFFFF)
+            if src is not None and sink is not None:
+                return src.wname + ">" + sink.wname
+        elif msg_name.startswith("MOD_"):
+            comp = self.comp_data.get(primary & 0xFFFFFF)
+            if comp is not None:
+                return comp.wname
+        elif msg_name == "GLB_SET_PIPELINE_STATE":
+            if self.pipe_id < 0:
+                return "pipes:" + self.multip_key() + " to " + self.state_s()
+            return "pipeline.%d to %s" % (self.pipe_id, self.state_s())
+        else:
+            pipe_id = self.pipe_insts.get((primary & 0x00FF0000) >> 16)
+            if pipe_id is not None:
+                return str(self.pipe_data[pipe_id])
+        return ""
+
+    def add_timeline(self, msg_name, msg_str, entity, start, usecs):
+        self.timeline.append((self.timeline_phase, msg_name, msg_str, entity, start, self.reply,
+                              usecs, self.last_fw_usec))
+        self.timeline_phase = None
+
     def reset(self):
         self.comp_id = -1
         self.sink_id = -1
@@ -453,7 +734,7 @@ class IpcMsgParser(LogLineParser):
         if msg_type == "reply" and self.args.reply_timings and self.args.init_messages:
             print("%s:\tinit reply\t%d us" % (comp.wname, usecs - self.start))
         elif msg_type == "done ":
-            fw_usec = self.fw_lookup(msg_str)
+            fw_usec = self.fw_lookup(msg_str, usecs)
             self.case_sum(msg_str, usecs - self.start, fw_usec)
             if self.args.init_messages:
                 print("%s:\tinit done\t%d us%s\t%s" %
@@ -472,7 +753,7 @@ class IpcMsgParser(LogLineParser):
         if msg_type == "reply" and self.args.reply_timings and self.args.config_messages:
             print("%s:\tconf reply\t%d us" % (comp.wname, usecs - self.start))
         elif msg_type == "done ":
-            fw_usec = self.fw_lookup(msg_str)
+            fw_usec = self.fw_lookup(msg_str, usecs)
             self.case_sum(msg_str, usecs - self.start, fw_usec)
             if self.args.config_messages:
                 print("%s:\tconf done\t%d us%s\t%s" %
@@ -485,7 +766,7 @@ class IpcMsgParser(LogLineParser):
     def mod_bind_data(self):
         key = (self.sink_id << 24) | self.comp_id
         if self.bind_data.get(key) is None:
-            self.bind_data[key] = Binding(self.comp_id, self.sink_id)
+            self.bind_data[key] = Binding(self.comp_id, self.sink_id, self.keep_samples)
         return self.bind_data[key]
 
     def mod_bind_msg_parse(self, msg_type, msg_str, usecs, primary, extension):
@@ -499,7 +780,7 @@ class IpcMsgParser(LogLineParser):
         if msg_type == "reply" and self.args.reply_timings and self.args.binding_messages:
             print("%s->%s:\tbind reply\t%d us" % (comp.wname, sink.wname, usecs - self.start))
         elif msg_type == "done ":
-            fw_usec = self.fw_lookup(msg_str)
+            fw_usec = self.fw_lookup(msg_str, usecs)
             self.case_sum(msg_str, usecs - self.start, fw_usec)
             if self.args.binding_messages:
                 print("%s->%s:\tbind done\t%d us%s\t%s" %
@@ -521,7 +802,7 @@ class IpcMsgParser(LogLineParser):
         if msg_type == "reply" and self.args.reply_timings and self.args.binding_messages:
             print("%s->%s:\tunbind reply\t%d us" % (comp.wname, sink.wname, usecs - self.start))
         elif msg_type == "done ":
-            fw_usec = self.fw_lookup(msg_str)
+            fw_usec = self.fw_lookup(msg_str, usecs)
             self.case_sum(msg_str, usecs - self.start, fw_usec)
             if self.args.binding_messages:
                 print("%s->%s:\tunbind done\t%d us%s\t%s" %
@@ -541,13 +822,12 @@ class IpcMsgParser(LogLineParser):
         return pipes_key
 
     def glb_msg_1st_init_pipe_id(self, primary):
-        pipe_inst = (primary & 0x00FF0000) >> 16
-        for pipe_id in self.pipe_data:
-            if self.pipe_data[pipe_id].pipe_inst == pipe_inst:
-                self.pipe_id = pipe_id
+        pipe_id = self.pipe_insts.get((primary & 0x00FF0000) >> 16)
+        if pipe_id is not None:
+            self.pipe_id = pipe_id
 
     def glb_set_pipe_parse_done(self, msg_str, usecs):
-        fw_usec = self.fw_lookup(msg_str)
+        fw_usec = self.fw_lookup(msg_str, usecs)
         self.case_sum(msg_str, usecs - self.start, fw_usec)
         pipeid = ""
         if self.pipe_id < 0:
@@ -562,7 +842,8 @@ class IpcMsgParser(LogLineParser):
             self.state = 10
         if self.pipe_id < 0:
             if self.multip_data.get(self.multip_key()) is None:
-                self.multip_data[self.multip_key()] = MultiPipe(self.multip_ids)
+                self.multip_data[self.multip_key()] = MultiPipe(self.multip_ids,
+                                                                   self.keep_samples)
             self.multip_data[self.multip_key()].add_state_timing(self.state, usecs - self.start)
             if not fw_usec is None:
                 self.multip_data[self.multip_key()].add_fw_state_timing(self.state, fw_usec)
@@ -591,7 +872,7 @@ class IpcMsgParser(LogLineParser):
             print("pipeline.%d\tcreate reply\t %d us" %
                   (self.pipe_id, self.state, usecs - self.start))
         elif msg_type == "done ":
-            fw_usec = self.fw_lookup(msg_str)
+            fw_usec = self.fw_lookup(msg_str, usecs)
             self.case_sum(msg_str, usecs - self.start, fw_usec)
             if self.args.pipeline_msgs:
                 print("pipeline.%d\tcreate done\t%d us%s\t%s" %
@@ -610,7 +891,7 @@ class IpcMsgParser(LogLineParser):
             print("pipeline.%d\tdelete reply\t %d us" %
                   (self.pipe_id, self.state, usecs - self.start))
         elif msg_type == "done ":
-            fw_usec = self.fw_lookup(msg_str)
+            fw_usec = self.fw_lookup(msg_str, usecs)
             self.case_sum(msg_str, usecs - self.start, fw_usec)
             if self.args.pipeline_msgs:
                 print("pipeline.%d\tdelete done\t%d us%s\t%s" %
@@ -625,45 +906,70 @@ class IpcMsgParser(LogLineParser):
 class SOFLinuxLogParser:
     '''Class parser object that goes through then Linux kernel log
     line by line and picks some of the data from the matching FW logs,
-    if the FW log file was give. '''
-    def __init__(self, args, fwlog_file):
+    if the FW log file was give. The raw timing samples are kept only
+    with keep_samples, see TimingSamples. '''
+    def __init__(self, args, fwlog_file, keep_samples=True):
         self.args = args
         self.comp_data = {}
         self.pipe_data = {}
         self.multip_data = {}
         self.bind_data = {}
-        self.case_times = []
-        self.fw_case_times = []
+        self.case_times = TimingSamples(keep_samples)
+        self.fw_case_times = TimingSamples(keep_samples)
+        self.pipe_insts = {}
+        self.keep_samples = keep_samples
         self.common_data = LogLineParser()
-        self.common_data.initialize(args, self.comp_data, self.pipe_data, self.multip_data,
-                                    self.bind_data, self.case_times, self.fw_case_times)
+        self.common_data.initialize(args, comp_data=self.comp_data, pipe_data=self.pipe_data,
+                                    multip_data=self.multip_data, bind_data=self.bind_data,
+                                    case_times=self.case_times,
+                                    fw_case_times=self.fw_case_times,
+                                    pipe_insts=self.pipe_insts, keep_samples=keep_samples)
         self.pipe_parser = PipelineParser(self.common_data)
         self.widget_parser = WidgetParser(self.common_data)
         self.ipc_msg_parser = IpcMsgParser(self.common_data, fwlog_file)
+        self.line_handlers = {
+            'sof_ipc4_widget_setup': self.parse_widget_setup_line,
+            'hda_dai_trigger': self.ipc_msg_parser.parse_dai_trigger_cmd_line,
+            'sof_ipc4_trigger_pipelines': self.ipc_msg_parser.parse_multi_pipe_trigger_cmd_line,
+            'sof_ipc4_set_multi_pipeline_state':
+                self.ipc_msg_parser.parse_multi_pipe_trigger_params_line,
+        }
+
+    def parse_widget_setup_line(self, line):
+        if self.pipe_parser.parse_line(line):
+            return True
+        return self.widget_parser.parse_line(line)
+
+    def parse_line(self, line, usecs=None):
+        '''Route the line to the one parser of its SOF function tag. The tag
+        is found with a single search of the line, and when the kernel log
+        has no function tags, from the message of the line. Lines of neither
+        kind, most of a full journal, are skipped, mostly by the fixed
+        substring checks without a search. The time stamp 'usecs' of the IPC
+        header lines is decoded from the line unless given. '''
+        if KERNEL_TAG_SENTINEL in line and (match_obj := KERNEL_TAG_RE.search(line)):
+            tag = match_obj.group(1)
+        elif KERNEL_MSG_SENTINEL in line and (match_obj := KERNEL_MSG_RE.search(line)):
+            tag = match_obj.lastgroup
+        else:
+            return
+        if tag == 'sof_ipc4_log_header':
+            self.ipc_msg_parser.parse_ipc_headers_line(line, usecs)
+        else:
+            self.line_handlers[tag](line)
 
     def read_log_data(self, klog_file):
         for line in klog_file:
-            if self.pipe_parser.parse_line(line):
-                continue
-            if self.widget_parser.parse_line(line):
-                continue
-            if self.ipc_msg_parser.parse_line(line):
-                continue
+            self.parse_line(line)
+
+    def read_journal(self, kernel_journal):
+        for message, usecs in kernel_journal.entries():
+            self.parse_line(message, usecs)
 
     def print_min_max_avg(self, prefix, times):
         if len(times) == 0:
             return
-        minval = 1000000
-        maxval = 0
-        valsum = 0
-        for val in times:
-            if val < minval:
-                minval = val
-            if val > maxval:
-                maxval = val
-            valsum = valsum + val
-        print("%s\tmin %d us\tmax %d us\taverage %d us of %d" %
-              (prefix, minval, maxval, valsum / len(times), len(times)))
+        print_timing(prefix, times)
 
     def bind_str(self, binding):
         src = self.comp_data[binding.src_id]
@@ -739,15 +1045,494 @@ class SOFLinuxLogParser:
             self.print_min_max_avg("IPC totals    ", self.case_times)
         self.print_min_max_avg("IPC totals fw ", self.fw_case_times)
 
+    def timings(self):
+        '''Yield every collected timing as (entity type, entity name,
+        message, kernel times, fw times)'''
+        for mod in self.comp_data.values():
+            yield ("component", mod.wname, "init", mod.init_times, mod.fw_init_times)
+            yield ("component", mod.wname, "conf", mod.conf_times, mod.fw_conf_times)
+        for pipe in self.pipe_data.values():
+            yield ("pipeline", str(pipe), "create", pipe.create_times, pipe.fw_create_times)
+            for state in sorted(pipe.state_times.keys() | pipe.fw_state_times.keys()):
+                yield ("pipeline", str(pipe), state_str(state), pipe.state_times.get(state, TimingSamples()),
+                       pipe.fw_state_times.get(state, TimingSamples()))
+            yield ("pipeline", str(pipe), "delete", pipe.delete_times, pipe.fw_delete_times)
+        for binding in self.bind_data.values():
+            yield ("binding", self.bind_str(binding), "bind", binding.bind_times,
+                   binding.fw_bind_times)
+            yield ("binding", self.bind_str(binding), "unbind", binding.unbind_times,
+                   binding.fw_unbind_times)
+        for multip_key, multip in self.multip_data.items():
+            for state in sorted(multip.state_times.keys() | multip.fw_state_times.keys()):
+                yield ("multi_pipeline", multip_key.strip(), state_str(state),
+                       multip.state_times.get(state, TimingSamples()), multip.fw_state_times.get(state, TimingSamples()))
+        if self.args.case_start is not None and self.args.case_end is not None:
+            yield ("case", "IPC totals", "total", self.case_times, self.fw_case_times)
+
     def get_fwlog_err_count(self):
         return self.ipc_msg_parser.fwlog_err_count
 
+def print_timing(prefix, times):
+    print("%s\tmin %d us\tmax %d us\taverage %d us of %d" %
+          (prefix, times.min, times.max, times.mean(), len(times)))
+
+def timing_entries(timings):
+    '''Statistics of every timing of SOFLinuxLogParser.timings() form
+    with kernel or fw times'''
+    entries = []
+    for kind, name, message, times, fw_times in timings:
+        if times or fw_times:
+            entries.append({"type": kind, "name": name, "message": message,
+                            "kernel": timing_stats(times), "fw": timing_stats(fw_times)})
+    return entries
+
+def write_json(filename, entries, extra=None):
+    with open(filename, 'w', encoding='utf8') as f:
+        json.dump({"unit": "us", **(extra or {}), "timings": entries}, f, indent=2)
+        f.write('\n')
+
+def write_csv(filename, entries):
+    columns = ["count", "min", "max", "mean", "stddev"] + \
+        ["p%d" % pct for pct in TIMING_PERCENTILES]
+    with open(filename, 'w', encoding='utf8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["type", "name", "message", "source"] + columns + ["histogram"])
+        for entry in entries:
+            for source in ("kernel", "fw"):
+                stats = entry[source]
+                if stats is None:
+                    continue
+                buckets = ""
+                if "histogram" in stats:
+                    hist = LogHistogram.from_dict(stats["histogram"])
+                    buckets = " ".join("%.0f-%.0f:%d" % bucket
+                                       for bucket in hist.buckets(HIST_CSV_MERGE))
+                writer.writerow([entry["type"], entry["name"], entry["message"], source] +
+                                [stats.get(column, "") for column in columns] + [buckets])
+
+def timing_histogram(samples):
+    '''Log-bucket histogram of timings in microseconds'''
+    hist = LogHistogram(lowest=1, highest=1e8)
+    hist.add_many(samples)
+    return hist
+
+def timing_stats(times):
+    '''Statistics of TimingSamples for --json and --csv output, None if
+    there are no timings. Without the samples, see TimingSamples, only the
+    count, min, max and mean are known, there is no stddev, percentiles or
+    histogram.'''
+    if len(times) == 0:
+        return None
+    samples = times.samples
+    if samples is None:
+        return {"count": len(times), "min": times.min, "max": times.max, "mean": times.mean()}
+    ordered = sorted(samples)
+    stats = {"count": len(times), "min": ordered[0], "max": ordered[-1],
+             "mean": statistics.fmean(samples), "stddev": statistics.pstdev(samples)}
+    for pct in TIMING_PERCENTILES:
+        # nearest-rank percentile
+        stats["p%d" % pct] = ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+    stats["histogram"] = timing_histogram(samples).to_dict()
+    return stats
+
+def histogram_samples(hist_dict):
+    '''Samples of a to_dict() form histogram, every sample at the geometric
+    center of its bucket'''
+    hist = LogHistogram.from_dict(hist_dict)
+    index = np.flatnonzero(hist.counts)
+    centers = [math.sqrt(low * high) if low > 0 else high
+               for low, high in map(hist.bucket_bounds, index)]
+    return np.repeat(centers, hist.counts[index])
+
+def read_baseline(filename):
+    '''Statistics of the --json output of a previous run by (type, name,
+    message, source)'''
+    with open(filename, 'r', encoding='utf8') as f:
+        data = json.load(f)
+    baseline = {}
+    for entry in data["timings"]:
+        for source in ("kernel", "fw"):
+            if entry[source] is not None:
+                baseline[(entry["type"], entry["name"], entry["message"], source)] = entry[source]
+    return baseline
+
+def compare_with_baseline(entries, args):
+    '''Compare the timing entries with the --baseline run. The entries are
+    matched by entity name, the comp_id of a widget changes from run to run.
+    As the baseline has only histograms, the one-sided Mann-Whitney U test
+    of the current timings being slower runs on the bucket centers of both
+    runs. An entry regresses when its mean grew more than --regress-threshold
+    percent and, if tested, the p value is below --alpha.'''
+    from scipy import stats as scipy_stats # pylint: disable=C0415
+
+    baseline = read_baseline(args.baseline)
+    comparisons = []
+    for entry in entries:
+        for source in ("kernel", "fw"):
+            key = (entry["type"], entry["name"], entry["message"], source)
+            curr, base = entry[source], baseline.pop(key, None)
+            if curr is None or base is None or (source == "kernel" and args.fw_only):
+                continue
+            delta = (curr["mean"] - base["mean"]) / base["mean"] * 100 if base["mean"] else 0
+            p_value = None
+            if curr["count"] > 1 and base["count"] > 1 and \
+               "histogram" in curr and "histogram" in base:
+                p_value = float(scipy_stats.mannwhitneyu(histogram_samples(curr["histogram"]),
+                                                         histogram_samples(base["histogram"]),
+                                                         alternative='greater').pvalue)
+            comparisons.append({"type": key[0], "name": key[1], "message": key[2],
+                                "source": source, "base_mean": base["mean"],
+                                "mean": curr["mean"], "delta_pct": delta, "p_value": p_value,
+                                "regressed": delta > args.regress_threshold and
+                                (p_value is None or p_value < args.alpha)})
+    for kind, name, message, source in baseline:
+        print("Baseline %s %s %s %s not seen in this run" % (kind, name, message, source))
+    return comparisons
+
+def print_baseline_comparison(args, comparisons):
+    '''Print the regressions of compare_with_baseline(), return True if
+    there is any'''
+    regressions = [comp for comp in comparisons if comp["regressed"]]
+    print("Compared %d timings with baseline %s, %d regressions" %
+          (len(comparisons), args.baseline, len(regressions)))
+    for comp in regressions:
+        print("Regression %s %s %s %s: mean %d us -> %d us (%+.1f%%, p %s)" %
+              (comp["type"], comp["name"], comp["message"], comp["source"],
+               comp["base_mean"], comp["mean"], comp["delta_pct"],
+               "n/a" if comp["p_value"] is None else "%.3g" % comp["p_value"]))
+    return len(regressions) > 0
+
+def report_entries(args, entries, extra):
+    '''Compare the timing entries with --baseline and write them to --json
+    and --csv files, return True if any of them regressed'''
+    regressed = False
+    if args.baseline is not None:
+        extra["baseline"] = compare_with_baseline(entries, args)
+        regressed = print_baseline_comparison(args, extra["baseline"])
+
+    if args.json is not None:
+        write_json(args.json, entries, extra)
+
+    if args.csv is not None:
+        write_csv(args.csv, entries)
+    return regressed
+
+class KernelJournal:
+    '''Reader of the kernel entries of the current boot in the systemd
+    journal. The MESSAGE of the entries is parsed as a kernel log line and
+    the structured monotonic time stamp is taken as is. With a cursor
+    file, reading starts after the entry saved by the previous run. '''
+    def __init__(self, cursor_file):
+        # python3-systemd is needed only with --journal
+        from systemd import journal # pylint: disable=import-outside-toplevel
+        self.reader = journal.Reader()
+        self.reader.this_boot()
+        self.reader.add_match(_TRANSPORT='kernel')
+        self.cursor_file = cursor_file
+        self.cursor = None
+        saved_cursor = None
+        if cursor_file is not None:
+            try:
+                with open(cursor_file, 'r', encoding='utf8') as f:
+                    saved_cursor = f.read().strip()
+            except FileNotFoundError:
+                pass
+        if saved_cursor:
+            self.reader.seek_cursor(saved_cursor)
+            # the entry at the cursor was read by the previous run
+            self.reader.get_next()
+
+    def entries(self):
+        '''Yield the message and the time stamp in microseconds of every
+        entry not read yet'''
+        for entry in self.reader:
+            message = entry.get('MESSAGE', '')
+            if isinstance(message, bytes):
+                message = message.decode('utf-8', errors='replace')
+            timestamp = entry.get('_SOURCE_MONOTONIC_TIMESTAMP')
+            if timestamp is None:
+                timestamp = entry['__MONOTONIC_TIMESTAMP'][0]
+            self.cursor = entry['__CURSOR']
+            yield message, timestamp // timedelta(microseconds=1)
+
+    def wait(self, timeout):
+        self.reader.wait(timeout)
+
+    def save_cursor(self):
+        if self.cursor_file is not None and self.cursor is not None:
+            with open(self.cursor_file, 'w', encoding='utf8') as f:
+                f.write(self.cursor + '\n')
+
+def follow_journal(log_parser, kernel_journal, interval):
+    '''Read the new journal entries as they come and print the summary
+    every 'interval' seconds until interrupted with Ctrl-C'''
+    next_report = time.monotonic() + interval
+    try:
+        while True:
+            log_parser.read_journal(kernel_journal)
+            now = time.monotonic()
+            if now >= next_report:
+                print("--- %s ---" % datetime.now().strftime("%H:%M:%S"))
+                log_parser.summary()
+                log_parser.case_totals()
+                sys.stdout.flush()
+                next_report = next_report + interval
+            kernel_journal.wait(max(next_report - now, 0))
+    except KeyboardInterrupt:
+        pass
+
+def args_waterfall(args):
+    return getattr(args, "waterfall", None) is not None
+
+class IpcWaterfall:
+    '''Stream open, start, stop and close sequences of the IPC messages.
+
+    A new sequence begins after the IPC link was idle for more than the
+    sequence gap, at the first message after a trigger ("start", "stop",
+    "pause push" etc., see TRIGGER_PHASES), at the first GLB_CREATE_PIPELINE
+    of a stream ("open") and at the first MOD_UNBIND or GLB_DELETE_PIPELINE
+    ("close"). The kernel sends one IPC message at a time, so the messages
+    of a sequence and the host time between them follow each other, and a
+    slower message makes the whole sequence slower. The time of a message
+    is split into FW time, from the FW log, and the rest, the kernel time,
+    which is all of it without FW log. Time between messages is host time.
+    The messages taking at least WATERFALL_CRITICAL_PERCENT of the time of
+    their phase dominate the phase and are marked critical.
+    '''
+    def __init__(self, timeline, gap_usecs):
+        self.sequences = []
+        phase = None
+        prev_done = None
+        for record in timeline:
+            hint, msg_name, _, _, start, _, done, _ = record
+            if hint is not None:
+                new_phase = hint
+            elif msg_name == "GLB_CREATE_PIPELINE" and phase != "open":
+                new_phase = "open"
+            elif msg_name in ("MOD_UNBIND", "GLB_DELETE_PIPELINE") and phase != "close":
+                new_phase = "close"
+            elif prev_done is None or start - prev_done > gap_usecs:
+                new_phase = "ipc"
+            else:
+                new_phase = None
+            if new_phase is not None:
+                phase = new_phase
+                self.sequences.append((phase, []))
+            self.sequences[-1][1].append(record)
+            prev_done = done
+
+    @staticmethod
+    def message_times(record, prev_done):
+        '''(kernel, fw, host) microseconds of a message record'''
+        _, _, _, _, start, _, done, fw_usec = record
+        fw = fw_usec if fw_usec is not None else 0
+        host = start - prev_done if prev_done is not None else 0
+        return done - start - fw, fw, host
+
+    @staticmethod
+    def message_key(record):
+        '''The message name and entity, messages of the same key are summed up'''
+        return record[1] + " " + record[3]
+
+    def phase_totals(self):
+        '''The time split of the sequences summed up per phase, and the
+        kernel and FW time per message key'''
+        phases = {}
+        for phase, records in self.sequences:
+            totals = phases.setdefault(phase, {"count": 0, "total": 0, "kernel": 0, "fw": 0,
+                                               "host": 0, "messages": {}})
+            totals["count"] = totals["count"] + 1
+            totals["total"] = totals["total"] + records[-1][6] - records[0][4]
+            prev_done = None
+            for record in records:
+                kernel, fw, host = self.message_times(record, prev_done)
+                totals["kernel"] = totals["kernel"] + kernel
+                totals["fw"] = totals["fw"] + fw
+                totals["host"] = totals["host"] + host
+                key = self.message_key(record)
+                totals["messages"][key] = totals["messages"].get(key, 0) + kernel + fw
+                prev_done = record[6]
+        return phases
+
+    @staticmethod
+    def critical_messages(totals):
+        '''The message keys dominating a phase of phase_totals()'''
+        return {key for key, usecs in totals["messages"].items()
+                if 100 * usecs >= WATERFALL_CRITICAL_PERCENT * max(totals["total"], 1)}
+
+    def summary(self):
+        '''Print the average time split per sequence phase and the messages
+        taking most of the time of the phase, the critical ones marked'''
+        for phase, totals in self.phase_totals().items():
+            count = totals["count"]
+            print("%s\t%d sequences\taverage %d us\tkernel %d us\tfw %d us\thost %d us" %
+                  (phase, count, totals["total"] / count, totals["kernel"] / count,
+                   totals["fw"] / count, totals["host"] / count))
+            critical = self.critical_messages(totals)
+            slowest = sorted(totals["messages"].items(), key=lambda item: -item[1])
+            for key, usecs in slowest[:WATERFALL_TOP_MESSAGES]:
+                print("%s\t  %s\taverage %d us\t%.1f%%%s" %
+                      (phase, key, usecs / count, 100 * usecs / max(totals["total"], 1),
+                       "\tcritical" if key in critical else ""))
+
+    def write_trace(self, filename):
+        '''Write the sequences as Chrome/Perfetto trace event JSON. The
+        critical messages have the "critical" arg set, are colored on the
+        ipc track and are repeated on the critical track.'''
+        threads = {1: "sequence", 2: "ipc", 3: "firmware", 4: "host", 5: "critical"}
+        events = [{"name": "process_name", "ph": "M", "pid": 1,
+                   "args": {"name": "SOF IPC waterfall"}}]
+        events.extend({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid,
+                       "args": {"name": name}} for tid, name in threads.items())
+
+        def complete(tid, name, ts, dur, args=None, *, cname=None):
+            events.append({"name": name, "ph": "X", "pid": 1, "tid": tid, "ts": ts,
+                           "dur": dur, "args": args or {}})
+            if cname is not None:
+                # one of the reserved color names of the trace viewers
+                events[-1]["cname"] = cname
+
+        critical = {phase: self.critical_messages(totals)
+                    for phase, totals in self.phase_totals().items()}
+
+        for index, (phase, records) in enumerate(self.sequences):
+            start = records[0][4]
+            complete(1, "%s #%d" % (phase, index), start, records[-1][6] - start,
+                     {"messages": len(records)})
+            prev_done = None
+            for record in records:
+                _, msg_name, msg_str, entity, start, reply, done, fw_usec = record
+                kernel, fw, host = self.message_times(record, prev_done)
+                is_critical = self.message_key(record) in critical[phase]
+                complete(2, (msg_name + " " + entity).strip(), start, done - start,
+                         {"header": msg_str, "kernel_us": kernel, "fw_us": fw_usec,
+                          "reply_us": reply - start if reply >= 0 else None,
+                          "critical": is_critical},
+                         cname="terrible" if is_critical else None)
+                if is_critical:
+                    complete(5, (msg_name + " " + entity).strip(), start, done - start,
+                             {"header": msg_str, "phase": phase, "critical": True},
+                             cname="terrible")
+                if fw_usec is not None:
+                    # the FW handling ends before the reply is received
+                    fw_end = reply if reply >= 0 else done
+                    complete(3, msg_name, fw_end - fw, fw, {"header": msg_str})
+                if host > 0:
+                    complete(4, "host", prev_done, host)
+                prev_done = done
+        with open(filename, 'w', encoding='utf8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+            f.write('\n')
+
+def find_batch_runs(paths, klog_name):
+    '''Kernel log files of batch mode: the given files, the files named
+    'klog_name' anywhere under the given directories, and the same for
+    the matches of glob patterns'''
+    runs = []
+    for path in paths:
+        matches = sorted(glob.glob(path, recursive=True)) if glob.has_magic(path) else [path]
+        for match in map(pathlib.Path, matches):
+            if match.is_dir():
+                runs.extend(sorted(match.rglob(klog_name)))
+            elif match.is_file():
+                runs.append(match)
+    return list(dict.fromkeys(runs))
+
+def parse_run(args, klog):
+    '''Parse a run of batch mode in a worker process, the FW log of the run
+    is the file named --fwlog-name next to the kernel log, if it exists.
+    Return the kernel log name, the timings and the count of messages
+    without FW log line.'''
+    fwlog = klog.with_name(args.fwlog_name)
+    with contextlib.redirect_stdout(io.StringIO()), \
+         (open(fwlog, 'rb') if fwlog.is_file() else contextlib.nullcontext()) as fw_log:
+        log_parser = SOFLinuxLogParser(args, fw_log)
+        with open(klog, 'r', encoding='utf8', errors='replace') as file:
+            log_parser.read_log_data(file)
+    return str(klog), list(log_parser.timings()), log_parser.get_fwlog_err_count()
+
+def merge_runs(results):
+    '''Merge the timings of the runs per entity name and message'''
+    merged = {}
+    for _, timings, _ in results:
+        for kind, name, message, times, fw_times in timings:
+            entry = merged.setdefault((kind, name, message), (TimingSamples(), TimingSamples()))
+            entry[0].extend(times)
+            entry[1].extend(fw_times)
+    return [key + value for key, value in merged.items()]
+
+def run_outliers(results):
+    '''Find the runs with a mean timing of a message far above the other
+    runs, see BATCH_OUTLIER_MADS'''
+    means = {}
+    for run, timings, _ in results:
+        for kind, name, message, times, fw_times in timings:
+            for source, values in (("kernel", times), ("fw", fw_times)):
+                if values:
+                    means.setdefault((kind, name, message, source), []).append(
+                        (run, values.mean()))
+    outliers = []
+    for (kind, name, message, source), run_means in means.items():
+        if len(run_means) < 3:
+            continue
+        median = statistics.median(mean for _, mean in run_means)
+        mad = statistics.median(abs(mean - median) for _, mean in run_means)
+        for run, mean in run_means:
+            if mean > median + BATCH_OUTLIER_MADS * 1.4826 * mad:
+                outliers.append({"run": run, "type": kind, "name": name, "message": message,
+                                 "source": source, "mean": mean, "median": median})
+    return outliers
+
+def batch_main(args):
+    '''Parse the runs in parallel, and report the statistics merged over
+    all runs and the outlier runs'''
+    runs = find_batch_runs(args.batch, args.klog_name)
+    if len(runs) == 0:
+        sys.exit("No %s kernel logs found in %s" % (args.klog_name, " ".join(args.batch)))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        results = list(pool.map(functools.partial(parse_run, args), runs))
+
+    timings = merge_runs(results)
+    print("%d runs" % len(results))
+    for kind, name, message, times, fw_times in timings:
+        prefix = "%s %s %s" % (kind, name, message)
+        if times and not args.fw_only:
+            print_timing(prefix + "   ", times)
+        if fw_times:
+            print_timing(prefix + " fw", fw_times)
+
+    outliers = run_outliers(results)
+    for outlier in outliers:
+        print("Outlier %s: %s %s %s %s mean %d us, median of runs %d us" %
+              (outlier["run"], outlier["type"], outlier["name"], outlier["message"],
+               outlier["source"], outlier["mean"], outlier["median"]))
+    fwlog_err_count = sum(err_count for _, _, err_count in results)
+    if fwlog_err_count > 0:
+        print("Warning could not find matching FW logs for %d messages" % fwlog_err_count)
+
+    entries = timing_entries(timings)
+    runs_info = [{"run": run, "fwlog_errors": err_count} for run, _, err_count in results]
+    extra = {"runs": runs_info, "outliers": outliers}
+    if report_entries(args, entries, extra):
+        sys.exit(1)
+
 def parse_args():
 
     '''Parse command line arguments'''
     parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
                                      description=__doc__)
     parser.add_argument('filename', nargs="?", help="Optional log file, stdin if not defined")
+    parser.add_argument('--journal', action="store_true", default=False,
+                        help='Read the kernel log of the current boot from the systemd journal')
+    parser.add_argument('--cursor-file',
+                        help="With --journal, read only the entries after the cursor saved in " +
+                        "this file, and save the cursor of the last entry read to it",
+                        default=None,)
+    parser.add_argument('--follow', action="store_true", default=False,
+                        help='With --journal, keep reading new entries and print the summary ' +
+                        'every INTERVAL seconds until interrupted with Ctrl-C')
+    parser.add_argument('--interval', type=float, default=10,
+                        help='Summary interval in seconds in follow mode, defaults to 10')
     parser.add_argument("-f", "--fw-log-file",
                         help="FW log file to scan for corresponding IPC timing data",
                         default=None,)
@@ -773,20 +1558,86 @@ def parse_args():
                         help='Show time to reply message')
     parser.add_argument('-s', '--summary', action="store_true", default=False,
                         help='Show average, max, and min latencies of message handling')
+    parser.add_argument('--batch', nargs='+', metavar='PATH',
+                        help='Parse many test runs in parallel and report the statistics ' +
+                        'merged\nper entity name and message, and the outlier runs. PATH is a ' +
+                        'kernel log,\na directory searched for KLOG_NAME files or a glob pattern',
+                        default=None,)
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Number of batch mode worker processes, defaults to the CPU count')
+    parser.add_argument('--klog-name', default='dmesg.txt',
+                        help='Kernel log file name of a run in batch mode, defaults to dmesg.txt')
+    parser.add_argument('--fwlog-name', default='mtrace.txt',
+                        help='FW log file name next to the kernel log in batch mode, defaults ' +
+                        'to mtrace.txt')
+    parser.add_argument('--json',
+                        help='Write count, min, max, mean, stddev, percentiles and histograms ' +
+                        'of the kernel and FW timings of every entity to json file',
+                        default=None,)
+    parser.add_argument('--csv',
+                        help='Write the statistics of --json to csv file, one row per entity ' +
+                        'message and source',
+                        default=None,)
+    parser.add_argument('--baseline',
+                        help='Compare the timings with a previous run, given as the --json ' +
+                        'output of the run.\nThe exit status is 1 when the mean timing of ' +
+                        'an entity message regresses',
+                        default=None,)
+    parser.add_argument('--regress-threshold', type=float, default=10,
+                        help='Mean timing increase in percent over the baseline reported as ' +
+                        'regression,\ndefaults to 10')
+    parser.add_argument('--alpha', type=float, default=0.01,
+                        help='Significance level of the baseline comparison, defaults to 0.01')
+    parser.add_argument('--waterfall',
+                        help='Write the IPC messages of every stream open, start, stop and close ' +
+                        'sequence\nas Chrome/Perfetto trace event JSON to this file, and print ' +
+                        'the kernel,\nFW and host time split of the sequences, with the ' +
+                        'messages dominating a phase\nmarked critical',
+                        default=None,)
+    parser.add_argument('--sequence-gap', type=float, default=WATERFALL_SEQUENCE_GAP,
+                        help='Idle time of the IPC link in milliseconds that ends a --waterfall ' +
+                        'sequence,\ndefaults to %d' % WATERFALL_SEQUENCE_GAP)
     parser.add_argument('-F', '--fw-only', action="store_true", default=False,
                         help='Show only FW numbers in summary')
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.journal and args.filename is not None:
+        parser.error("--journal and a log file are exclusive")
+    if args.batch is not None and (args.journal or args.filename is not None or
+                                   args.fw_log_file is not None):
+        parser.error("--batch is exclusive with --journal, -f and a log file")
+    if args.batch is not None and args.waterfall is not None:
+        parser.error("--waterfall is not supported with --batch")
+    if (args.follow or args.cursor_file is not None) and not args.journal:
+        parser.error("--follow and --cursor-file require --journal")
+    if args.follow and args.fw_log_file is not None:
+        parser.error("--follow cannot match a growing FW log file")
+    if args.follow:
+        args.summary = True
+    return args
 
 def main():
     args = parse_args()
     fw_log = None
 
+    if args.batch is not None:
+        batch_main(args)
+        return
+
+    # raw samples are needed only for the percentiles and histograms
+    keep_samples = args.json is not None or args.csv is not None or args.baseline is not None
+
     if args.fw_log_file is not None:
         fw_log = open(args.fw_log_file, 'rb')
 
-    log_parser = SOFLinuxLogParser(args, fw_log)
+    log_parser = SOFLinuxLogParser(args, fw_log, keep_samples)
 
-    if args.filename is None:
+    if args.journal:
+        kernel_journal = KernelJournal(args.cursor_file)
+        log_parser.read_journal(kernel_journal)
+        if args.follow:
+            follow_journal(log_parser, kernel_journal, args.interval)
+        kernel_journal.save_cursor()
+    elif args.filename is None:
         log_parser.read_log_data(sys.stdin)
     else:
         with open(args.filename, 'r', encoding='utf8') as file:
@@ -799,10 +1650,22 @@ def main():
 
     log_parser.case_totals()
 
+    if args.waterfall is not None:
+        waterfall = IpcWaterfall(log_parser.ipc_msg_parser.timeline, args.sequence_gap * 1000)
+        waterfall.summary()
+        waterfall.write_trace(args.waterfall)
+
+    regressed = False
+    if keep_samples:
+        regressed = report_entries(args, timing_entries(log_parser.timings()), {})
+
     fwlog_err_count = log_parser.get_fwlog_err_count()
     if fwlog_err_count > 0:
         print("Warning could not find matching FW logs for %d messages" %
               fwlog_err_count)
 
+    if regressed:
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
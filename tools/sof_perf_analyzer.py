@@ -9,6 +9,7 @@ aplay and arecord commands or a test case in sof-test repository. It takes human
 trace file (contents from plain mtrace or the decoded dictionary trace) as input, and
 output below analysis results:
     - Average and maximum MCPS of cpu average and cpu peak per SOF audio component
+    - The same per firmware run, when the firmware was reloaded during the capture
 
 Example of performance logging:
 [    4.612041] <inf> component: comp_copy: comp:1 0x40001 perf comp_copy samples 48 period
@@ -16,17 +17,32 @@ Example of performance logging:
 
 There is no audio component name information in SOF trace, so auxiliary linux kernel log
 is used to extract component name.
+
+With --follow, the trace file is followed while the test is running, and rolling window
+statistics of the latest perf samples are reported periodically.
 '''
 
+import os
 import re
+import sys
+import time
+import json
+import array
+import hashlib
 import pathlib
 import argparse
-from datetime import timedelta
+import concurrent.futures
 from typing import TextIO
+from typing import Callable
 from typing import Generator
 from dataclasses import dataclass
+from collections import deque
 
+import numpy as np
 import pandas as pd
+from scipy import stats as scipy_stats
+
+from log_histogram import LogHistogram
 
 # CPC_MARGIN is set to 1.5, because there is some inactive code for some module
 # due to unmet condition. For example:
@@ -37,7 +53,48 @@ import pandas as pd
 # CPC = AVG(module) * CPC_MARGIN
 CPC_MARGIN = 1.5
 
-@dataclass()
+# Percentiles reported per component, estimated from log-bucket histograms
+PERCENTILES = [50, 90, 99, 99.9]
+
+# Number of fine histogram buckets merged into one bucket for histogram output
+HIST_OUTPUT_MERGE = 8
+
+# Once DSP timer count to UINT32_MAX, it wrapped to zero, which causes
+# the timestamp wrap to zero, too. UINT32_MAX / DSP_TIMER is added to the
+# timestamp correction at every wrap.
+DSP_TIMER = 38400000
+UINT32_MAX = 4294967295
+
+# On wrap happened, the timestamp of current trace should be much more smaller
+# than the previous one. In practice, it is possible that the timestamp of
+# current trace is slightly smaller than the previous one, this could be a
+# bug in SOF. Use a 50s tolerance to make sure timestamp correction work properly.
+TS_WRAP_TOLERANCE = 50
+
+# Size of the blocks read by the parallel trace parsing workers
+CHUNK_READ_HINT = 1 << 22
+
+# A declared topology CPC more than this many times the measured MODULE_CPC
+# wastes DSP headroom
+CPC_HIGH_RATIO = 2.0
+
+# Metrics compared with the baseline run, the regression threshold and the
+# significance test apply to the first one
+BASELINE_METRICS = ['CPU_AVG(AVG)', 'CPU_PEAK(AVG)', 'CPU_PEAK(MAX)']
+# Aggregation of the BASELINE_METRICS of the components with the same join key,
+# e.g. a widget re-created with another instance ID
+BASELINE_AGGREGATION = {'CPU_AVG(AVG)': 'mean', 'CPU_PEAK(AVG)': 'mean', 'CPU_PEAK(MAX)': 'max'}
+
+# Default spike detection: a CPU_PEAK sample is a spike when it exceeds this
+# many times the rolling median CPU_PEAK of the last SPIKE_BASELINE samples
+# of the component
+SPIKE_RATIO = 2.0
+SPIKE_BASELINE = 100
+
+# Bump when the layout of the parsed trace cache changes, old caches are ignored
+PERF_CACHE_VERSION = 5
+
+@dataclass(slots=True)
 class TraceItem:
     '''The structural representation for a single, parsed line of trace'''
     timestamp: float
@@ -47,6 +104,8 @@ class TraceItem:
     # The user message filled to log functions, exclude timestamp, log level,
     # log context and log function, which is prepended by zephyr logging system
     msg: str
+    # the trace handler resolved by make_trace_item(), None if not resolved
+    handler: 'Callable[[TraceItem], None] | None' = None
 
 @dataclass(frozen=True)
 class Component:
@@ -57,45 +116,257 @@ class Component:
     def __str__(self) -> str:
         return f'{self.ppln_id}-{self.comp_id:#08x}'
 
-PERF_INFO_COL = ['COMP_ID', 'TIMESTAMP', 'SAMPLES', 'PERIOD', 'CPU_AVG', 'CPU_PEAK']
+PERF_INFO_COL = ['COMP_ID', 'TIMESTAMP', 'SAMPLES', 'PERIOD', 'CPU_AVG', 'CPU_PEAK', 'SEGMENT']
+
+# pylint: disable=R0902
+class PerfInfoColumns:
+    '''Columnar accumulator for performance trace information.
+
+    Appending a row to a pandas DataFrame copies the whole frame, which makes
+    the collection quadratic in the number of perf traces. Instead, every
+    column is kept in a typed `array.array` buffer, which grows in amortized
+    chunks, and the DataFrame is built only once when all traces have been
+    collected. COMP_ID strings are interned to integer codes and turned into
+    a pandas Categorical column. The rows where a new firmware run (segment)
+    starts are kept in segment_starts, from which the SEGMENT column is built.
+    '''
+    def __init__(self):
+        self.comp_codes: dict[str, int] = {}
+        self.comp_id = array.array('l')
+        self.timestamp = array.array('d')
+        self.samples = array.array('q')
+        self.period = array.array('q')
+        self.cpu_avg = array.array('q')
+        self.cpu_peak = array.array('q')
+        self.segment_starts: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def append(self, comp: str, timestamp: float, samples: int, period: int,
+               cpu_avg: int, cpu_peak: int):
+        # pylint: disable=R0913,R0917
+        '''Append a single row of performance information'''
+        code = self.comp_codes.get(comp)
+        if code is None:
+            code = self.comp_codes[comp] = len(self.comp_codes)
+        self.comp_id.append(code)
+        self.timestamp.append(timestamp)
+        self.samples.append(samples)
+        self.period.append(period)
+        self.cpu_avg.append(cpu_avg)
+        self.cpu_peak.append(cpu_peak)
+
+    @property
+    def segments(self) -> int:
+        '''Number of firmware runs, including runs without perf trace'''
+        return len(self.segment_starts) + 1
+
+    def start_segment(self):
+        '''Following rows belong to a new firmware run'''
+        self.segment_starts.append(len(self))
+
+    def extend(self, other: 'PerfInfoColumns', timestamp: np.ndarray):
+        '''Append all rows of other, with its timestamp column replaced by the
+        corrected timestamp array, COMP_ID codes are remapped to this object'''
+        self.segment_starts.extend(len(self) + start for start in other.segment_starts)
+        remap = array.array('l', [0] * len(other.comp_codes))
+        for comp, code in other.comp_codes.items():
+            remap[code] = self.comp_codes.setdefault(comp, len(self.comp_codes))
+        self.comp_id.extend(remap[code] for code in other.comp_id)
+        self.timestamp.frombytes(timestamp.astype(np.float64).tobytes())
+        self.samples.extend(other.samples)
+        self.period.extend(other.period)
+        self.cpu_avg.extend(other.cpu_avg)
+        self.cpu_peak.extend(other.cpu_peak)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        '''Build the DataFrame with PERF_INFO_COL columns from the buffers, the
+        number of firmware runs is kept in attrs['segments']'''
+        comp_names = list(self.comp_codes)
+        comp_id = pd.Categorical.from_codes(
+            np.array(self.comp_id, dtype=np.int_), categories=comp_names
+        ).reorder_categories(sorted(comp_names))
+        columns = [self.timestamp, self.samples, self.period, self.cpu_avg, self.cpu_peak]
+        segment = np.searchsorted(np.array(self.segment_starts, dtype=np.int64),
+                                  np.arange(len(self)), side='right')
+        table = pd.DataFrame(
+            dict(zip(PERF_INFO_COL,
+                     [comp_id] + [np.array(col, dtype=col.typecode) for col in columns] +
+                     [segment.astype(np.int64)]))
+        )
+        table.attrs['segments'] = self.segments
+        return table
 
 # pylint: disable=C0103
 args = None
 
+perf_columns = PerfInfoColumns()
+
 perf_info: pd.DataFrame = pd.DataFrame(
         columns=PERF_INFO_COL
     )
 
 perf_stats: pd.DataFrame | None = None
 
+# Component names of every firmware run of the trace (SEGMENT), matched to
+# the firmware boots in the kernel message file by process_kmsg_file()
+comp_name_segments: list[dict[str, str]] = []
+
+# Per component histograms of CPU_AVG and CPU_PEAK MCPS:
+# {COMP_ID: {'CPU_AVG': LogHistogram, 'CPU_PEAK': LogHistogram}}
+perf_hists: dict[str, dict[str, LogHistogram]] = {}
+
+# Widgets of the --tplg topology file by widget name
+tplg_widgets: dict = {}
+
 TraceItemGenerator = Generator[TraceItem, None, None]
 
-def collect_perf_info(trace_item: TraceItem):
-    '''Parse and collect performace trace information(msg field of TraceItem) to
-    pandas DataFrame for further analysis.
+def parse_perf_msg(trace_item: TraceItem) -> tuple[str, int, int, int, int]:
+    '''Parse performace trace information(msg field of TraceItem) to a tuple of
+    (COMP_ID, SAMPLES, PERIOD, CPU_AVG, CPU_PEAK)
     '''
     msg = trace_item.msg.split()
     ppln_id = msg[0].split(':')[1]
     comp_id = int(msg[1], 16)
+    return (str(Component(ppln_id, comp_id)),
+            int(msg[5]), int(msg[7]), int(msg[10]), int(msg[12]))
 
-    row_data = pd.Series(
-        dict(zip(PERF_INFO_COL,
-                [str(Component(ppln_id, comp_id)),  trace_item.timestamp,
-                 int(msg[5]), int(msg[7]), int(msg[10]), int(msg[12])]
-            )
-        )
-    )
-    # pylint: disable=W0603
-    global perf_info
-    perf_info = pd.concat([perf_info, row_data.to_frame().T], ignore_index=True)
+def collect_perf_info(trace_item: TraceItem):
+    '''Parse and collect performace trace information to the columnar buffers,
+    perf_info DataFrame is built from them once the whole trace file is processed.
+    '''
+    comp, samples, period, cpu_avg, cpu_peak = parse_perf_msg(trace_item)
+    perf_columns.append(comp, trace_item.timestamp, samples, period, cpu_avg, cpu_peak)
+
+class TraceEvents:
+    '''Columnar accumulator for the timestamped rows collected by an event trace
+    handler, the DataFrame with TIMESTAMP and the given columns is built once
+    the whole trace file is processed.
+    '''
+    def __init__(self, columns: list[str]):
+        self.columns = columns
+        self.timestamp = array.array('d')
+        self.rows: list[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def append(self, timestamp: float, *values):
+        '''Append a single event'''
+        self.timestamp.append(timestamp)
+        self.rows.append(values)
+
+    def extend(self, other: 'TraceEvents', timestamp: np.ndarray):
+        '''Append all events of other, with its timestamps replaced by the
+        corrected timestamp array'''
+        self.timestamp.frombytes(timestamp.astype(np.float64).tobytes())
+        self.rows.extend(other.rows)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        '''Build the DataFrame from the buffers'''
+        table = pd.DataFrame(self.rows, columns=self.columns)
+        table.insert(0, 'TIMESTAMP', np.array(self.timestamp, dtype=np.float64))
+        return table
+
+# Columns of the event tables collected by the event trace handlers
+EVENT_COLUMNS = {
+    'LL_TIMER': ['CORE', 'TIMER_AVG', 'TIMER_MAX', 'OVERRUNS'],
+    'XRUN': ['COMP_ID', 'XRUN'],
+    'STARVATION': ['COMP_ID', 'AVAILABLE', 'FREE'],
+}
+
+def new_trace_events() -> dict[str, TraceEvents]:
+    '''Empty event buffers of all EVENT_COLUMNS tables'''
+    return {name: TraceEvents(columns) for name, columns in EVENT_COLUMNS.items()}
+
+trace_events = new_trace_events()
+
+# Event tables built from trace_events: {name: DataFrame}
+event_info: dict[str, pd.DataFrame] = {}
+
+# Trace handlers by (log context, log function), handlers registered with
+# None as context handle the log function of any context.
+TRACE_HANDLERS: dict[tuple[str | None, str], Callable[[TraceItem], None]] = {}
+
+# TRACE_HANDLERS by log function and then by log context, the traces of the
+# functions without a handler are dropped with a single lookup of the function
+FUNC_HANDLERS: dict[str, dict[str | None, Callable[[TraceItem], None]]] = {}
+
+def trace_handler(context: str | None, func: str):
+    '''Decorator registering a trace handler for the log context and function'''
+    def register(handler: Callable[[TraceItem], None]):
+        TRACE_HANDLERS[(context, func)] = handler
+        FUNC_HANDLERS.setdefault(func, {})[context] = handler
+        return handler
+    return register
+
+def drop_trace_item(_trace_item: TraceItem):
+    '''The resolved handler of the traces without a trace handler'''
+
+def find_trace_handler(context: str, func: str) -> Callable[[TraceItem], None]:
+    '''The trace handler of the log context and function, drop_trace_item()
+    if there is none'''
+    if (handlers := FUNC_HANDLERS.get(func)) is None:
+        return drop_trace_item
+    return handlers.get(context) or handlers.get(None) or drop_trace_item
+
+# The component trace prefix, added by comp_err(), comp_info() and friends
+COMP_MSG_RE = re.compile(r'comp:(\d+) (0x[0-9a-fA-F]+) ')
+
+def parse_comp_prefix(msg: str) -> str | None:
+    '''Return the COMP_ID of a component trace message, None if msg does not
+    start with the component prefix'''
+    if match := COMP_MSG_RE.match(msg):
+        return str(Component(match.group(1), int(match.group(2), 16)))
+    return None
+
+trace_handler(None, 'comp_copy')(collect_perf_info)
+
+LL_TIMER_RE = re.compile(r'll core (\d+) timer avg (\d+), max (\d+), overruns (\d+)')
+
+@trace_handler('ll_schedule', 'zephyr_domain_thread_fn')
+def collect_ll_timer(trace_item: TraceItem):
+    '''Collect the LL scheduler timer statistics, reported periodically by the
+    LL thread of every core, including the count of LL period overruns:
+        ll core 0 timer avg 2017, max 2139, overruns 0
+    '''
+    if match := LL_TIMER_RE.search(trace_item.msg):
+        trace_events['LL_TIMER'].append(trace_item.timestamp, *map(int, match.groups()))
+
+@trace_handler('dai_comp', 'dai_report_xrun')
+def collect_xrun(trace_item: TraceItem):
+    '''Collect DAI xruns:
+        comp:1 0x10004 dai_report_xrun(): underrun due to no data available
+    '''
+    for xrun in ('underrun', 'overrun'):
+        if xrun in trace_item.msg:
+            trace_events['XRUN'].append(trace_item.timestamp,
+                                        parse_comp_prefix(trace_item.msg), xrun)
+            return
+
+STARVATION_RE = re.compile(r'no bytes to copy, available samples: (\d+), free_samples: (\d+)')
+
+@trace_handler('host_comp', 'host_get_copy_bytes_normal')
+def collect_starvation(trace_item: TraceItem):
+    '''Collect host copier starvation, the host buffer has no data to copy or
+    no space to copy to:
+        comp:0 0x4 no bytes to copy, available samples: 0, free_samples: 96
+    '''
+    if match := STARVATION_RE.search(trace_item.msg):
+        trace_events['STARVATION'].append(trace_item.timestamp,
+                                          parse_comp_prefix(trace_item.msg),
+                                          *map(int, match.groups()))
 
 def dispatch_trace_item(trace_item: TraceItem):
     '''Dispatch trace item to cosponding trace collecting function. In a TraceItem,
     we have log timestamp, log level, log context and log function, with them, dispatch
-    could be easily implemented.
+    could be easily implemented with the TRACE_HANDLERS lookup, which is done
+    by make_trace_item() already for the dispatched_only traces.
     '''
-    if trace_item.func == 'comp_copy':
-        collect_perf_info(trace_item)
+    if (handler := trace_item.handler) is None:
+        handler = find_trace_handler(trace_item.context, trace_item.func)
+    handler(trace_item)
 
 def skip_to_first_trace(trace_item_gen: TraceItemGenerator):
     '''The current sof-test test case may collect some traces belonging to previous
@@ -109,22 +380,47 @@ def skip_to_first_trace(trace_item_gen: TraceItemGenerator):
             return item
     return next(trace_item_gen)
 
-def get_timestamp_from_line(line, span_end_pos):
-    try:
-        timestamp = float(line[span_end_pos - 19: span_end_pos - 7].strip())
-    # Support for CONFIG_LOG_OUTPUT_FORMAT_TIME_TIMESTAMP - For when default Zephyr timestamp format is used
-    except ValueError:
-        h, m, rest = line[span_end_pos - 23: span_end_pos - 7].strip().split(':')
-        s1, s2 = rest.split(',')
-        s = s1+s2
-        timestamp = timedelta(
-            hours=int(h),
-            minutes=int(m),
-            seconds=float(s)
-        ).total_seconds()
-    return timestamp
-
-def make_trace_item(fileio: TextIO) -> TraceItemGenerator:
+# Cheap fixed substring that every formal trace contains, lines without it are
+# rejected before running the tokenizer regex.
+TRACE_SENTINEL = '] <'
+
+# The Zephyr boot banner, printed at every firmware boot
+FW_BOOT_BANNER = '*** Booting Zephyr OS'
+
+# Kernel messages of a firmware boot, the start is only logged with dynamic debug
+# of the SOF loader enabled, so the completion messages mark a boot too
+KMSG_BOOT_START_RE = re.compile(r'booting DSP firmware', re.IGNORECASE)
+KMSG_BOOT_DONE_RE = re.compile(r'firmware boot complete|Firmware info: version')
+
+# Tokenizer for a formal trace line, it extracts timestamp, log level, log
+# context, log function and message in a single match. The leading greedy '.*'
+# makes it match the last trace of a line, see make_trace_item().
+TRACE_LINE_RE = re.compile(
+    r'.*\[ *([^\]]+)\] <(dbg|inf|wrn|err)> ([^:]*): ([^:]*): (.*)'
+)
+
+# Anchored TRACE_LINE_RE for the lines with a single '[', that is lines which
+# hold a single trace, it gives the same fields without backtracking from the
+# end of the line through the greedy prefix.
+TRACE_FAST_RE = re.compile(
+    r'\[ *([^\]]+)\] <(dbg|inf|wrn|err)> ([^:]*): ([^:]*): (.*)'
+)
+
+def parse_timestamp(timestamp: str) -> float:
+    '''Convert the timestamp string of a trace to seconds. Two formats are
+    supported, the float seconds '2.566046' and the default Zephyr
+    CONFIG_LOG_OUTPUT_FORMAT_TIME_TIMESTAMP format '00:00:02.566,046'.
+    '''
+    if ':' not in timestamp:
+        return float(timestamp)
+    h, m, rest = timestamp.split(':')
+    s1, s2 = rest.split(',')
+    # sum up in microseconds to keep the same precision as the float format
+    usecs = (int(h) * 3600 + int(m) * 60) * 1000000 + round(float(s1 + s2) * 1000000)
+    return usecs / 1000000
+
+def make_trace_item(fileio: TextIO, on_boot: Callable[[], None] | None = None,
+                    dispatched_only: bool = False) -> TraceItemGenerator:
     '''Filter and parse a line of trace in string form into TraceItem object, for example:
     '[    2.566046] <inf> component: comp_copy: comp:0 0x40000 perf comp_copy samples
     48 period 1000 cpu avg 413 peak 425' -> TraceItem(timestamp=2.566046, level='inf',
@@ -135,46 +431,86 @@ def make_trace_item(fileio: TextIO) -> TraceItemGenerator:
     contains some information that is not quite formated, for example:
     '*** Booting Zephyr OS build v3.4.0-rc2 ***', those messages are and dropped. Other messages
     with timestamp, log level, log context, log function are parsed to a TraceItem for timestamp
-    correction and second stage filtering and parsing.
+    correction and second stage filtering and parsing. on_boot is called for
+    every Zephyr boot banner.
+
+    With dispatched_only, the trace handler is resolved here for
+    dispatch_trace_item(), and the messages of the traces without a handler
+    are left empty, as nothing reads them.
     '''
+    match, fast_match = TRACE_LINE_RE.match, TRACE_FAST_RE.match
     for line in fileio:
-        # Filter extra lines that are not formal traces, for example, the banner,
-        # which don't contain timestamp and trace level.
-        if match_obj := re.search(r'\[.+\] <(dbg|inf|wrn|err)>', line):
-            # Sometimes, A trace output may be incomplete and mixed with next
-            # trace output in a single line, for example: '[    0.071590] <inf>
-            # pipe[    0.071751] <inf> host_comp: host_get_copy_bytes_normal: comp:1
-            # 0x40003 no bytes to copy, available samples: 0, free_samples: 384'.
-            # Under this circumstance, we ignore the first trace and extract the
-            # second trace from the line. This is done by regarding the end position
-            # of the matched substring as sentinel, timestamp and trace level are
-            # both some specific offset from the sentinel.
-            try:
-                span_end_pos = match_obj.span()[1]
-                trace_lvl = line[span_end_pos - 4: span_end_pos - 1]
-                timestamp = get_timestamp_from_line(line, span_end_pos)
+        # Sometimes, A trace output may be incomplete and mixed with next
+        # trace output in a single line, for example: '[    0.071590] <inf>
+        # pipe[    0.071751] <inf> host_comp: host_get_copy_bytes_normal: comp:1
+        # 0x40003 no bytes to copy, available samples: 0, free_samples: 384'.
+        # Under this circumstance, we ignore the first trace and extract the
+        # second trace from the line. The greedy prefix of TRACE_LINE_RE skips
+        # everything before the last timestamp and trace level in the line, it
+        # only runs for the lines with more than one '['.
+        if (match_obj := fast_match(line)) is None or line.find('[', 1) >= 0:
+            # Filter extra lines that are not formal traces, for example, the banner,
+            # which don't contain timestamp and trace level.
+            if TRACE_SENTINEL not in line:
+                if on_boot is not None and FW_BOOT_BANNER in line:
+                    on_boot()
+                continue
+            if (match_obj := match(line)) is None:
+                print(f"WARNING: Couldn't parse line: {line}")
+                continue
+        timestamp, trace_lvl, ctx, func, msg = match_obj.groups()
+        try:
+            # the float format is the common one, convert it without the call
+            timestamp = float(timestamp) if ':' not in timestamp else parse_timestamp(timestamp)
+        except ValueError as e:
+            print(f"WARNING: Couldn't parse line: {line}, error: {e}")
+            continue
+        if not dispatched_only:
+            yield TraceItem(timestamp, trace_lvl, ctx, func, msg.strip())
+        elif (handlers := FUNC_HANDLERS.get(func)) is None:
+            yield TraceItem(timestamp, trace_lvl, ctx, func, '', drop_trace_item)
+        else:
+            yield TraceItem(timestamp, trace_lvl, ctx, func, msg.strip(),
+                            handlers.get(ctx) or handlers.get(None) or drop_trace_item)
 
-                # The rest after removing timestamp and log level
-                rest = line[span_end_pos + 1:].split(': ')
-                ctx, func = rest[0:2]
-                msg = ': '.join(rest[2:]).strip()
-                yield TraceItem(timestamp, trace_lvl, ctx, func, msg)
-            except Exception as e: # pylint: disable=W0718
-                print(f"WARNING: Couldn't parse line: {line}, error: {e}")
+class FwRunDetector:
+    '''Detects firmware reloads between two consecutive traces. A reload is
+    detected when the boot banner was printed between them, or when the
+    timestamp restarted from 0.x, while the previous timestamp was too far
+    from the DSP timer wrap to be a wrap.
+    '''
+    def __init__(self):
+        self.banner = False
+
+    def on_boot(self):
+        '''Callback of make_trace_item() for the boot banner'''
+        self.banner = True
+
+    def is_reload(self, prev_timestamp: float, timestamp: float) -> bool:
+        '''Whether the firmware was reloaded between the two raw timestamps, the
+        banner seen before the previous trace must be cleared with reset()'''
+        reload = self.banner or (int(timestamp) == 0 and
+                                 1 <= prev_timestamp < UINT32_MAX / DSP_TIMER - TS_WRAP_TOLERANCE)
+        self.banner = False
+        return reload
+
+    def reset(self):
+        '''Forget the banner seen before the first trace'''
+        self.banner = False
 
 def process_trace_file():
     '''The top-level caller for processing the trace file'''
-    dsp_timer = 38400000
-    uint32_max = 4294967295
-    # Once DSP timer count to UINT32_MAX, it wrapped to zero, which causes
-    # the timestamp wrap to zero, too. This ts_shift is used to correct
-    # the timestamp value on wrap. UINT32_MAX / DSP_TIMER is added to it at
-    # every wrap.
+    if args.jobs > 1:
+        process_trace_file_parallel()
+        return
+
+    # This ts_shift is used to correct the timestamp value on DSP timer wrap.
     #
     # pylint: disable=C0103
     ts_shift = 0
+    fw_runs = FwRunDetector()
     with open(args.filename, 'r', encoding='utf8', errors='ignore') as file:
-        trace_item_gen = make_trace_item(file)
+        trace_item_gen = make_trace_item(file, fw_runs.on_boot, dispatched_only=True)
         trace_prev = None
         try:
             if args.skip_to_first_trace:
@@ -184,21 +520,316 @@ def process_trace_file():
         except StopIteration as si:
             si.args = ('No valid trace in provided file',)
             raise
+        fw_runs.reset()
         for trace_curr in trace_item_gen:
             # pylint: disable=W0603
             old_ts_shift = ts_shift
-            # On wrap happened, the timestamp of current trace should be much more smaller
-            # than the previous one. In practice, it is possible that the timestamp of
-            # current trace is slightly smaller than the previous one, this could be a
-            # bug in SOF. Add a 50s shift to make sure timestamp correction work properly.
-            if trace_curr.timestamp < trace_prev.timestamp - 50:
-                ts_shift = ts_shift + uint32_max / dsp_timer
+            if trace_curr.timestamp < trace_prev.timestamp - TS_WRAP_TOLERANCE:
+                ts_shift = ts_shift + UINT32_MAX / DSP_TIMER
+            reload = fw_runs.is_reload(trace_prev.timestamp, trace_curr.timestamp)
             trace_prev.timestamp += old_ts_shift
             dispatch_trace_item(trace_prev)
+            if reload:
+                perf_columns.start_segment()
             trace_prev = trace_curr
         trace_prev.timestamp += ts_shift
         dispatch_trace_item(trace_prev)
 
+    # pylint: disable=W0603
+    global perf_info, event_info
+    perf_info = perf_columns.to_dataframe()
+    event_info = {name: events.to_dataframe() for name, events in trace_events.items()}
+
+@dataclass
+class TraceChunk:
+    '''The result of parsing a part of the trace file in a worker process.
+    Timestamps in the collected columns and events are not corrected for DSP
+    timer wraps, instead the row count of the columns and of every event table
+    at every wrap found inside the chunk is recorded in wrap_rows and
+    event_wrap_rows, so the correction can be done after all chunks
+    are parsed.
+    '''
+    columns: PerfInfoColumns
+    wrap_rows: list[int]
+    events: dict[str, TraceEvents]
+    event_wrap_rows: dict[str, list[int]]
+    # boot banner seen before the first trace of the chunk
+    boot_at_start: bool = False
+    # boot banner seen after the last trace of the chunk
+    boot_at_end: bool = False
+    first_timestamp: float | None = None
+    last_timestamp: float | None = None
+
+def read_lines(filename, start: int, end: int) -> Generator[str, None, None]:
+    '''Read and decode lines of filename in byte range [start, end), both
+    start and end must be at line boundaries'''
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = file.readlines(min(remaining, CHUNK_READ_HINT))
+            if not block:
+                break
+            for line in block:
+                # readlines() may read past the end of the range
+                if remaining <= 0:
+                    return
+                remaining -= len(line)
+                yield line.decode('utf8', errors='ignore')
+
+def parse_trace_chunk(filename, start: int, end: int) -> TraceChunk:
+    '''Worker of parallel trace parsing, parse trace items in byte range
+    [start, end) of the trace file and dispatch them without timestamp
+    correction'''
+    # pylint: disable=W0603
+    global perf_columns, trace_events
+    perf_columns = PerfInfoColumns()
+    trace_events = new_trace_events()
+    chunk = TraceChunk(perf_columns, [], trace_events, {name: [] for name in trace_events})
+    fw_runs = FwRunDetector()
+    for item in make_trace_item(read_lines(filename, start, end), fw_runs.on_boot,
+                                dispatched_only=True):
+        if chunk.first_timestamp is None:
+            chunk.first_timestamp = item.timestamp
+            chunk.boot_at_start = fw_runs.banner
+            fw_runs.reset()
+        else:
+            if item.timestamp < chunk.last_timestamp - TS_WRAP_TOLERANCE:
+                chunk.wrap_rows.append(len(perf_columns))
+                for name, events in trace_events.items():
+                    chunk.event_wrap_rows[name].append(len(events))
+            if fw_runs.is_reload(chunk.last_timestamp, item.timestamp):
+                perf_columns.start_segment()
+        chunk.last_timestamp = item.timestamp
+        dispatch_trace_item(item)
+    if chunk.first_timestamp is None:
+        chunk.boot_at_start = fw_runs.banner
+    else:
+        chunk.boot_at_end = fw_runs.banner
+    return chunk
+
+def find_first_trace_offset(filename) -> int:
+    '''Byte offset version of skip_to_first_trace(), return the offset of the
+    line containing the first trace with a timestamp between 0 and 1s'''
+    offset = 0
+    with open(filename, 'rb') as file:
+        for line in file:
+            items = list(make_trace_item([line.decode('utf8', errors='ignore')],
+                                         dispatched_only=True))
+            if items and int(items[0].timestamp) == 0:
+                return offset
+            offset += len(line)
+    raise StopIteration('No valid trace in provided file')
+
+def split_trace_file(filename, start: int, parts: int) -> list[tuple[int, int]]:
+    '''Split byte range [start, EOF) of filename to at most `parts` ranges
+    at line boundaries'''
+    size = os.path.getsize(filename)
+    bounds = [start]
+    with open(filename, 'rb') as file:
+        for i in range(1, parts):
+            pos = start + (size - start) * i // parts
+            if pos <= bounds[-1]:
+                continue
+            file.seek(pos - 1)
+            # the line containing pos belongs to the previous range
+            file.readline()
+            pos = file.tell()
+            if bounds[-1] < pos < size:
+                bounds.append(pos)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def process_trace_file_parallel():
+    '''Parallel version of process_trace_file(). The trace file is split at line
+    boundaries, the parts are parsed in a process pool, then the timestamp
+    corrections of all parts are stitched together in file order. The result
+    is identical to the serial processing.
+    '''
+    start = find_first_trace_offset(args.filename) if args.skip_to_first_trace else 0
+    ranges = split_trace_file(args.filename, start, args.jobs)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        chunks = list(executor.map(parse_trace_chunk, [args.filename] * len(ranges),
+                                   *zip(*ranges)))
+
+    if all(chunk.first_timestamp is None for chunk in chunks):
+        raise StopIteration('No valid trace in provided file')
+
+    # Sum up the shifts in the same order as the serial processing, so the
+    # corrected timestamps are bit-identical.
+    shifts = [0]
+    def shift_of(wraps: int) -> float:
+        while len(shifts) <= wraps:
+            shifts.append(shifts[-1] + UINT32_MAX / DSP_TIMER)
+        return shifts[wraps]
+
+    def corrected(timestamp: array.array, wrap_rows: list[int], wraps: int) -> np.ndarray:
+        timestamp = np.array(timestamp, dtype=np.float64)
+        bounds = [0] + wrap_rows + [len(timestamp)]
+        for i, (begin, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+            timestamp[begin:end] += shift_of(wraps + i)
+        return timestamp
+
+    # pylint: disable=W0603
+    global perf_columns, perf_info, trace_events, event_info
+    perf_columns = PerfInfoColumns()
+    trace_events = new_trace_events()
+    fw_runs = FwRunDetector()
+    wraps = 0
+    last_timestamp = None
+    for chunk in chunks:
+        if chunk.boot_at_start:
+            fw_runs.on_boot()
+        if chunk.first_timestamp is None:
+            continue
+        # wrap or firmware reload between the last trace of previous chunk and
+        # first trace of this chunk
+        if last_timestamp is not None:
+            if chunk.first_timestamp < last_timestamp - TS_WRAP_TOLERANCE:
+                wraps += 1
+            if fw_runs.is_reload(last_timestamp, chunk.first_timestamp):
+                perf_columns.start_segment()
+        fw_runs.reset()
+        last_timestamp = chunk.last_timestamp
+
+        perf_columns.extend(chunk.columns,
+                            corrected(chunk.columns.timestamp, chunk.wrap_rows, wraps))
+        for name, events in chunk.events.items():
+            trace_events[name].extend(
+                events, corrected(events.timestamp, chunk.event_wrap_rows[name], wraps))
+        wraps += len(chunk.wrap_rows)
+        # the firmware was reloaded before the first trace of next chunk
+        if chunk.boot_at_end:
+            fw_runs.on_boot()
+
+    perf_info = perf_columns.to_dataframe()
+    event_info = {name: events.to_dataframe() for name, events in trace_events.items()}
+
+def trace_file_digest(filename) -> str:
+    '''BLAKE2b digest of the whole trace file content'''
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filename, 'rb') as f:
+        while block := f.read(CHUNK_READ_HINT):
+            digest.update(block)
+    return digest.hexdigest()
+
+def perf_cache_key(filename, skip: bool) -> dict:
+    '''The key identifying the parsed content of a trace file, the perf_info
+    table also depends on the --skip-to-first-trace option. It is checked
+    without reading the trace file.'''
+    stat = os.stat(filename)
+    return {'version': PERF_CACHE_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'inode': stat.st_ino, 'skip': skip}
+
+def perf_content_key(key: dict) -> str:
+    '''The part of the cache key that is kept when the trace file is copied or
+    touched, the trace content digest is compared when only the rest differs'''
+    return repr(sorted((name, value) for name, value in key.items()
+                       if name not in ('mtime_ns', 'inode')))
+
+def perf_cache_path(cache_dir, filename, skip: bool) -> pathlib.Path:
+    '''Cache file of a trace file, one cache file per trace path and option'''
+    path = str(pathlib.Path(filename).resolve()) + ('-s' if skip else '')
+    name = hashlib.blake2b(path.encode(), digest_size=8).hexdigest()
+    return pathlib.Path(cache_dir) / f'{pathlib.Path(filename).name}-{name}.npz'
+
+def save_perf_cache(cache, key: dict, table: pd.DataFrame,
+                    events: dict[str, pd.DataFrame] | None = None, digest: str = ''):
+    '''Store the PERF_INFO_COL columns of the parsed trace table and the event
+    tables in a NumPy .npz file together with the key and the content digest
+    of the trace file. The component names of the 'comp_names' table attribute
+    are stored too, they name the components when the cache is a baseline.
+    Object columns of the event tables are stored as strings, with a mask of
+    the None values, e.g. the COMP_ID of an unparsable message.'''
+    cache = pathlib.Path(cache)
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    comp_id = table['COMP_ID'].astype('category').cat
+    comp_names = table.attrs.get('comp_names', {})
+    columns = {col: table[col].to_numpy() for col in PERF_INFO_COL[1:]}
+    for name, event_table in (events or {}).items():
+        for col in event_table.columns:
+            values = event_table[col].to_numpy()
+            if values.dtype == object:
+                missing = pd.isna(values)
+                columns[f'{name}.{col}.missing'] = missing
+                values = np.where(missing, '', values).astype(str)
+            columns[f'{name}.{col}'] = values
+    # write to a temporary file first, so a concurrent reader never sees a partial cache
+    tmp = cache.with_name(cache.name + f'.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as f:
+        np.savez(f, key=np.array(repr(sorted(key.items()))),
+                 content_key=np.array(perf_content_key(key)), digest=np.array(digest),
+                 segments=np.array(table.attrs.get('segments', 1)),
+                 comp_names=np.array(comp_id.categories, dtype=str),
+                 comp_labels=np.array([comp_names.get(comp) or '' for comp in comp_id.categories],
+                                      dtype=str),
+                 comp_codes=comp_id.codes.to_numpy(), **columns)
+    os.replace(tmp, cache)
+
+def load_perf_cache(cache, key: dict | None = None, filename=None) -> pd.DataFrame | None:
+    '''Load the parsed trace table from the cache file, None is returned when
+    there is no cache or the cache was made for another trace content. The key
+    is not checked when it is None. When the key differs only in the mtime or
+    inode of the trace file, e.g. a copied or touched trace, the trace content
+    digest is compared, the trace file is not read on an exact key match.'''
+    try:
+        with np.load(cache, allow_pickle=False) as data:
+            if key is not None and str(data['key']) != repr(sorted(key.items())) and \
+               (filename is None or str(data['content_key']) != perf_content_key(key) or
+                str(data['digest']) != trace_file_digest(filename)):
+                return None
+            comp_id = pd.Categorical.from_codes(data['comp_codes'],
+                                                categories=list(data['comp_names']))
+            table = pd.DataFrame({'COMP_ID': comp_id,
+                                  **{col: data[col] for col in PERF_INFO_COL[1:]}})
+            table.attrs['segments'] = int(data['segments'])
+            table.attrs['comp_names'] = {comp: label for comp, label in
+                                         zip(data['comp_names'], data['comp_labels']) if label}
+            return table
+    except (OSError, KeyError, ValueError):
+        return None
+
+def load_event_cache(cache) -> dict[str, pd.DataFrame]:
+    '''Load the event tables from the cache file, check the cache with
+    load_perf_cache() first'''
+    def column(data, name: str) -> np.ndarray:
+        values = data[name]
+        if f'{name}.missing' in data:
+            # the object column of the parsed table, with its None values
+            values = values.astype(object)
+            values[data[f'{name}.missing']] = None
+        return values
+
+    with np.load(cache, allow_pickle=False) as data:
+        return {name: pd.DataFrame({col: column(data, f'{name}.{col}')
+                                    for col in ['TIMESTAMP'] + columns})
+                for name, columns in EVENT_COLUMNS.items()}
+
+def load_trace_file():
+    '''Fill perf_info and event_info from the parsed trace cache in args.cache_dir, when the
+    cache matches the trace file, otherwise parse the trace file and refresh
+    the cache'''
+    if args.cache_dir is None:
+        process_trace_file()
+        return
+
+    key = perf_cache_key(args.filename, args.skip_to_first_trace)
+    cache = perf_cache_path(args.cache_dir, args.filename, args.skip_to_first_trace)
+    # pylint: disable=W0603
+    global perf_info, event_info
+    if (table := load_perf_cache(cache, key, args.filename)) is not None:
+        perf_info = table
+        event_info = load_event_cache(cache)
+        return
+
+    process_trace_file()
+    if args.kmsg is not None:
+        perf_info.attrs['comp_names'] = kmsg_comp_names()[0]
+    try:
+        save_perf_cache(cache, key, perf_info, event_info, trace_file_digest(args.filename))
+    except OSError as e:
+        print(f'Failed to write parsed trace cache {cache}: {e}', file=sys.stderr)
+
 def process_kmsg_file():
     '''Process the dmesg to get the component ID to component name mapping,
     they are acquired from the line that contains 'Create widget':
@@ -211,13 +842,73 @@ def process_kmsg_file():
         Create pipeline pipeline.3 (pipe 3) - instance 3, core 0
 
     In practice, sof-test only capture kernel message and firmware trace generated during a test
-    case run. Mostly in manual tests, if the kernel message file contains multiple firmware runs
-    with overlapping information, the last one wins.
+    case run. If the kernel message file contains multiple firmware runs, e.g. a capture with
+    suspend/resume cycles, the component names are kept per firmware boot, see
+    read_comp_name_segments(). The last boots are matched to the firmware runs of the trace, and
+    every component is named after the last run it appears in. A component created in no
+    matching boot falls back to the last name it had in the kernel message file.
     '''
-    comp_name = {}
-    with open(args.kmsg, encoding='utf8') as f:
+    # pylint: disable=W0603
+    global perf_stats, comp_name_segments
+    comp_name, comp_name_segments = kmsg_comp_names()
+
+    col_data = pd.DataFrame(
+        comp_name.values(),
+        index=comp_name.keys(),
+        columns=['COMP_NAME']
+    )
+    perf_stats = perf_stats.join(col_data, how='left')
+
+    # Move COMP_NAME column as the first column
+    perf_stats = pd.concat([perf_stats.iloc[:,-1], perf_stats.iloc[:,0:-1]], axis=1)
+
+def kmsg_comp_names() -> tuple[dict[str, str | None], list[dict[str, str]]]:
+    '''Name every component of perf_info from the --kmsg file as described in
+    process_kmsg_file(), the per firmware run mappings are returned too'''
+    kmsg_segments = read_comp_name_segments(args.kmsg)
+    segments = perf_info.attrs.get('segments', 1)
+    name_segments = [kmsg_segments[max(0, len(kmsg_segments) - segments + seg)]
+                     for seg in range(segments)]
+    last_names = merge_comp_names(kmsg_segments)
+    last_segment = perf_info.groupby('COMP_ID', observed=True)['SEGMENT'].max()
+    comp_name = {comp: name_segments[seg].get(comp, last_names.get(comp))
+                 for comp, seg in last_segment.items()}
+    return comp_name, name_segments
+
+def read_comp_names(kmsg) -> dict[str, str]:
+    '''Return the COMP_ID to component name mapping from kernel message file,
+    the last firmware boot wins, see process_kmsg_file()
+    '''
+    return merge_comp_names(read_comp_name_segments(kmsg))
+
+def merge_comp_names(segments: list[dict[str, str]]) -> dict[str, str]:
+    '''Merge the per firmware boot mappings, the last one wins'''
+    return {comp: name for comp_name in segments for comp, name in comp_name.items()}
+
+def read_comp_name_segments(kmsg) -> list[dict[str, str]]:
+    '''Return the COMP_ID to component name mappings of every firmware boot in
+    the kernel message file, oldest first. A boot starts at a KMSG_BOOT_START_RE
+    line, or at a KMSG_BOOT_DONE_RE line following created widgets if the start
+    was not logged. Widgets created before the first boot marker make up the
+    first mapping.
+    '''
+    segments = [{}]
+    booting = False
+    with open(kmsg, encoding='utf8') as f:
         ppln_id = None
         for line in f:
+            if KMSG_BOOT_START_RE.search(line):
+                # boot retries stay in the same segment
+                if not booting and (segments[-1] or len(segments) > 1):
+                    segments.append({})
+                booting = True
+                continue
+            if KMSG_BOOT_DONE_RE.search(line):
+                if not booting and segments[-1]:
+                    segments.append({})
+                booting = False
+                continue
+            comp_name = segments[-1]
             if match_obj := re.search(r"Create (widget|pipeline)", line):
                 span_end_pos = match_obj.span()[1]
                 line_split = line[span_end_pos + 1:].split()
@@ -238,18 +929,7 @@ def process_kmsg_file():
                 # final module id are composed with high16(module instance id) + low16(module id)
                 widget_id |= module_instance_id << 16
                 comp_name[str(Component(ppln_id, widget_id))] = widget_name
-
-    col_data = pd.DataFrame(
-        comp_name.values(),
-        index=comp_name.keys(),
-        columns=['COMP_NAME']
-    )
-    # pylint: disable=W0603
-    global perf_stats
-    perf_stats = perf_stats.join(col_data, how='left')
-
-    # Move COMP_NAME column as the first column
-    perf_stats = pd.concat([perf_stats.iloc[:,-1], perf_stats.iloc[:,0:-1]], axis=1)
+    return segments
 
 def analyze_perf_info():
     '''Calculate performance statistics from performance information'''
@@ -257,22 +937,54 @@ def analyze_perf_info():
     perf_info['CPU_PEAK_MCPS'] = perf_info['CPU_PEAK'] / perf_info['PERIOD']
     # pylint: disable=W0603
     global perf_stats
-    perf_stats = pd.concat([
-        perf_info.groupby('COMP_ID')['CPU_AVG_MCPS'].min(),
-        perf_info.groupby('COMP_ID')['CPU_AVG_MCPS'].mean(),
-        perf_info.groupby('COMP_ID')['CPU_AVG_MCPS'].max(),
-        perf_info.groupby('COMP_ID')['CPU_PEAK_MCPS'].min(),
-        perf_info.groupby('COMP_ID')['CPU_PEAK_MCPS'].mean(),
-        perf_info.groupby('COMP_ID')['CPU_PEAK_MCPS'].max()
-        ], axis=1
-    )
-    perf_stats.columns = ['CPU_AVG(MIN)', 'CPU_AVG(AVG)', 'CPU_AVG(MAX)',
-                          'CPU_PEAK(MIN)', 'CPU_PEAK(AVG)', 'CPU_PEAK(MAX)']
+    # COMP_ID is a categorical column, only report components seen in the trace
+    grouped = perf_info.groupby('COMP_ID', observed=True)
+    perf_stats = mcps_statistics(grouped)
     perf_stats['PEAK(MAX)/AVG(AVG)'] = perf_stats['CPU_PEAK(MAX)'] / perf_stats['CPU_AVG(AVG)']
-    perf_stats['MODULE_CPC'] = perf_info.groupby('COMP_ID')['CPU_AVG'].mean() * CPC_MARGIN
+    perf_stats['MODULE_CPC'] = grouped['CPU_AVG'].mean() * CPC_MARGIN
     # change data type from float to int
     perf_stats['MODULE_CPC'] = perf_stats['MODULE_CPC'].astype(int)
 
+    # Tail statistics, a single spike dominates MAX and rare overloads disappear
+    # in the mean. They are estimated from mergeable histograms, the same way as
+    # in the follow mode.
+    perf_hists.clear()
+    for comp, group in grouped:
+        perf_hists[comp] = {metric: LogHistogram() for metric in ('CPU_AVG', 'CPU_PEAK')}
+        for metric, hist in perf_hists[comp].items():
+            hist.add_many(group[f'{metric}_MCPS'].to_numpy())
+    for metric in ('CPU_AVG', 'CPU_PEAK'):
+        for column, values in percentile_columns(metric, perf_stats.index).items():
+            perf_stats[column] = values
+
+def mcps_statistics(grouped) -> pd.DataFrame:
+    '''Minimum, average and maximum of CPU_AVG and CPU_PEAK MCPS per component'''
+    stats = pd.concat([
+        grouped['CPU_AVG_MCPS'].min(),
+        grouped['CPU_AVG_MCPS'].mean(),
+        grouped['CPU_AVG_MCPS'].max(),
+        grouped['CPU_PEAK_MCPS'].min(),
+        grouped['CPU_PEAK_MCPS'].mean(),
+        grouped['CPU_PEAK_MCPS'].max()
+        ], axis=1
+    )
+    stats.columns = ['CPU_AVG(MIN)', 'CPU_AVG(AVG)', 'CPU_AVG(MAX)',
+                     'CPU_PEAK(MIN)', 'CPU_PEAK(AVG)', 'CPU_PEAK(MAX)']
+    return stats
+
+def percentile_columns(metric: str, comps) -> dict[str, list[float]]:
+    '''Percentile columns of a metric from perf_hists, in order of comps'''
+    return {f'{metric}(P{p:g})': [perf_hists[comp][metric].quantile(p / 100) for comp in comps]
+            for p in PERCENTILES}
+
+def histogram_table(metric: str) -> pd.DataFrame:
+    '''Per component histogram of a metric from perf_hists in long format'''
+    rows = []
+    for comp, hists in perf_hists.items():
+        for low, high, count in hists[metric].buckets(HIST_OUTPUT_MERGE):
+            rows.append((comp, metric, low, high, count))
+    return pd.DataFrame(rows, columns=['COMP_ID', 'METRIC', 'MCPS_LOW', 'MCPS_HIGH', 'COUNT'])
+
 def print_perf_info():
     '''Output SOF performance info'''
     stats = perf_stats.rename_axis('COMP_ID').reset_index()
@@ -285,9 +997,532 @@ def print_perf_info():
     if args.out2csv is not None:
         stats.to_csv(args.out2csv, sep=',', float_format='{:.3f}'.format, index=False)
 
+    hists = pd.concat([histogram_table('CPU_AVG'), histogram_table('CPU_PEAK')])
+    if args.hist2csv is not None:
+        hists.to_csv(args.hist2csv, sep=',', float_format='{:.4f}'.format, index=False)
+
+    if args.out2html is not None:
+        with open(args.out2html, 'w', encoding='utf8') as f:
+            stats.to_html(f, float_format='{:.3f}'.format, index=False)
+            for metric in ('CPU_AVG', 'CPU_PEAK'):
+                f.write(f'\n<h3>{metric} MCPS histogram</h3>\n')
+                histogram_html(hists[hists['METRIC'] == metric], f)
+
+def histogram_html(hists: pd.DataFrame, f: TextIO):
+    '''Write histogram in long format as a component x bucket table'''
+    if hists.empty:
+        return
+    hists = hists.assign(BUCKET=[f'{low:.3f}-{high:.3f}' for low, high
+                                 in zip(hists['MCPS_LOW'], hists['MCPS_HIGH'])])
+    table = hists.pivot_table(index='COMP_ID', columns='BUCKET', values='COUNT',
+                              aggfunc='sum', fill_value=0)
+    # order the buckets by value, not by name
+    buckets = hists.drop_duplicates('BUCKET').sort_values('MCPS_LOW')['BUCKET']
+    table[list(buckets)].to_html(f)
+
+def read_baseline(baseline) -> tuple[pd.DataFrame, pd.DataFrame | None]:
+    '''Read a previous run, either the statistics csv written with --out2csv or
+    the parsed trace cache written with --cache-dir. The statistics indexed by
+    COMP_ID are returned, together with the per sample table of the cache,
+    which is None for csv. The cache has a COMP_NAME column when it was
+    written by a run with --kmsg.'''
+    if pathlib.Path(baseline).suffix == '.npz':
+        samples = load_perf_cache(baseline)
+        if samples is None:
+            raise ValueError(f'{baseline} is not a parsed trace cache')
+        samples['CPU_AVG_MCPS'] = samples['CPU_AVG'] / samples['PERIOD']
+        samples['CPU_PEAK_MCPS'] = samples['CPU_PEAK'] / samples['PERIOD']
+        stats = mcps_statistics(samples.groupby('COMP_ID', observed=True))
+        if comp_names := samples.attrs['comp_names']:
+            stats.insert(0, 'COMP_NAME', stats.index.map(comp_names))
+        return stats, samples
+    return pd.read_csv(baseline).set_index('COMP_ID'), None
+
+def compare_with_baseline() -> pd.DataFrame:
+    '''Join perf_stats with the baseline run and compute per component deltas of
+    BASELINE_METRICS. Components are matched by COMP_NAME when both runs have
+    it, by COMP_ID otherwise, the components with the same name are merged
+    with BASELINE_AGGREGATION. When per sample data of both runs is available,
+    a one-sided Mann-Whitney U test tells whether the current CPU_AVG MCPS
+    distribution is shifted up from the baseline one. A component regresses
+    when its CPU_AVG(AVG) grew more than --regress-threshold percent and, if
+    tested, the P_VALUE is below --alpha.
+    '''
+    base_stats, base_samples = read_baseline(args.baseline)
+    curr_stats = perf_stats.rename_axis('COMP_ID')
+    key = 'COMP_NAME' if 'COMP_NAME' in base_stats and 'COMP_NAME' in curr_stats \
+          else 'COMP_ID'
+    # the join key of every COMP_ID of the two runs
+    base_keys, curr_keys = dict(zip(base_stats.index, base_stats.index)), \
+                           dict(zip(curr_stats.index, curr_stats.index))
+    if key == 'COMP_NAME':
+        # components not named in the kernel message keep their COMP_ID
+        base_keys, curr_keys = [
+            dict(zip(stats.index, stats['COMP_NAME'].fillna(pd.Series(stats.index,
+                                                                      index=stats.index))))
+            for stats in (base_stats, curr_stats)]
+        base_stats = base_stats.set_index(base_stats.index.map(base_keys))
+        curr_stats = curr_stats.set_index(curr_stats.index.map(curr_keys))
+    # one row per join key, the outer join would multiply the duplicate keys
+    base_stats, curr_stats = [stats[BASELINE_METRICS].groupby(level=0).agg(BASELINE_AGGREGATION)
+                              for stats in (base_stats, curr_stats)]
+
+    joined = curr_stats.join(base_stats, how='outer', lsuffix='_CURR', rsuffix='_BASE')
+    result = pd.DataFrame(index=joined.index.rename(key))
+    for metric in BASELINE_METRICS:
+        curr, base = joined[f'{metric}_CURR'], joined[f'{metric}_BASE']
+        result[f'{metric}_BASE'] = base
+        result[f'{metric}_CURR'] = curr
+        result[f'{metric}_DELTA'] = curr - base
+        result[f'{metric}_DELTA(%)'] = (curr - base) / base * 100
+
+    # p_values is keyed by the join key, the samples are grouped by it too
+    p_values = {}
+    if base_samples is not None:
+        base_groups = base_samples['CPU_AVG_MCPS'].groupby(
+            base_samples['COMP_ID'].astype(str).map(base_keys))
+        curr_groups = perf_info['CPU_AVG_MCPS'].groupby(
+            perf_info['COMP_ID'].astype(str).map(curr_keys))
+        for comp in set(base_groups.groups) & set(curr_groups.groups):
+            p_values[comp] = scipy_stats.mannwhitneyu(curr_groups.get_group(comp),
+                                                      base_groups.get_group(comp),
+                                                      alternative='greater').pvalue
+    result['P_VALUE'] = [p_values.get(comp, np.nan) for comp in result.index]
+    result['REGRESSED'] = (result['CPU_AVG(AVG)_DELTA(%)'] > args.regress_threshold) & \
+                          (result['P_VALUE'].isna() | (result['P_VALUE'] < args.alpha))
+    return result
+
+def ll_timer_statistics(events: pd.DataFrame) -> pd.DataFrame:
+    '''LL scheduler timer statistics and overruns per core'''
+    grouped = events.groupby('CORE')
+    stats = pd.concat([
+        grouped['TIMESTAMP'].count(),
+        grouped['TIMER_AVG'].mean(),
+        grouped['TIMER_MAX'].max(),
+        grouped['OVERRUNS'].sum(),
+        grouped['OVERRUNS'].apply(lambda overruns: (overruns > 0).sum())
+        ], axis=1
+    )
+    stats.columns = ['REPORTS', 'TIMER_AVG(AVG)', 'TIMER_MAX(MAX)', 'OVERRUNS(SUM)',
+                     'OVERRUN_REPORTS']
+    return stats
+
+def xrun_statistics(events: pd.DataFrame) -> pd.DataFrame:
+    '''Underrun and overrun counts per component'''
+    stats = pd.crosstab(events['COMP_ID'], events['XRUN']).reindex(
+        columns=['underrun', 'overrun'], fill_value=0)
+    stats.columns = ['UNDERRUNS', 'OVERRUNS']
+    grouped = events.groupby('COMP_ID')
+    stats['FIRST'] = grouped['TIMESTAMP'].min()
+    stats['LAST'] = grouped['TIMESTAMP'].max()
+    return stats
+
+def starvation_statistics(events: pd.DataFrame) -> pd.DataFrame:
+    '''Host copier starvation counts per component'''
+    grouped = events.groupby('COMP_ID')
+    stats = pd.concat([
+        grouped['TIMESTAMP'].count(),
+        grouped['TIMESTAMP'].min(),
+        grouped['TIMESTAMP'].max(),
+        grouped['AVAILABLE'].min(),
+        grouped['FREE'].min()
+        ], axis=1
+    )
+    stats.columns = ['EVENTS', 'FIRST', 'LAST', 'AVAILABLE(MIN)', 'FREE(MIN)']
+    return stats
+
+# Statistics of the EVENT_COLUMNS tables
+EVENT_STATS: dict[str, Callable[[pd.DataFrame], pd.DataFrame]] = {
+    'LL_TIMER': ll_timer_statistics,
+    'XRUN': xrun_statistics,
+    'STARVATION': starvation_statistics,
+}
+
+def print_trace_events():
+    '''Output the statistics of every non-empty event table, to csv and html
+    files named after the table next to the --out2csv and --out2html files'''
+    comp_names = read_comp_names(args.kmsg) if args.kmsg is not None else {}
+    for name, events in event_info.items():
+        if events.empty:
+            continue
+        stats = EVENT_STATS[name](events)
+        if stats.index.name == 'COMP_ID' and comp_names:
+            stats.insert(0, 'COMP_NAME', stats.index.map(comp_names))
+        print_extra_table(f'{name} events:', stats.reset_index(), name.lower())
+
+def segment_statistics() -> pd.DataFrame:
+    '''Statistics of every component in every firmware run of the trace'''
+    grouped = perf_info.groupby(['SEGMENT', 'COMP_ID'], observed=True)
+    stats = grouped.agg(**{
+        'SAMPLES': ('TIMESTAMP', 'size'),
+        'FIRST': ('TIMESTAMP', 'min'),
+        'LAST': ('TIMESTAMP', 'max'),
+        'CPU_AVG(AVG)': ('CPU_AVG_MCPS', 'mean'),
+        'CPU_AVG(MAX)': ('CPU_AVG_MCPS', 'max'),
+        'CPU_PEAK(AVG)': ('CPU_PEAK_MCPS', 'mean'),
+        'CPU_PEAK(MAX)': ('CPU_PEAK_MCPS', 'max'),
+    })
+    stats['MODULE_CPC'] = (grouped['CPU_AVG'].mean() * CPC_MARGIN).astype(int)
+    if comp_name_segments:
+        stats.insert(0, 'COMP_NAME', [comp_name_segments[seg].get(comp)
+                                      for seg, comp in stats.index])
+    return stats
+
+def print_segment_stats():
+    '''Output the per firmware run statistics if the trace has several runs'''
+    if perf_info.attrs.get('segments', 1) > 1:
+        print_extra_table('Per firmware run statistics:', segment_statistics().reset_index(),
+                          'segments')
+
+def detect_spikes() -> pd.DataFrame:
+    '''Find the bursts of CPU_PEAK spikes of every component. A sample is a
+    spike when its CPU_PEAK MCPS exceeds --spike-mcps, or --spike-ratio times
+    the rolling median of the component over --spike-baseline samples, and
+    consecutive spikes of a component make up one burst. A burst starts at the
+    sample before its first spike, because a perf trace covers the time since
+    the previous one, and ends at its last spike. Bursts of other components
+    overlapping in time in the same firmware run are listed as CO_PEAKING.
+
+    The scan is vectorised over the perf_info columns, only the co-peaking
+    search loops over the bursts.
+    '''
+    keys = ['COMP_ID', 'SEGMENT']
+    # stable sort keeps the time order of the samples of every component run
+    order = np.lexsort((perf_info['SEGMENT'].to_numpy(), perf_info['COMP_ID'].cat.codes))
+    series = perf_info.iloc[order]
+    peak = series['CPU_PEAK_MCPS'].to_numpy()
+    timestamp = series['TIMESTAMP'].to_numpy()
+    first = np.ones(len(series), dtype=bool)
+    first[1:] = (series['COMP_ID'].cat.codes.to_numpy()[1:] !=
+                 series['COMP_ID'].cat.codes.to_numpy()[:-1]) | \
+                (series['SEGMENT'].to_numpy()[1:] != series['SEGMENT'].to_numpy()[:-1])
+
+    baseline = series.groupby(keys, observed=True, sort=False)['CPU_PEAK_MCPS'] \
+        .rolling(args.spike_baseline, min_periods=1).median() \
+        .reset_index(level=keys, drop=True).reindex(series.index).to_numpy()
+    spike = np.zeros(len(series), dtype=bool)
+    if args.spike_mcps is not None:
+        spike |= peak > args.spike_mcps
+    if args.spike_ratio > 0:
+        spike |= peak > args.spike_ratio * baseline
+
+    burst_start = spike & (first | ~np.roll(spike, 1))
+    burst = np.cumsum(burst_start)[spike] - 1
+    prev_timestamp = np.where(first, timestamp, np.roll(timestamp, 1))
+    spikes = pd.DataFrame({
+        'COMP_ID': series['COMP_ID'].to_numpy()[spike],
+        'SEGMENT': series['SEGMENT'].to_numpy()[spike],
+        'START': prev_timestamp[spike],
+        'END': timestamp[spike],
+        'CPU_PEAK(MAX)': peak[spike],
+        'BASELINE': baseline[spike],
+    }).groupby(burst).agg(**{
+        'COMP_ID': ('COMP_ID', 'first'),
+        'SEGMENT': ('SEGMENT', 'first'),
+        'START': ('START', 'min'),
+        'END': ('END', 'max'),
+        'SPIKES': ('END', 'size'),
+        'CPU_PEAK(MAX)': ('CPU_PEAK(MAX)', 'max'),
+        'BASELINE': ('BASELINE', 'mean'),
+    })
+    spikes = spikes.sort_values(['SEGMENT', 'START'], kind='stable').reset_index(drop=True)
+    spikes.insert(4, 'DURATION', spikes['END'] - spikes['START'])
+    spikes['CO_PEAKING'] = co_peaking(spikes)
+    return spikes
+
+def co_peaking(spikes: pd.DataFrame) -> list[str]:
+    '''Components of the other spike bursts overlapping every burst in time,
+    the bursts must be sorted by SEGMENT and START'''
+    names = {comp: comp for comp in perf_stats.index}
+    if 'COMP_NAME' in perf_stats:
+        names.update(perf_stats['COMP_NAME'].dropna())
+    result = [''] * len(spikes)
+    longest = spikes['DURATION'].max()
+    for _, bursts in spikes.groupby('SEGMENT'):
+        comps = bursts['COMP_ID'].to_numpy()
+        start, end = bursts['START'].to_numpy(), bursts['END'].to_numpy()
+        # overlapping bursts start within the longest burst duration before this one
+        low = np.searchsorted(start, start - longest, side='left')
+        high = np.searchsorted(start, end, side='right')
+        for i, row in enumerate(bursts.index):
+            near = np.arange(low[i], high[i])
+            near = near[(end[near] >= start[i]) & (comps[near] != comps[i])]
+            result[row] = ','.join(dict.fromkeys(names[comp] for comp in comps[near]))
+    return result
+
+def print_spikes():
+    '''Output the CPU_PEAK spike bursts, to csv and html files next to the
+    --out2csv and --out2html files'''
+    spikes = detect_spikes()
+    if 'COMP_NAME' in perf_stats:
+        # the name in the firmware run of the burst, see process_kmsg_file()
+        spikes.insert(1, 'COMP_NAME', [
+            comp_name_segments[seg].get(comp, perf_stats['COMP_NAME'][comp])
+            for comp, seg in zip(spikes['COMP_ID'], spikes['SEGMENT'])])
+    print_extra_table('CPU_PEAK spikes:', spikes, 'spikes')
+
+def print_extra_table(title: str, table: pd.DataFrame, suffix: str):
+    '''Print an additional result table, and write it to csv and html files
+    named with the suffix next to the --out2csv and --out2html files'''
+    with pd.option_context('display.float_format', '{:0.3f}'.format,
+                           'display.max_rows', None,
+                           'display.max_columns', None):
+        print(f'\n{title}')
+        print(table)
+
+    for out, write in ((args.out2csv, table.to_csv), (args.out2html, table.to_html)):
+        if out is not None:
+            write(out.with_name(f'{out.stem}_{suffix}{out.suffix}'),
+                  float_format='{:.3f}'.format, index=False)
+
+def read_tplg_widgets(tplg) -> dict:
+    '''Return the widget name to widget mapping of the topology file'''
+    # pylint: disable=C0415
+    from tplgtool2 import TplgBinaryFormat, GroupedTplg
+    grouped_tplg = GroupedTplg(TplgBinaryFormat().parse_file(tplg))
+    return {widget['widget']['name']: widget for widget in grouped_tplg.widget_list}
+
+def tplg_widget_tokens(token_name: str, default=None) -> dict[str, int]:
+    '''Return the widget name to value mapping of a SOF vendor token'''
+    # pylint: disable=C0415
+    from tplgtool2 import GroupedTplg, SofVendorToken
+    token = SofVendorToken[token_name]
+    return {name: GroupedTplg.get_widget_token_value(widget, token, default)
+            for name, widget in tplg_widgets.items()}
+
+def analyze_load(group: str, comp_groups: dict[str, int]) -> tuple[pd.DataFrame, pd.DataFrame]:
+    '''Sum the MCPS of all components of a group, a DSP core or a pipeline, over
+    time. Time is split into --load-window long windows, in every window the
+    average CPU_AVG and the maximum CPU_PEAK MCPS of each component are summed
+    per group. Components without perf trace in a window do not load the DSP in
+    it. The load timeline and per group statistics are returned, LOAD(MAX) is
+    the peak concurrent load of the group.
+    '''
+    window = np.floor(perf_info['TIMESTAMP'] / args.load_window) * args.load_window
+    per_comp = perf_info.groupby([window.rename('TIME'), 'COMP_ID'], observed=True).agg(
+        CPU_AVG_MCPS=('CPU_AVG_MCPS', 'mean'), CPU_PEAK_MCPS=('CPU_PEAK_MCPS', 'max')
+    ).reset_index()
+    per_comp[group] = per_comp['COMP_ID'].map(comp_groups).astype(int)
+    timeline = per_comp.groupby([group, 'TIME']).agg(
+        COMPONENTS=('COMP_ID', 'nunique'),
+        CPU_AVG_MCPS=('CPU_AVG_MCPS', 'sum'), CPU_PEAK_MCPS=('CPU_PEAK_MCPS', 'sum')
+    ).reset_index()
+    grouped = timeline.groupby(group)
+    stats = pd.concat([
+        grouped['COMPONENTS'].max(),
+        grouped['CPU_AVG_MCPS'].mean(),
+        grouped['CPU_AVG_MCPS'].max(),
+        grouped['CPU_PEAK_MCPS'].max(),
+        grouped['CPU_AVG_MCPS'].idxmax().map(timeline['TIME'])
+        ], axis=1
+    )
+    stats.columns = ['COMPONENTS', 'LOAD(AVG)', 'LOAD(MAX)', 'PEAK_LOAD(MAX)', 'LOAD(MAX)_TIME']
+    return timeline, stats.reset_index()
+
+def print_core_load():
+    '''Output the per DSP core and per pipeline load, the core of a component is
+    taken from the SOF_TKN_COMP_CORE_ID token of the topology widget with the
+    component name, the pipeline from the pipeline ID of the component'''
+    # components without the core token are created on core 0
+    cores = tplg_widget_tokens('SOF_TKN_COMP_CORE_ID', 0)
+    comp_names = perf_stats['COMP_NAME']
+    # -1 for components not found in the topology
+    comp_cores = {comp: cores.get(name, -1) for comp, name in comp_names.items()}
+    comp_pplns = {comp: int(comp.split('-')[0]) for comp in perf_stats.index}
+
+    timeline, stats = analyze_load('CORE', comp_cores)
+    print_extra_table('DSP core load in MCPS:', stats, 'cores')
+    if args.out2csv is not None:
+        timeline.to_csv(args.out2csv.with_name(f'{args.out2csv.stem}_cores_timeline.csv'),
+                        sep=',', float_format='{:.3f}'.format, index=False)
+    _, stats = analyze_load('PIPELINE', comp_pplns)
+    print_extra_table('Pipeline load in MCPS:', stats, 'pipelines')
+
+def audit_cpc() -> pd.DataFrame:
+    '''Compare the measured MODULE_CPC of every component with the CPC declared
+    with SOF_TKN_COMP_CPC by its topology widget. The measured MODULE_CPC is the
+    suggested CPC. The declared CPC is too low when it is below the suggestion,
+    the module risks overload, and too high when it is more than
+    --cpc-high-ratio times the suggestion, DSP headroom is wasted.
+    '''
+    declared = tplg_widget_tokens('SOF_TKN_COMP_CPC')
+    audit = perf_stats[['COMP_NAME', 'MODULE_CPC']].rename_axis('COMP_ID').reset_index()
+    audit = audit[audit['COMP_NAME'].isin(declared.keys())]
+    audit = audit.rename(columns={'MODULE_CPC': 'SUGGESTED_CPC'})
+    audit.insert(2, 'DECLARED_CPC', audit['COMP_NAME'].map(declared).astype('Int64'))
+    audit['RATIO'] = audit['DECLARED_CPC'] / audit['SUGGESTED_CPC']
+    audit['STATUS'] = np.select(
+        [audit['DECLARED_CPC'].isna().to_numpy(),
+         (audit['DECLARED_CPC'] < audit['SUGGESTED_CPC']).to_numpy(dtype=bool, na_value=False),
+         (audit['RATIO'] > args.cpc_high_ratio).to_numpy(dtype=bool, na_value=False)],
+        ['MISSING', 'TOO_LOW', 'TOO_HIGH'], default='OK')
+    return audit
+
+def print_cpc_audit(audit: pd.DataFrame):
+    '''Output the CPC audit, the suggested CPC of every audited widget is
+    written as a JSON list to --cpc2json'''
+    print_extra_table('Measured vs declared CPC:', audit, 'cpc')
+    for _, row in audit[audit['STATUS'].isin(['TOO_LOW', 'TOO_HIGH'])].iterrows():
+        print(f'CPC {row["STATUS"]}: {row["COMP_NAME"]} declared {row["DECLARED_CPC"]}, '
+              f'measured {row["SUGGESTED_CPC"]}', file=sys.stderr)
+
+    if args.cpc2json is not None:
+        suggestions = [{'widget': row['COMP_NAME'], 'comp_id': row['COMP_ID'],
+                        'declared_cpc': None if pd.isna(row['DECLARED_CPC'])
+                                        else int(row['DECLARED_CPC']),
+                        'suggested_cpc': int(row['SUGGESTED_CPC']), 'status': row['STATUS']}
+                       for _, row in audit.iterrows()]
+        with open(args.cpc2json, 'w', encoding='utf8') as f:
+            json.dump(suggestions, f, indent=2)
+            f.write('\n')
+
+def print_baseline_comparison(comparison: pd.DataFrame):
+    '''Output the comparison with the baseline run, to csv and html files next
+    to the --out2csv and --out2html files'''
+    table = comparison.reset_index()
+    print_extra_table(f'Comparison with baseline {args.baseline}:', table, 'baseline')
+
+    for _, row in table[table['REGRESSED']].iterrows():
+        print(f'Regression: {row.iloc[0]} CPU_AVG(AVG) '
+              f'{row["CPU_AVG(AVG)_BASE"]:.3f} -> {row["CPU_AVG(AVG)_CURR"]:.3f} MCPS '
+              f'({row["CPU_AVG(AVG)_DELTA(%)"]:+.1f}%, p={row["P_VALUE"]:.3g})', file=sys.stderr)
+
+FOLLOW_STATS_COL = ['SAMPLES', 'CPU_AVG(AVG)', 'CPU_AVG(MAX)', 'CPU_PEAK(AVG)', 'CPU_PEAK(MAX)']
+
+class RollingPerfWindow:
+    '''Rolling window of the latest perf samples per component for the follow mode.
+    Each component keeps at most `size` samples in a ring buffer, so memory stays
+    bounded however long the trace grows.
+    '''
+    def __init__(self, size: int):
+        self.size = size
+        self.samples: dict[str, deque] = {}
+        # CPU_PEAK histogram of the whole run, its memory is bounded, too
+        self.peak_hists: dict[str, LogHistogram] = {}
+        self.last_timestamp = 0.0
+
+    def add(self, comp: str, timestamp: float, cpu_avg_mcps: float, cpu_peak_mcps: float):
+        '''Add a sample of a component, the oldest one is dropped on full window'''
+        if (ring := self.samples.get(comp)) is None:
+            ring = self.samples[comp] = deque(maxlen=self.size)
+            self.peak_hists[comp] = LogHistogram()
+        ring.append((cpu_avg_mcps, cpu_peak_mcps))
+        self.peak_hists[comp].add(cpu_peak_mcps)
+        self.last_timestamp = timestamp
+
+    def stats(self) -> pd.DataFrame:
+        '''Per component statistics of the samples in the window, followed by
+        CPU_PEAK percentiles of the whole run'''
+        rows = {}
+        for comp, ring in sorted(self.samples.items()):
+            cpu_avg = [sample[0] for sample in ring]
+            cpu_peak = [sample[1] for sample in ring]
+            hist = self.peak_hists[comp]
+            rows[comp] = [len(ring), sum(cpu_avg) / len(ring), max(cpu_avg),
+                          sum(cpu_peak) / len(ring), max(cpu_peak), len(hist)] + \
+                         [hist.quantile(p / 100) for p in PERCENTILES]
+        return pd.DataFrame.from_dict(
+            rows, orient='index',
+            columns=FOLLOW_STATS_COL + ['RUN_SAMPLES'] +
+                    [f'RUN_CPU_PEAK(P{p:g})' for p in PERCENTILES])
+
+def tail_lines(filename, idle_timeout: float) -> Generator[list[str], None, None]:
+    '''Yield batches of complete lines appended to filename. An empty batch is
+    yielded when no new data is available, so the caller can do periodic work.
+    A trailing partial line is kept until it is completed. The file is read from
+    the start again if it is truncated. Stop when the file did not grow for
+    idle_timeout seconds, 0 means never stop.
+    '''
+    partial = b''
+    last_data = time.monotonic()
+    with open(filename, 'rb') as file:
+        while True:
+            data = file.read(CHUNK_READ_HINT)
+            if not data:
+                if os.path.getsize(filename) < file.tell():
+                    file.seek(0)
+                    partial = b''
+                if idle_timeout and time.monotonic() - last_data > idle_timeout:
+                    return
+                yield []
+                time.sleep(0.2)
+                continue
+            last_data = time.monotonic()
+            lines = (partial + data).split(b'\n')
+            partial = lines.pop()
+            yield [line.decode('utf8', errors='ignore') + '\n' for line in lines]
+
+def print_follow_stats(window: RollingPerfWindow, comp_names: dict[str, str]):
+    '''Print and write the rolling window statistics of the follow mode'''
+    stats = window.stats()
+    if stats.empty:
+        return
+    stats.insert(0, 'COMP_NAME', [comp_names.get(comp) for comp in stats.index])
+    stats = stats.rename_axis('COMP_ID').reset_index()
+    stats.insert(0, 'TIMESTAMP', window.last_timestamp)
+    print(f'--- rolling window of last {window.size} samples at trace time '
+          f'{window.last_timestamp:.3f} s ---')
+    with pd.option_context('display.float_format', '{:0.3f}'.format,
+                           'display.max_rows', None,
+                           'display.max_columns', None):
+        print(stats.drop(columns='TIMESTAMP'))
+
+    if args.overload_mcps is not None:
+        overloaded = stats[stats['CPU_PEAK(MAX)'] > args.overload_mcps]
+        for _, row in overloaded.iterrows():
+            print(f"WARNING: {row['COMP_ID']} ({row['COMP_NAME']}) CPU_PEAK "
+                  f"{row['CPU_PEAK(MAX)']:.3f} MCPS exceeds {args.overload_mcps} MCPS",
+                  file=sys.stderr)
+
+    if args.out2csv is not None:
+        write_header = not args.out2csv.exists() or args.out2csv.stat().st_size == 0
+        stats.to_csv(args.out2csv, sep=',', float_format='{:.3f}'.format, index=False,
+                     mode='a', header=write_header)
+
     if args.out2html is not None:
         stats.to_html(args.out2html, float_format='{:.3f}'.format, index=False)
 
+def follow_trace_file():
+    '''Follow the growing trace file like 'tail -f', parse the new lines
+    incrementally and report rolling window CPU_AVG/CPU_PEAK MCPS per component
+    every args.interval seconds, until interrupted or the file stops growing.
+    '''
+    window = RollingPerfWindow(args.window)
+    comp_names = {}
+    kmsg_size = None
+    skipping = args.skip_to_first_trace
+    ts_shift = 0
+    ts_prev = None
+    next_report = time.monotonic() + args.interval
+    try:
+        for lines in tail_lines(args.filename, args.follow_timeout):
+            for item in make_trace_item(lines, dispatched_only=True):
+                if skipping:
+                    if int(item.timestamp) != 0:
+                        continue
+                    skipping = False
+                if ts_prev is not None and item.timestamp < ts_prev - TS_WRAP_TOLERANCE:
+                    ts_shift = ts_shift + UINT32_MAX / DSP_TIMER
+                ts_prev = item.timestamp
+                if item.func != 'comp_copy':
+                    continue
+                comp, _, period, cpu_avg, cpu_peak = parse_perf_msg(item)
+                window.add(comp, item.timestamp + ts_shift, cpu_avg / period, cpu_peak / period)
+            if time.monotonic() < next_report:
+                continue
+            next_report += args.interval
+            # the kernel message file may grow during the test, too
+            if args.kmsg is not None and args.kmsg.exists() and \
+               kmsg_size != args.kmsg.stat().st_size:
+                kmsg_size = args.kmsg.stat().st_size
+                comp_names = read_comp_names(args.kmsg)
+            print_follow_stats(window, comp_names)
+    except KeyboardInterrupt:
+        pass
+    if args.kmsg is not None and args.kmsg.exists():
+        comp_names = read_comp_names(args.kmsg)
+    print_follow_stats(window, comp_names)
+
 def parse_args():
     '''Parse command line arguments'''
     parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
@@ -299,13 +1534,81 @@ def parse_args():
                     help='Output SOF performance statistics to csv file')
     parser.add_argument('--out2html', type=pathlib.Path, required=False,
                     help='Output SOF performance statistics to html file')
+    parser.add_argument('--hist2csv', type=pathlib.Path, required=False,
+                    help='Output per component CPU_AVG and CPU_PEAK MCPS histograms to csv file')
     parser.add_argument('-s', '--skip-to-first-trace', action="store_true",  default=False,
                         help='''In CI test, some traces from previous test case will appear in
 the mtrace of current test case, this flag is used to denote if we
 want to skip until the first line with a timestamp between 0 and 1s.
 For CI test, set the flag to True''')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='''Parse the trace file in parallel with JOBS worker processes,
+the file is split at line boundaries. Results are identical to the serial
+parsing, this helps with multi-GB traces''')
+    parser.add_argument('--cache-dir', type=pathlib.Path, required=False,
+                        help='''Keep the parsed trace in a NumPy .npz file in this directory.
+The cache is keyed by size, mtime and inode of the trace file, later runs on
+the same trace load the cache instead of parsing the text again. The content
+hash of the trace is only compared when the mtime or inode changed''')
+    parser.add_argument('--tplg', type=pathlib.Path, required=False,
+                        help='''Topology file of the test, used with --kmsg to sum the load of
+components per DSP core and per pipeline over time''')
+    parser.add_argument('--load-window', type=float, default=1,
+                        help='Length in seconds of the time windows of --tplg load, should not\n'
+                        'be shorter than the perf trace interval, defaults to 1')
+    parser.add_argument('--cpc-audit', action="store_true", default=False,
+                        help='''Compare the measured MODULE_CPC with the SOF_TKN_COMP_CPC declared
+by the --tplg topology for every widget, too low CPC risks overload, too
+high CPC wastes DSP headroom''')
+    parser.add_argument('--cpc-high-ratio', type=float, default=CPC_HIGH_RATIO,
+                        help='Declared to measured CPC ratio above which the declared CPC is too\n'
+                        f'high, defaults to {CPC_HIGH_RATIO}')
+    parser.add_argument('--cpc2json', type=pathlib.Path, required=False,
+                        help='Output suggested CPC values of --cpc-audit to json file')
+    parser.add_argument('--baseline', type=pathlib.Path, required=False,
+                        help='''Compare with a previous run, given as the csv file written with
+--out2csv or as the .npz cache written with --cache-dir. Only the cache has
+per sample data for the significance test. The comparison is written next
+to the --out2csv and --out2html files with a _baseline suffix, the exit
+status is 1 when a component regresses''')
+    parser.add_argument('--regress-threshold', type=float, default=10,
+                        help='CPU_AVG(AVG) increase in percent over the baseline reported as\n'
+                        'regression, defaults to 10')
+    parser.add_argument('--alpha', type=float, default=0.01,
+                        help='Significance level of the baseline comparison, defaults to 0.01')
+    parser.add_argument('--spikes', action="store_true", default=False,
+                        help='''Report when the CPU_PEAK of components spiked: bursts of samples
+above --spike-mcps or above --spike-ratio times the rolling median, with
+their start, duration and the other components spiking at the same time''')
+    parser.add_argument('--spike-mcps', type=float, required=False,
+                        help='CPU_PEAK MCPS above which a sample is a spike, implies --spikes')
+    parser.add_argument('--spike-ratio', type=float, default=SPIKE_RATIO,
+                        help='Ratio to the rolling median CPU_PEAK above which a sample is a\n'
+                        f'spike, 0 disables it, defaults to {SPIKE_RATIO}')
+    parser.add_argument('--spike-baseline', type=int, default=SPIKE_BASELINE,
+                        help='Number of samples of the rolling median CPU_PEAK, defaults to\n'
+                        f'{SPIKE_BASELINE}')
+    parser.add_argument('-f', '--follow', action="store_true", default=False,
+                        help='''Follow the growing trace file and report rolling window statistics
+every INTERVAL seconds until interrupted with Ctrl-C. With --out2csv, every
+report is appended to the csv file''')
+    parser.add_argument('--interval', type=float, default=10,
+                        help='Report interval in seconds in follow mode, defaults to 10')
+    parser.add_argument('--window', type=int, default=1000,
+                        help='Number of latest samples per component in the rolling window of\n'
+                        'follow mode, defaults to 1000')
+    parser.add_argument('--follow-timeout', type=float, default=0,
+                        help='Stop following when the trace file did not grow for this many\n'
+                        'seconds, defaults to 0 (never)')
+    parser.add_argument('--overload-mcps', type=float, required=False,
+                        help='Warn in follow mode when a CPU_PEAK in the window exceeds this MCPS')
 
-    return parser.parse_args()
+    parsed = parser.parse_args()
+    if parsed.tplg is not None and parsed.kmsg is None:
+        parser.error('--tplg requires --kmsg to find the topology widget of components')
+    if (parsed.cpc_audit or parsed.cpc2json is not None) and parsed.tplg is None:
+        parser.error('--cpc-audit requires --tplg and --kmsg')
+    return parsed
 
 def main():
     '''The main entry'''
@@ -313,7 +1616,11 @@ def main():
     global args
     args = parse_args()
 
-    process_trace_file()
+    if args.follow:
+        follow_trace_file()
+        return
+
+    load_trace_file()
 
     analyze_perf_info()
 
@@ -322,5 +1629,26 @@ def main():
 
     print_perf_info()
 
+    print_trace_events()
+
+    print_segment_stats()
+
+    if args.spikes or args.spike_mcps is not None:
+        print_spikes()
+
+    if args.tplg is not None:
+        # pylint: disable=W0603
+        global tplg_widgets
+        tplg_widgets = read_tplg_widgets(args.tplg)
+        print_core_load()
+        if args.cpc_audit or args.cpc2json is not None:
+            print_cpc_audit(audit_cpc())
+
+    if args.baseline is not None:
+        comparison = compare_with_baseline()
+        print_baseline_comparison(comparison)
+        if comparison['REGRESSED'].any():
+            sys.exit(1)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright(c) 2025 Intel Corporation. All rights reserved.
+
+'''Correlated timeline of the kernel log, the firmware trace and the output
+of the kernel_tracing bpftrace scripts, written as a single Chrome/Perfetto
+trace event JSON file (open it in https://ui.perfetto.dev or chrome://tracing).
+
+Inputs, only the kernel log is required:
+    - 'journalctl -k -o short-precise' or 'short-monotonic' kernel log with
+      SOF IPC debug enabled, as read by sof-ipc-timer.py
+    - firmware trace (mtrace) with the IPC timing lines of a firmware built
+      with CONFIG_DEBUG_IPC_TIMINGS, and the perf traces read by
+      sof_perf_analyzer.py
+    - per event output of the ipc_tx_time.bt and hda_irq_source_deltas.bt
+      bpftrace scripts, both may be in the same file
+
+Every source has its own clock. The kernel log is the reference, the other
+clocks are aligned to it on the IPC messages seen by both sides: the firmware
+IPC done line with the kernel 'ipc tx reply' line of the same header, and
+the bpftrace sof_ipc_tx_message() call with the kernel 'ipc tx' line. The
+offset is tracked from anchor to anchor, so clock drift, DSP timer wraps
+and firmware reloads are followed.
+
+The inputs are streamed twice: the first pass collects only the anchor time
+stamps, the second one writes the trace events as they are read, so the
+memory use does not grow with the size of the logs, only with the count of
+IPC messages.
+
+Example:
+    sof_timeline.py dmesg.txt -f mtrace.txt -b bpftrace.txt -o timeline.json
+'''
+
+import sys
+import json
+import array
+import bisect
+import argparse
+import statistics
+import importlib.util
+from pathlib import Path
+from dataclasses import dataclass
+
+import numpy as np
+
+import sof_perf_analyzer
+
+def load_ipc_timer():
+    '''Import sof-ipc-timer.py, its file name is not a module name. This
+    is the one loader of it for the other tools and the tests.'''
+    spec = importlib.util.spec_from_file_location(
+        'sof_ipc_timer', Path(__file__).with_name('sof-ipc-timer.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+ipc_timer = load_ipc_timer()
+
+# Largest distance in microseconds of a matched anchor from its expected
+# kernel time, the variation of the interrupt and logging latency between
+# the two sides. The sof_ipc_tx_message() kprobe and the ipc tx line are on
+# the same CPU and clock, the firmware IPC done trace is followed by the
+# reply interrupt.
+FW_ALIGN_JITTER = 100
+BPF_ALIGN_JITTER = 10
+
+# Count of anchors scored by the initial offset search, and the quantile of
+# their distances to the nearest kernel anchors that must be within the jitter
+ALIGN_WINDOW = 32
+ALIGN_QUANTILE = 0.9
+
+# The offset is searched again after this many consecutive misses, for
+# example after a firmware reload
+ALIGN_RESYNC_MISSES = 8
+
+# Offset changes larger than this many microseconds between two anchors are
+# clock steps, the offset is not interpolated over them
+ALIGN_CLOCK_STEP = 1000
+
+# Chrome trace process ids of the sources
+KERNEL_PID = 1
+FW_PID = 2
+BPF_PID = 3
+
+# Microseconds of the DSP timer wrap period
+FW_WRAP_USECS = sof_perf_analyzer.UINT32_MAX / sof_perf_analyzer.DSP_TIMER * 1000000
+
+@dataclass(slots=True)
+class KernelIpc:
+    '''An IPC message of the kernel log, time stamps in microseconds'''
+    tx: int
+    reply: int
+    done: int
+    header: str
+    name: str
+
+def read_kernel_log(klog):
+    '''Yield the IPC messages of the kernel log as KernelIpc, and the other
+    SOF debug lines of sof-ipc-timer.py as (usecs, tag, message) tuples'''
+    timestamp = ipc_timer.JournalTimestamp()
+    tx = None
+    with open(klog, 'r', encoding='utf8', errors='replace') as f:
+        for line in f:
+            # the device name and the message follow the function tag, or
+            # the kernel prefix of a log without the tags
+            if ipc_timer.KERNEL_TAG_SENTINEL in line and \
+               (match_obj := ipc_timer.KERNEL_TAG_RE.search(line)) is not None:
+                tag, device = match_obj.group(1), line[match_obj.end():]
+            elif ipc_timer.KERNEL_MSG_SENTINEL in line and \
+                 (match_obj := ipc_timer.KERNEL_MSG_RE.search(line)) is not None:
+                tag, device = match_obj.lastgroup, line.partition(' kernel: ')[2]
+            else:
+                continue
+            usecs = timestamp.decode(line)
+            message = device.strip().partition(': ')[2]
+            if (header_type := ipc_timer.IPC_HEADER_RE.search(line)) is None:
+                yield (usecs, tag, message)
+                continue
+            header, _, name = line[header_type.end():].lstrip(': ').partition(': ')
+            if header_type.group(1) == '     ':
+                tx = KernelIpc(usecs, None, None, header, name.strip())
+            elif tx is not None and header_type.group(1) == 'reply':
+                tx.reply = usecs
+            elif tx is not None and header == tx.header:
+                tx.done = usecs
+                if tx.reply is None:
+                    tx.reply = usecs
+                yield tx
+                tx = None
+
+def read_fw_trace(filename):
+    '''Yield (usecs, TraceItem) of the firmware trace. The time is made
+    monotonic: DSP timer wraps are corrected like sof_perf_analyzer.py does,
+    and after a firmware reload the time continues from the last trace.'''
+    fw_runs = sof_perf_analyzer.FwRunDetector()
+    shift = 0.0
+    prev = None
+    with open(filename, 'r', encoding='utf8', errors='ignore') as f:
+        for item in sof_perf_analyzer.make_trace_item(f, fw_runs.on_boot):
+            if prev is None:
+                fw_runs.reset()
+            elif fw_runs.is_reload(prev, item.timestamp):
+                shift += prev - item.timestamp
+            elif item.timestamp < prev - sof_perf_analyzer.TS_WRAP_TOLERANCE:
+                shift += FW_WRAP_USECS / 1000000
+            prev = item.timestamp
+            yield (item.timestamp + shift) * 1000000, item
+
+def parse_fw_ipc(item):
+    '''(header, usecs) of a firmware IPC timing trace, None for other traces:
+    rx-done	: 0x40000004|0x15 in 266 us'''
+    if (match_obj := ipc_timer.FW_LOG_HEADER_RE.search(item.msg)) is None:
+        return None
+    fields = item.msg[match_obj.start():].split()
+    if len(fields) < 3 or not fields[2].isdigit():
+        return None
+    return match_obj.group(), int(fields[2])
+
+def read_bpftrace(filename):
+    '''Yield the events of the bpftrace scripts in microseconds of
+    CLOCK_MONOTONIC, the other output lines are skipped:
+    ('ipc_tx', start, duration) from 'ipc_tx <start nsecs> <duration nsecs>'
+    ('hda_irq', time, source) from 'hda_irq <source> <nsecs>'
+    '''
+    with open(filename, 'r', encoding='utf8', errors='replace') as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) != 3:
+                continue
+            if fields[0] == 'ipc_tx' and fields[1].isdigit() and fields[2].isdigit():
+                yield ('ipc_tx', int(fields[1]) / 1000, int(fields[2]) / 1000)
+            elif fields[0] == 'hda_irq' and fields[2].isdigit():
+                yield ('hda_irq', int(fields[2]) / 1000, fields[1])
+
+class Anchors:
+    '''Time stamps in microseconds of the IPC messages of a clock, with the
+    IPC header of the message when the source logs it'''
+    def __init__(self):
+        self.times = array.array('d')
+        self.keys = []
+        self.key_ids = {}
+
+    def __len__(self):
+        return len(self.times)
+
+    def append(self, usecs, key=None):
+        self.times.append(usecs)
+        # intern the header strings
+        self.keys.append(self.key_ids.setdefault(key, key))
+
+class ClockAlignment:
+    '''Offsets of another clock to the kernel clock, found by matching the
+    anchors of the other clock to the kernel anchors with the same key. The
+    initial offset is searched among the offsets that match the first anchor
+    exactly: it is the one with the least ALIGN_QUANTILE distance of the
+    next ALIGN_WINDOW anchors to their nearest kernel anchors, if that is
+    within the jitter. The IPC messages are sent every few hundred
+    microseconds and the test sequences repeat, so a loose match would also
+    accept the offsets shifted by a few messages or by a test cycle. From there on every anchor
+    is matched to the kernel anchor nearest to the previous offset, and the
+    offset follows the match. A time is mapped with the offset interpolated
+    between the matched anchors around it, or with the nearer one over a
+    clock step.
+    '''
+    def __init__(self, ref: Anchors, other: Anchors, jitter: float):
+        self.ref = ref
+        self.jitter = jitter
+        # kernel anchor times by key, all of them for the anchors without key
+        self.key_times = {None: np.frombuffer(ref.times, dtype=np.float64)}
+        keys = np.array(ref.keys, dtype=object)
+        for key in set(other.keys) - {None}:
+            self.key_times[key] = self.key_times[None][keys == key]
+        self.match_times = array.array('d')
+        self.offsets = array.array('d')
+        self.anchors = len(other)
+        self.align(other)
+
+    def initial_offset(self, other: Anchors, start: int):
+        '''Offset of the ALIGN_WINDOW anchors from start, None if none
+        matches them within the jitter'''
+        candidates = self.key_times[other.keys[start]] - other.times[start]
+        window = range(start, min(start + ALIGN_WINDOW, len(other)))
+        best, best_distance = None, self.jitter
+        # score the candidates in chunks to bound the memory use
+        for chunk in np.array_split(candidates, max(1, len(candidates) // 4096)):
+            if len(chunk) == 0:
+                continue
+            nearest = np.empty((len(chunk), len(window)))
+            for column, index in enumerate(window):
+                times = self.key_times[other.keys[index]]
+                expected = other.times[index] + chunk
+                after = np.searchsorted(times, expected)
+                nearest[:, column] = np.minimum(
+                    np.abs(times[np.minimum(after, len(times) - 1)] - expected),
+                    np.abs(times[np.maximum(after - 1, 0)] - expected))
+            distances = np.quantile(nearest, ALIGN_QUANTILE, axis=1)
+            if distances.min() <= best_distance:
+                best, best_distance = float(chunk[distances.argmin()]), float(distances.min())
+        return best
+
+    def nearest(self, expected: float, key):
+        '''Index of the kernel anchor with key nearest to expected, None if
+        none is within the jitter'''
+        times = self.ref.times
+        best = None
+        index = bisect.bisect_left(times, expected - self.jitter)
+        while index < len(times) and times[index] <= expected + self.jitter:
+            if (key is None or self.ref.keys[index] == key) and \
+               (best is None or abs(times[index] - expected) < abs(times[best] - expected)):
+                best = index
+            index += 1
+        return best
+
+    def track(self, other: Anchors, indices, offset: float):
+        '''Match the anchors at indices in order from offset on, return the
+        matched (time, offset) pairs and the position in indices of the
+        first of ALIGN_RESYNC_MISSES consecutive misses, or len(indices)'''
+        matches = []
+        misses = 0
+        for position, index in enumerate(indices):
+            match = self.nearest(other.times[index] + offset, other.keys[index])
+            if match is None:
+                misses += 1
+                if misses >= ALIGN_RESYNC_MISSES:
+                    return matches, position - misses + 1
+                continue
+            offset = self.ref.times[match] - other.times[index]
+            matches.append((other.times[index], offset))
+            misses = 0
+        return matches, len(indices)
+
+    def align(self, other: Anchors):
+        '''Match the anchors of the other clock, see the class description.
+        The offset is searched again from the first of too many misses, the
+        found offset matches the anchor the search starts from. After failed
+        searches the next one is tried exponentially further, the anchors
+        skipped are matched backwards from the offset found.'''
+        index = done = 0
+        skip = ALIGN_WINDOW
+        while index < len(other):
+            offset = self.initial_offset(other, index)
+            if offset is None:
+                index += skip
+                skip *= 2
+                continue
+            skip = ALIGN_WINDOW
+            backward, _ = self.track(other, range(index - 1, done - 1, -1), offset)
+            forward, stop = self.track(other, range(index, len(other)), offset)
+            for usecs, match_offset in backward[::-1] + forward:
+                self.match_times.append(usecs)
+                self.offsets.append(match_offset)
+            index = done = index + stop
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def to_kernel(self, usecs: float) -> float:
+        '''Map a time of the other clock to the kernel clock'''
+        index = bisect.bisect_right(self.match_times, usecs)
+        if index == 0:
+            return usecs + self.offsets[0]
+        if index == len(self.offsets):
+            return usecs + self.offsets[-1]
+        before, after = self.offsets[index - 1], self.offsets[index]
+        start, end = self.match_times[index - 1], self.match_times[index]
+        if abs(after - before) > ALIGN_CLOCK_STEP:
+            return usecs + (before if usecs - start < end - usecs else after)
+        return usecs + before + (after - before) * (usecs - start) / (end - start)
+
+    def summary(self, name: str):
+        '''Print the matched anchor count, the offset, the clock steps and
+        the drift between them'''
+        if len(self) == 0:
+            print(f'{name}: none of {self.anchors} IPC anchors matched the kernel log, '
+                  'the events are not written')
+            return
+        offset_diffs = np.diff(np.frombuffer(self.offsets, dtype=np.float64))
+        time_diffs = np.diff(np.frombuffer(self.match_times, dtype=np.float64))
+        steps = np.abs(offset_diffs) > ALIGN_CLOCK_STEP
+        elapsed = time_diffs[~steps].sum()
+        drift = offset_diffs[~steps].sum() / elapsed * 1e6 if elapsed else 0.0
+        print(f'{name}: {len(self)} of {self.anchors} IPC anchors matched, '
+              f'offset {statistics.median(self.offsets) / 1e6:.6f} s, '
+              f'{steps.sum()} clock steps, drift {drift:.1f} ppm')
+
+class TraceWriter:
+    '''Chrome trace event JSON writer, every event is written when it is
+    added, so the events are never held in memory'''
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+        self.f.write('{"traceEvents": [\n')
+
+    def add(self, event: dict):
+        if self.count:
+            self.f.write(',\n')
+        # json.dumps() runs the C encoder, json.dump() does not
+        self.f.write(json.dumps(event))
+        self.count += 1
+
+    def name(self, pid: int, name: str, tid: int | None = None):
+        '''Name a process, or a thread of it'''
+        if tid is None:
+            self.add({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': name}})
+        else:
+            self.add({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                      'args': {'name': name}})
+
+    def close(self):
+        self.f.write('\n], "displayTimeUnit": "ms"}\n')
+
+def kernel_anchors(klog):
+    '''Kernel anchors of the bpftrace IPC calls (the tx time) and of the
+    firmware IPC done traces (the reply time by header)'''
+    tx, reply = Anchors(), Anchors()
+    for event in read_kernel_log(klog):
+        if isinstance(event, KernelIpc):
+            tx.append(event.tx)
+            reply.append(event.reply, event.header)
+    return tx, reply
+
+def fw_anchors(fw_trace):
+    anchors = Anchors()
+    for usecs, item in read_fw_trace(fw_trace):
+        if (fw_ipc := parse_fw_ipc(item)) is not None:
+            anchors.append(usecs, fw_ipc[0])
+    return anchors
+
+def bpftrace_anchors(bpftrace):
+    anchors = Anchors()
+    for kind, usecs, _ in read_bpftrace(bpftrace):
+        if kind == 'ipc_tx':
+            anchors.append(usecs)
+    return anchors
+
+def write_kernel_events(writer: TraceWriter, klog):
+    writer.name(KERNEL_PID, 'kernel')
+    writer.name(KERNEL_PID, 'IPC', 1)
+    writer.name(KERNEL_PID, 'SOF debug', 2)
+    for event in read_kernel_log(klog):
+        if isinstance(event, KernelIpc):
+            writer.add({'name': event.name, 'cat': 'ipc', 'ph': 'X', 'pid': KERNEL_PID, 'tid': 1,
+                        'ts': event.tx, 'dur': event.done - event.tx,
+                        'args': {'header': event.header, 'reply_us': event.reply - event.tx}})
+        else:
+            usecs, tag, message = event
+            writer.add({'name': tag, 'ph': 'i', 's': 't', 'pid': KERNEL_PID, 'tid': 2,
+                        'ts': usecs, 'args': {'message': message}})
+
+def write_fw_events(writer: TraceWriter, fw_trace, alignment: ClockAlignment, comp_names):
+    '''Write the IPC handling, the MCPS of the perf traces as counters per
+    component, and the warning and error traces of the firmware'''
+    writer.name(FW_PID, 'firmware')
+    writer.name(FW_PID, 'IPC', 1)
+    writer.name(FW_PID, 'warnings and errors', 2)
+    for usecs, item in read_fw_trace(fw_trace):
+        if (fw_ipc := parse_fw_ipc(item)) is not None:
+            header, handling = fw_ipc
+            writer.add({'name': header, 'cat': 'ipc', 'ph': 'X', 'pid': FW_PID, 'tid': 1,
+                        'ts': alignment.to_kernel(usecs) - handling, 'dur': handling})
+        elif item.func == 'comp_copy':
+            comp, _, period, cpu_avg, cpu_peak = sof_perf_analyzer.parse_perf_msg(item)
+            writer.add({'name': comp_names.get(comp, comp), 'cat': 'perf', 'ph': 'C',
+                        'pid': FW_PID, 'ts': alignment.to_kernel(usecs),
+                        'args': {'CPU_AVG_MCPS': cpu_avg / period,
+                                 'CPU_PEAK_MCPS': cpu_peak / period}})
+        elif item.level in ('wrn', 'err'):
+            writer.add({'name': f'{item.context}: {item.func}', 'ph': 'i', 's': 't',
+                        'pid': FW_PID, 'tid': 2, 'ts': alignment.to_kernel(usecs),
+                        'args': {'message': item.msg}})
+
+def write_bpftrace_events(writer: TraceWriter, bpftrace, alignment: ClockAlignment,
+                          irq_tids: dict):
+    '''Write the sof_ipc_tx_message() calls, and the HDA irqs on a thread
+    per irq source'''
+    for kind, usecs, value in read_bpftrace(bpftrace):
+        if kind == 'ipc_tx':
+            writer.add({'name': 'sof_ipc_tx_message', 'cat': 'ipc', 'ph': 'X', 'pid': BPF_PID,
+                        'tid': 1, 'ts': alignment.to_kernel(usecs), 'dur': value})
+            continue
+        if value not in irq_tids:
+            irq_tids[value] = len(irq_tids) + 2
+            writer.name(BPF_PID, f'hda irq {value}', irq_tids[value])
+        writer.add({'name': f'hda irq {value}', 'cat': 'irq', 'ph': 'i', 's': 't',
+                    'pid': BPF_PID, 'tid': irq_tids[value], 'ts': alignment.to_kernel(usecs)})
+
+def parse_args():
+    '''Parse command line arguments'''
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                     description=__doc__)
+    parser.add_argument('klog', type=Path, help='Kernel log, the reference clock')
+    parser.add_argument('-f', '--fw-trace', type=Path, required=False,
+                        help='Firmware trace with IPC timing lines')
+    parser.add_argument('-b', '--bpftrace', type=Path, action='append', default=[],
+                        help='Output of ipc_tx_time.bt or hda_irq_source_deltas.bt, '
+                        'can be repeated')
+    parser.add_argument('-o', '--output', type=Path, required=True,
+                        help='Chrome/Perfetto trace event json file to write')
+    parser.add_argument('--fw-jitter', type=float, default=FW_ALIGN_JITTER,
+                        help='Largest distance in microseconds of a firmware IPC trace from '
+                        f'the kernel\nreply line after the clock alignment, defaults to '
+                        f'{FW_ALIGN_JITTER}')
+    parser.add_argument('--bpf-jitter', type=float, default=BPF_ALIGN_JITTER,
+                        help='Largest distance in microseconds of a bpftrace IPC call from '
+                        f'the kernel\nipc tx line after the clock alignment, defaults to '
+                        f'{BPF_ALIGN_JITTER}')
+    return parser.parse_args()
+
+def main():
+    '''The main entry'''
+    args = parse_args()
+    tx_anchors, reply_anchors = kernel_anchors(args.klog)
+    if len(tx_anchors) == 0:
+        sys.exit(f'No IPC messages in {args.klog}, is SOF IPC debug enabled?')
+
+    fw_alignment = None
+    if args.fw_trace is not None:
+        fw_alignment = ClockAlignment(reply_anchors, fw_anchors(args.fw_trace), args.fw_jitter)
+        fw_alignment.summary(str(args.fw_trace))
+    bpf_alignments = []
+    for bpftrace in args.bpftrace:
+        bpf_alignments.append(ClockAlignment(tx_anchors, bpftrace_anchors(bpftrace),
+                                             args.bpf_jitter))
+        bpf_alignments[-1].summary(str(bpftrace))
+
+    with open(args.output, 'w', encoding='utf8') as f:
+        writer = TraceWriter(f)
+        write_kernel_events(writer, args.klog)
+        if fw_alignment:
+            write_fw_events(writer, args.fw_trace, fw_alignment,
+                            sof_perf_analyzer.read_comp_names(args.klog))
+        if any(bpf_alignments):
+            writer.name(BPF_PID, 'bpftrace')
+            writer.name(BPF_PID, 'sof_ipc_tx_message', 1)
+        irq_tids = {}
+        for bpftrace, alignment in zip(args.bpftrace, bpf_alignments):
+            if alignment:
+                write_bpftrace_events(writer, bpftrace, alignment, irq_tids)
+        writer.close()
+    print(f'{writer.count} trace events written to {args.output}')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: BSD-3-Clause
+# Copyright(c) 2025 Intel Corporation. All rights reserved.
+
+'''Synthetic SOF log generator for analyzer benchmarks and tests.
+
+Writes realistic firmware traces (mtrace) for sof_perf_analyzer.py and
+'journalctl -k -o short-precise' kernel logs with the matching firmware
+IPC timing log for sof-ipc-timer.py and the matching per event output of
+the kernel_tracing ipc_tx_time.bt and hda_irq_source_deltas.bt bpftrace
+scripts for sof_timeline.py, of configurable sizes:
+    - Zephyr float and HH:MM:SS.mmm,uuu timestamp formats
+    - DSP timer wraps every UINT32_MAX / DSP_TIMER seconds
+    - perf, LL timer, xrun and starvation traces
+    - interleaved corrupt lines: truncated lines, binary garbage, lost
+      message notes and unrelated kernel messages
+    - create/init/config/bind/trigger/unbind/delete IPC sequences
+
+Both logs describe the same pipelines, so the journal can be passed to
+sof_perf_analyzer.py --kmsg to name the components of the trace.
+
+Example:
+    sof_trace_gen.py mtrace mtrace.txt --lines 1000000 --time-format hms
+    sof_trace_gen.py journal dmesg.txt --cycles 1000 --fw-log fw-ipc.txt \
+        --bpftrace bpftrace.txt
+'''
+
+import random
+import argparse
+from datetime import datetime, timedelta
+
+# DSP timer wrap period in seconds, see sof_perf_analyzer.py
+DSP_TIMER = 38400000
+UINT32_MAX = 4294967295
+WRAP_PERIOD = UINT32_MAX / DSP_TIMER
+
+# (pipeline id, pipeline instance, core,
+#  [(widget name, module id, module instance), ...]) of the generated logs,
+# the widgets of a pipeline are bound in list order.
+GEN_PIPELINES = [
+    (1, 0, 0, [('host-copier.0.playback', 0x4, 0), ('gain.1.1', 0x9, 0),
+               ('mixin.1.1', 0x2, 0)]),
+    (2, 1, 0, [('mixout.2.1', 0x3, 0), ('eqiir.2.1', 0xa, 0),
+               ('dai-copier.SSP.NoCodec-0.playback', 0x4, 1)]),
+    (3, 2, 1, [('dai-copier.SSP.NoCodec-0.capture', 0x4, 2), ('eqfir.3.1', 0xb, 0),
+               ('host-copier.0.capture', 0x4, 3)]),
+    (4, 3, 1, [('dai-copier.DMIC.dmic01.capture', 0x4, 4), ('host-copier.1.capture', 0x4, 5)]),
+]
+
+# IPC4 message types in the primary header
+GLB_CREATE_PIPELINE = 0x11
+GLB_DELETE_PIPELINE = 0x12
+GLB_SET_PIPELINE_STATE = 0x13
+MOD_INIT_INSTANCE = 0x40
+MOD_LARGE_CONFIG_SET = 0x43
+MOD_BIND = 0x44
+MOD_UNBIND = 0x45
+
+IPC_NAMES = {
+    GLB_CREATE_PIPELINE: 'GLB_CREATE_PIPELINE',
+    GLB_DELETE_PIPELINE: 'GLB_DELETE_PIPELINE',
+    GLB_SET_PIPELINE_STATE: 'GLB_SET_PIPELINE_STATE',
+    MOD_INIT_INSTANCE: 'MOD_INIT_INSTANCE',
+    MOD_LARGE_CONFIG_SET: 'MOD_LARGE_CONFIG_SET',
+    MOD_BIND: 'MOD_BIND',
+    MOD_UNBIND: 'MOD_UNBIND',
+}
+
+# Pipeline states of GLB_SET_PIPELINE_STATE
+STATE_RESET = 2
+STATE_PAUSED = 3
+STATE_RUNNING = 4
+
+JOURNAL_DEV = 'sof-audio-pci-intel-lnl 0000:00:1f.3'
+
+# CLOCK_MONOTONIC time of the first journal line in the bpftrace output, the
+# kprobe of sof_ipc_tx_message() fires BPF_TX_LEAD before the ipc tx line is
+# logged and the kretprobe BPF_DONE_LAG after the ipc tx done line
+BPF_CLOCK_START = 73.5
+BPF_TX_LEAD = timedelta(microseconds=2)
+BPF_DONE_LAG = timedelta(microseconds=3)
+
+def perf_components() -> list[tuple[int, int]]:
+    '''(pipeline instance, component id) of all generated widgets, like
+    the firmware reports them in perf traces'''
+    return [(ppln_inst, inst << 16 | module_id)
+            for _, ppln_inst, _, widgets in GEN_PIPELINES
+            for _, module_id, inst in widgets]
+
+def format_timestamp(secs: float, time_format: str) -> str:
+    '''Format the timestamp of a trace like Zephyr logging does'''
+    if time_format == 'hms':
+        usecs = round(secs * 1000000)
+        mins, usecs = divmod(usecs, 60000000)
+        hours, mins = divmod(mins, 60)
+        return f'{hours:02d}:{mins:02d}:{usecs // 1000000:02d}.{usecs // 1000 % 1000:03d},{usecs % 1000:03d}'
+    return f'{secs:12.6f}'
+
+def corrupt_line(rng: random.Random, line: str) -> bytes:
+    '''A corrupt version of a trace line, none of them is a valid trace'''
+    kind = rng.randrange(4)
+    if kind == 0:
+        # truncated before the log function ends
+        return line[:line.index('> ') + rng.randrange(3, 12)].encode() + b'\n'
+    if kind == 1:
+        return bytes(rng.randrange(256) for _ in range(rng.randrange(8, 64))) \
+            .replace(b'\n', b'') + b'\n'
+    if kind == 2:
+        return f'--- {rng.randrange(1, 100)} messages lost ---\n'.encode()
+    return b'\n'
+
+def write_mtrace(path, lines: int, time_format: str = 'float', interval: float = 0.001,
+                 wraps: bool = True, event_ratio: float = 0.01, corrupt_ratio: float = 0.01,
+                 seed: int = 0, other_ratio: float = 0.0) -> dict[str, int]:
+    # pylint: disable=R0913,R0914,R0917
+    '''Write a firmware trace with `lines` comp_copy perf traces, one every
+    `interval` seconds, interleaved with LL timer, xrun and starvation
+    traces, traces which sof_perf_analyzer.py has no handler for and corrupt
+    lines at the given ratios. Timestamps wrap like the DSP timer does when
+    `wraps` is set. Return the count of each line kind.
+    '''
+    rng = random.Random(seed)
+    comps = perf_components()
+    counts = {'perf': 0, 'event': 0, 'other': 0, 'corrupt': 0}
+    with open(path, 'wb') as f:
+        f.write(b'*** Booting Zephyr OS build v3.7.0 ***\n')
+        for i in range(lines):
+            secs = i * interval
+            if wraps:
+                secs %= WRAP_PERIOD
+            timestamp = format_timestamp(secs, time_format)
+            ppln_id, comp_id = comps[i % len(comps)]
+            avg = 400 + rng.randrange(100)
+            line = (f'[{timestamp}] <inf> component: comp_copy: comp:{ppln_id} {comp_id:#x} '
+                    f'perf comp_copy samples 48 period 1000 cpu avg {avg} '
+                    f'peak {avg + rng.randrange(200)}\n')
+            f.write(line.encode())
+            counts['perf'] += 1
+
+            if rng.random() < event_ratio:
+                f.write(event_line(rng, timestamp, ppln_id, comp_id).encode())
+                counts['event'] += 1
+            # no draw without other traces, the trace of a seed stays the same
+            if other_ratio and rng.random() < other_ratio:
+                f.write(other_line(rng, timestamp, ppln_id, comp_id).encode())
+                counts['other'] += 1
+            if rng.random() < corrupt_ratio:
+                f.write(corrupt_line(rng, line))
+                counts['corrupt'] += 1
+    counts['lines'] = sum(counts.values()) + 1
+    return counts
+
+def event_line(rng: random.Random, timestamp: str, ppln_id: int, comp_id: int) -> str:
+    '''A LL timer, xrun or starvation trace'''
+    kind = rng.randrange(3)
+    if kind == 0:
+        core = rng.randrange(2)
+        return (f'[{timestamp}] <inf> ll_schedule: zephyr_domain_thread_fn: ll core {core} '
+                f'timer avg {rng.randrange(1900, 2100)}, max {rng.randrange(2100, 2600)}, '
+                f'overruns {int(rng.random() < 0.05)}\n')
+    if kind == 1:
+        xrun = rng.choice(['underrun due to no data available',
+                           'overrun due to no space available'])
+        return (f'[{timestamp}] <err> dai_comp: dai_report_xrun: comp:{ppln_id} {comp_id:#x} '
+                f'dai_report_xrun(): {xrun}\n')
+    return (f'[{timestamp}] <dbg> host_comp: host_get_copy_bytes_normal: comp:{ppln_id} '
+            f'{comp_id:#x} no bytes to copy, available samples: {rng.randrange(48)}, '
+            f'free_samples: {rng.randrange(48, 192)}\n')
+
+def other_line(rng: random.Random, timestamp: str, ppln_id: int, comp_id: int) -> str:
+    '''An IPC, pipeline or DMA trace, not collected by sof_perf_analyzer.py'''
+    kind = rng.randrange(3)
+    if kind == 0:
+        return (f'[{timestamp}] <inf> ipc: ipc_cmd: rx\t: {rng.randrange(1 << 32):#010x}|'
+                f'{rng.randrange(1 << 16):#x}\n')
+    if kind == 1:
+        return (f'[{timestamp}] <dbg> pipe: pipeline_schedule_copy: pipe:{ppln_id} '
+                f'{comp_id:#x} pipeline_schedule_copy()\n')
+    return (f'[{timestamp}] <dbg> host_comp: host_copy_normal: comp:{ppln_id} {comp_id:#x} '
+            f'copy_bytes {rng.randrange(48, 384) * 4}, avail {rng.randrange(1024)}\n')
+
+class JournalWriter:
+    '''Writes 'journalctl -k -o short-precise' lines with an advancing clock
+    and the firmware IPC timing log lines, which sof-ipc-timer.py matches
+    by the IPC header string: "<primary>|<extension> in <usecs> us", and
+    the bpftrace lines of every IPC message and its IPC irq
+    '''
+    # pylint: disable=R0913,R0917
+    def __init__(self, f, fw_log, start: datetime, seed: int, bpftrace=None):
+        self.f = f
+        self.fw_log = fw_log
+        self.bpftrace = bpftrace
+        self.now = start
+        self.start = start
+        self.rng = random.Random(seed)
+        self.lines = 0
+
+    def elapse(self, low: int, high: int):
+        '''Advance the clock by low to high microseconds'''
+        self.now += timedelta(microseconds=self.rng.randrange(low, high))
+
+    def kernel(self, func: str, msg: str):
+        '''Write a kernel message of a snd_sof module function'''
+        self.f.write(f'{self.now.strftime("%b %d %H:%M:%S.%f")} bench kernel: '
+                     f'{func}: {JOURNAL_DEV}: {msg}\n')
+        self.lines += 1
+
+    def noise(self):
+        '''Write an unrelated kernel message'''
+        self.f.write(f'{self.now.strftime("%b %d %H:%M:%S.%f")} bench kernel: '
+                     f'usb 1-{self.rng.randrange(1, 9)}: new high-speed USB device '
+                     f'number {self.rng.randrange(2, 64)} using xhci_hcd\n')
+        self.lines += 1
+
+    def bpf_nsecs(self, when: datetime) -> int:
+        '''CLOCK_MONOTONIC nanoseconds of a journal time'''
+        return round(BPF_CLOCK_START * 1e9) + (when - self.start) // timedelta(microseconds=1) * 1000
+
+    def ipc(self, msg_type: int, low: int, ext: int = 0):
+        '''Write the tx, reply and done header lines of an IPC message, and the
+        firmware processing time to the firmware log'''
+        primary = msg_type << 24 | low
+        header = f'{primary:#x}|{ext:#x}'
+        # the reply keeps the message target and type, with the response bit set
+        reply = f'{0x20000000 | primary & 0x5f000000:#x}|{ext:#x}'
+        name = IPC_NAMES[msg_type]
+        log_header = 'snd_sof:sof_ipc4_log_header'
+        self.kernel(log_header, f'ipc tx      : {header}: {name}')
+        tx_start = self.now - BPF_TX_LEAD
+        fw_start = self.now
+        self.elapse(30, 400)
+        if self.fw_log is not None:
+            fw_usecs = (self.now - fw_start) // timedelta(microseconds=1) - self.rng.randrange(20)
+            secs = (self.now - self.start).total_seconds() % WRAP_PERIOD
+            self.fw_log.write(f'[{secs:12.6f}] <inf> ipc: ipc_cmd: rx-done\t: {header} in '
+                              f'{fw_usecs} us\n')
+        if self.bpftrace is not None:
+            self.bpftrace.write(f'hda_irq ipc {self.bpf_nsecs(self.now)}\n')
+        self.kernel(log_header, f'ipc tx reply: {reply}: {name}')
+        self.elapse(2, 10)
+        self.kernel(log_header, f'ipc tx done : {header}: {name}')
+        if self.bpftrace is not None:
+            tx_end = self.now + BPF_DONE_LAG
+            self.bpftrace.write(f'ipc_tx {self.bpf_nsecs(tx_start)} '
+                                f'{(tx_end - tx_start) // timedelta(microseconds=1) * 1000}\n')
+        self.elapse(10, 100)
+
+def write_cycle(writer: JournalWriter, noise_ratio: float):
+    # pylint: disable=R0914
+    '''Write one test cycle: create and bind all pipelines, start and stop
+    them, unbind and delete them'''
+    def maybe_noise():
+        if writer.rng.random() < noise_ratio:
+            writer.noise()
+
+    for ppln_id, ppln_inst, core, widgets in GEN_PIPELINES:
+        writer.kernel('snd_sof:sof_ipc4_widget_setup',
+                      f'Create pipeline pipeline.{ppln_id} (pipe {ppln_id}) - '
+                      f'instance {ppln_inst}, core {core}')
+        writer.ipc(GLB_CREATE_PIPELINE, ppln_inst << 16)
+        maybe_noise()
+        for name, module_id, inst in widgets:
+            writer.kernel('snd_sof:sof_ipc4_widget_setup',
+                          f'Create widget {name} (pipe {ppln_id}) - ID {module_id}, '
+                          f'instance {inst}, core {core}')
+            writer.ipc(MOD_INIT_INSTANCE, inst << 16 | module_id)
+            writer.ipc(MOD_LARGE_CONFIG_SET, inst << 16 | module_id)
+            maybe_noise()
+
+    bindings = [((inst << 16 | module_id), (sink_inst << 16 | sink_module_id))
+                for _, _, _, widgets in GEN_PIPELINES
+                for (_, module_id, inst), (_, sink_module_id, sink_inst)
+                in zip(widgets[:-1], widgets[1:])]
+    for src, sink in bindings:
+        writer.ipc(MOD_BIND, src, sink)
+    maybe_noise()
+
+    instances = ' '.join(str(ppln_inst) for _, ppln_inst, _, _ in GEN_PIPELINES)
+    for cmd, states in ((1, (STATE_PAUSED, STATE_RUNNING)), (0, (STATE_PAUSED, STATE_RESET))):
+        writer.kernel('snd_sof_intel_hda_common:hda_dai_trigger',
+                      f'cmd={cmd} dai SSP0 Pin direction 0')
+        writer.kernel('snd_sof:sof_ipc4_trigger_pipelines',
+                      f'pcm0 (Port0), dir 0: cmd: {cmd}, state: {states[-1]}')
+        for state in states:
+            writer.kernel('snd_sof:sof_ipc4_set_multi_pipeline_state',
+                          f'Set pipelines {instances} to state {state}')
+            writer.ipc(GLB_SET_PIPELINE_STATE, state, 1)
+        writer.elapse(1000, 5000)
+
+    for src, sink in bindings:
+        writer.ipc(MOD_UNBIND, src, sink)
+    for _, ppln_inst, _, _ in GEN_PIPELINES:
+        writer.ipc(GLB_DELETE_PIPELINE, ppln_inst << 16)
+    maybe_noise()
+
+def write_journal(path, cycles: int, fw_log_path=None, start: str = '10:00:00',
+                  noise_ratio: float = 0.05, seed: int = 0,
+                  bpftrace_path=None) -> dict[str, int]:
+    # pylint: disable=R0913,R0917
+    '''Write a kernel log with `cycles` test cycles of IPC sequences starting
+    at `start` (HH:MM:SS) wall clock time, the firmware IPC timing log when
+    fw_log_path is given and the bpftrace output when bpftrace_path is
+    given. Return the count of lines written.
+    '''
+    hour, minute, sec = (int(part) for part in start.split(':'))
+    start_time = datetime(2025, 2, 25, hour, minute, sec)
+    with open(path, 'w', encoding='utf8') as f, \
+         open(fw_log_path if fw_log_path is not None else '/dev/null', 'w',
+              encoding='utf8') as fw_log, \
+         open(bpftrace_path if bpftrace_path is not None else '/dev/null', 'w',
+              encoding='utf8') as bpftrace:
+        writer = JournalWriter(f, fw_log if fw_log_path is not None else None,
+                               start_time, seed,
+                               bpftrace if bpftrace_path is not None else None)
+        for _ in range(cycles):
+            write_cycle(writer, noise_ratio)
+    return {'lines': writer.lines}
+
+def parse_args():
+    '''Parse command line arguments'''
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                     description=__doc__)
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator')
+    subparsers = parser.add_subparsers(dest='kind', required=True)
+
+    mtrace = subparsers.add_parser('mtrace', help='Firmware trace for sof_perf_analyzer.py')
+    mtrace.add_argument('filename')
+    mtrace.add_argument('-n', '--lines', type=int, default=1000000,
+                        help='Number of perf trace lines')
+    mtrace.add_argument('-t', '--time-format', choices=['float', 'hms'], default='float',
+                        help='Timestamp format')
+    mtrace.add_argument('--no-wraps', action='store_true', default=False,
+                        help='Do not wrap timestamps like the DSP timer does')
+    mtrace.add_argument('--event-ratio', type=float, default=0.01,
+                        help='Ratio of LL timer, xrun and starvation traces to perf traces')
+    mtrace.add_argument('--other-ratio', type=float, default=0.0,
+                        help='Ratio of traces without a sof_perf_analyzer handler to perf traces')
+    mtrace.add_argument('--corrupt-ratio', type=float, default=0.01,
+                        help='Ratio of corrupt lines to perf traces')
+
+    journal = subparsers.add_parser('journal', help='Kernel log for sof-ipc-timer.py')
+    journal.add_argument('filename')
+    journal.add_argument('-c', '--cycles', type=int, default=1000,
+                         help='Number of create/trigger/delete test cycles')
+    journal.add_argument('--fw-log', required=False,
+                         help='Write the matching firmware IPC timing log to this file')
+    journal.add_argument('--bpftrace', required=False,
+                         help='Write the matching ipc_tx_time.bt and hda_irq_source_deltas.bt\n'
+                         'output to this file')
+    journal.add_argument('--start', default='10:00:00',
+                         help='Wall clock time of the first line, HH:MM:SS')
+    journal.add_argument('--noise-ratio', type=float, default=0.05,
+                         help='Ratio of unrelated kernel messages')
+    return parser.parse_args()
+
+def main():
+    '''The main entry'''
+    args = parse_args()
+    if args.kind == 'mtrace':
+        counts = write_mtrace(args.filename, args.lines, args.time_format,
+                              wraps=not args.no_wraps, event_ratio=args.event_ratio,
+                              corrupt_ratio=args.corrupt_ratio, seed=args.seed,
+                              other_ratio=args.other_ratio)
+    else:
+        counts = write_journal(args.filename, args.cycles, args.fw_log, args.start,
+                               args.noise_ratio, args.seed, args.bpftrace)
+    print(', '.join(f'{kind}: {count}' for kind, count in counts.items()))
+
+if __name__ == "__main__":
+    main()
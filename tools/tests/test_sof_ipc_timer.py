@@ -0,0 +1,78 @@
+'''Tests of tools/sof-ipc-timer.py, run with: python3 -m pytest tools/tests'''
+
+import json
+import os
+import re
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sof_timeline
+import sof_trace_gen
+
+IPC_TIMER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'sof-ipc-timer.py')
+
+def ipc_timer_report(klog) -> str:
+    '''The full report of sof-ipc-timer.py on the kernel log'''
+    return subprocess.run([sys.executable, IPC_TIMER, '-t', '-i', '-c', '-b', '-p', '-s', klog],
+                          check=True, capture_output=True, text=True).stdout
+
+def test_journal_without_function_tags(tmp_path):
+    '''A kernel log of plain 'dyndbg=+p', without the 'snd_sof:<function>:'
+    tags, gives the same report as the tagged one'''
+    tagged = tmp_path / 'tagged.txt'
+    sof_trace_gen.write_journal(tagged, 5, noise_ratio=0.2)
+    untagged = tmp_path / 'untagged.txt'
+    untagged.write_text(re.sub(r'kernel: \w+:\w+: ', 'kernel: ', tagged.read_text()))
+    assert 'snd_sof' not in untagged.read_text()
+
+    report = ipc_timer_report(tagged)
+    assert 'pipes 1 2 3 4: RUNNING' in report
+    assert ipc_timer_report(untagged) == report
+
+def test_waterfall_trigger_phases(tmp_path):
+    '''The IPC messages after a trigger are in the phase of its
+    SNDRV_PCM_TRIGGER_* command, not all of the other commands are "stop"'''
+    klog = tmp_path / 'klog.txt'
+    sof_trace_gen.write_journal(klog, 2)
+    # PAUSE_PUSH (3) instead of STOP (0), and an unknown command (9)
+    klog.write_text(klog.read_text().replace('cmd=0 dai', 'cmd=3 dai')
+                    .replace('cmd: 0,', 'cmd: 3,').replace('cmd=1 dai', 'cmd=9 dai')
+                    .replace('cmd: 1,', 'cmd: 9,'))
+    report = subprocess.run([sys.executable, IPC_TIMER, '--waterfall', tmp_path / 'trace.json',
+                             klog], check=True, capture_output=True, text=True).stdout
+    phases = {line.split('\t')[0] for line in report.splitlines()}
+    assert phases == {'open', 'pause push', 'trigger 9', 'close'}
+
+def test_waterfall_critical_messages(tmp_path):
+    '''The messages dominating a phase are marked critical in the summary
+    and on the critical track of the trace'''
+    klog = tmp_path / 'klog.txt'
+    sof_trace_gen.write_journal(klog, 2)
+    trace = tmp_path / 'trace.json'
+    report = subprocess.run([sys.executable, IPC_TIMER, '--waterfall', trace, klog],
+                            check=True, capture_output=True, text=True).stdout
+    critical = {line.split('\t')[1].strip() for line in report.splitlines()
+                if line.endswith('\tcritical') and line.split('\t')[0] == 'start'}
+    assert critical and all(key.startswith('GLB_SET_PIPELINE_STATE') for key in critical)
+
+    events = [event for event in json.loads(trace.read_text())['traceEvents']
+              if event['ph'] == 'X']
+    marked = {event['name'] for event in events if event['tid'] == 2 and event['args']['critical']}
+    assert marked == {event['name'] for event in events if event['tid'] == 5}
+    assert critical <= marked
+
+def test_timing_stats_without_samples():
+    '''The statistics of timings without the samples are the ones kept from
+    the running sums, without percentiles and histogram'''
+    ipc_timer = sof_timeline.load_ipc_timer()
+    kept, summed = ipc_timer.TimingSamples(), ipc_timer.TimingSamples(keep_samples=False)
+    for usecs in (300, 100, 200):
+        kept.append(usecs)
+        summed.append(usecs)
+    stats = ipc_timer.timing_stats(kept)
+    assert ipc_timer.timing_stats(summed) == \
+        {key: stats[key] for key in ("count", "min", "max", "mean")} == \
+        {"count": 3, "min": 100, "max": 300, "mean": 200}
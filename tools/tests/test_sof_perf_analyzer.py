@@ -0,0 +1,115 @@
+'''Tests of tools/sof_perf_analyzer.py, run with: python3 -m pytest tools/tests'''
+
+import argparse
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sof_perf_analyzer as spa
+
+BANNER = '*** Booting Zephyr OS build v3.7.0 ***\n'
+RUN_TRACES = 8
+
+def perf_line(timestamp: float) -> str:
+    '''A comp_copy perf trace at timestamp'''
+    return (f'[{timestamp:12.6f}] <inf> component: comp_copy: comp:1 0x10004 '
+            'perf comp_copy samples 48 period 1000 cpu avg 400 peak 500\n')
+
+@pytest.fixture(name='trace_file')
+def fixture_trace_file(tmp_path):
+    '''Three firmware runs, each starting with the boot banner. The runs are
+    shorter than 1s, so only the banner tells the runs apart.'''
+    path = tmp_path / 'mtrace.txt'
+    with open(path, 'w', encoding='utf8') as f:
+        for _ in range(3):
+            f.write(BANNER)
+            for i in range(RUN_TRACES):
+                f.write(perf_line(0.1 + i * 0.01))
+    return path
+
+def banner_offsets(path) -> list[int]:
+    '''Byte offsets of the boot banners in path'''
+    offsets, offset = [], 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if line == BANNER.encode():
+                offsets.append(offset)
+            offset += len(line)
+    return offsets
+
+def segments(path, jobs: int) -> list[int]:
+    '''The SEGMENT column of the trace processed with `jobs` workers'''
+    spa.args = argparse.Namespace(filename=path, jobs=jobs, skip_to_first_trace=False)
+    # the serial processing collects to the module globals
+    spa.perf_columns = spa.PerfInfoColumns()
+    spa.trace_events = spa.new_trace_events()
+    spa.process_trace_file()
+    return spa.perf_info['SEGMENT'].tolist()
+
+@pytest.mark.parametrize('after_banner', [False, True])
+def test_parallel_banner_at_chunk_boundary(trace_file, monkeypatch, after_banner):
+    '''A boot banner just before or just after a chunk boundary starts a new
+    segment, like the serial processing does'''
+    serial = segments(trace_file, 1)
+    assert serial == [run for run in range(3) for _ in range(RUN_TRACES)]
+
+    boundary = banner_offsets(trace_file)[1] + (len(BANNER) if after_banner else 0)
+    size = os.path.getsize(trace_file)
+    monkeypatch.setattr(spa, 'split_trace_file',
+                        lambda filename, start, parts: [(start, boundary), (boundary, size)])
+    assert segments(trace_file, 2) == serial
+
+def test_baseline_duplicate_comp_names(tmp_path):
+    '''Components with the same name, e.g. a pipeline re-created with another
+    instance ID, are merged to one row of the COMP_NAME join'''
+    def stats(rows):
+        return pd.DataFrame(rows, columns=['COMP_ID', 'COMP_NAME', 'CPU_AVG(AVG)',
+                                           'CPU_PEAK(AVG)', 'CPU_PEAK(MAX)']).set_index('COMP_ID')
+    baseline = tmp_path / 'baseline.csv'
+    stats([('1-0x10004', 'gain.1.1', 10.0, 20.0, 30.0),
+           ('2-0x20004', 'gain.1.1', 20.0, 30.0, 40.0),
+           ('1-0x4', 'host-copier.0.playback', 5.0, 6.0, 7.0)]).to_csv(baseline)
+    spa.perf_stats = stats([('1-0x10004', 'gain.1.1', 10.0, 20.0, 30.0),
+                            ('3-0x30004', 'gain.1.1', 20.0, 30.0, 50.0),
+                            ('1-0x4', 'host-copier.0.playback', 5.0, 6.0, 7.0)])
+    spa.args = argparse.Namespace(baseline=baseline, regress_threshold=5.0, alpha=0.05)
+
+    result = spa.compare_with_baseline()
+    assert sorted(result.index) == ['gain.1.1', 'host-copier.0.playback']
+    gain = result.loc['gain.1.1']
+    assert gain['CPU_AVG(AVG)_BASE'] == gain['CPU_AVG(AVG)_CURR'] == 15.0
+    assert (gain['CPU_PEAK(MAX)_BASE'], gain['CPU_PEAK(MAX)_CURR']) == (40.0, 50.0)
+    assert not result['REGRESSED'].any()
+
+def test_event_cache_round_trip(tmp_path):
+    '''The event tables loaded from the parsed trace cache are the tables of
+    the trace parsing, including the None COMP_ID of an unparsable message'''
+    trace = tmp_path / 'mtrace.txt'
+    with open(trace, 'w', encoding='utf8') as f:
+        f.write(BANNER)
+        for i in range(RUN_TRACES):
+            f.write(perf_line(0.1 + i * 0.01))
+        f.write('[    0.200000] <err> dai_comp: dai_report_xrun: comp:1 0x10004 '
+                'dai_report_xrun(): underrun due to no data available\n')
+        f.write('[    0.210000] <err> dai_comp: dai_report_xrun: '
+                'dai_report_xrun(): overrun due to no space available\n')
+        f.write('[    0.220000] <inf> ll_schedule: zephyr_domain_thread_fn: '
+                'll core 0 timer avg 2017, max 2139, overruns 0\n')
+    spa.args = argparse.Namespace(filename=trace, jobs=1, skip_to_first_trace=False,
+                                  cache_dir=tmp_path / 'cache', kmsg=None)
+
+    def load():
+        spa.perf_columns = spa.PerfInfoColumns()
+        spa.trace_events = spa.new_trace_events()
+        spa.load_trace_file()
+        return spa.event_info
+
+    cold = load()
+    warm = load()
+    assert cold['XRUN']['COMP_ID'].isna().tolist() == [False, True]
+    for name, table in cold.items():
+        pd.testing.assert_frame_equal(warm[name], table)
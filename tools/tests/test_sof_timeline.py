@@ -0,0 +1,25 @@
+'''Tests of tools/sof_timeline.py, run with: python3 -m pytest tools/tests'''
+
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sof_timeline
+import sof_trace_gen
+
+def test_kernel_log_without_function_tags(tmp_path):
+    '''The IPC messages and SOF debug lines of a kernel log of plain
+    'dyndbg=+p', without the 'snd_sof:<function>:' tags, are the same as
+    of the tagged one'''
+    tagged = tmp_path / 'tagged.txt'
+    sof_trace_gen.write_journal(tagged, 3, noise_ratio=0.2)
+    untagged = tmp_path / 'untagged.txt'
+    untagged.write_text(re.sub(r'kernel: \w+:\w+: ', 'kernel: ', tagged.read_text()))
+
+    events = list(sof_timeline.read_kernel_log(tagged))
+    assert any(isinstance(event, sof_timeline.KernelIpc) for event in events)
+    assert ('sof_ipc4_set_multi_pipeline_state', 'Set pipelines 0 1 2 3 to state 3') in \
+        [event[1:] for event in events if isinstance(event, tuple)]
+    assert list(sof_timeline.read_kernel_log(untagged)) == events
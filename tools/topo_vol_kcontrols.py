@@ -18,7 +18,8 @@ TPLG_FORMAT = TplgBinaryFormat()
 def main():
     "Main"
 
-    parsed_tplg = TPLG_FORMAT.parse_file(sys.argv[1])
+    # only the DAPM widget sections are decoded
+    parsed_tplg = TPLG_FORMAT.parse_file_lazy(sys.argv[1]).sections(TplgType.DAPM_WIDGET)
 
     # pylint: disable=invalid-name
     DAPMs = [
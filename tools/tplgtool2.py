@@ -2,8 +2,11 @@
 
 import argparse
 import construct
+import copyreg
 import enum
+import hashlib
 import os
+import pickle
 import re
 import sys
 import typing
@@ -42,6 +45,29 @@ def CompleteRange(subcon):
             Terminated
         )
 
+def _detach_stream(obj):
+    "Remove the `_io` stream references left by construct, in place, to make parsed data picklable."
+    if isinstance(obj, Container):
+        obj.pop("_io", None)
+        for value in obj.values():
+            _detach_stream(value)
+    elif isinstance(obj, ListContainer):
+        for value in obj:
+            _detach_stream(value)
+    return obj
+
+def tplg_cache_dir() -> typing.Union[str, None]:
+    """Directory of the parsed topology cache, `None` if the cache is disabled.
+
+    The directory is `$SOF_TPLG_CACHE_DIR`, the cache is disabled when it is set to an
+    empty string, it defaults to `$XDG_CACHE_HOME/sof-test/tplg` or `~/.cache/sof-test/tplg`.
+    """
+    cache_dir = os.environ.get("SOF_TPLG_CACHE_DIR")
+    if cache_dir is None:
+        cache_root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(cache_root, "sof-test", "tplg")
+    return cache_dir or None
+
 def get_flags(flagsenum: Container) -> "list[str]":
     "Get flags for FlagsEnum container."
     return [name for (name, value) in flagsenum.items() if value is True and not name.startswith("_")]
@@ -563,26 +589,186 @@ class TplgBinaryFormat:
             TplgType.CODEC_LINK.name: self._link_config,
             TplgType.BACKEND_LINK.name: self._link_config,
         }
-        _section_blocks_cases = dict((k, Array(this.header.count, v)) for (k, v) in self._section_blocks_cases.items())
+        self._section_blocks = dict((k, Array(this.header.count, v)) for (k, v) in self._section_blocks_cases.items())
         self._section = Struct(
             "header" / self._block_header,
             "blocks" / Switch(
                 this.header.type,
-                _section_blocks_cases,
+                self._section_blocks,
                 default = Padding(this.header.payload_size)  # skip unknown blocks,
             ),
         )
         self.sections = CompleteRange(self._section)
 
-    def parse_file(self, filepath) -> ListContainer:
-        "Parse the TPLG binary file to raw structure."
-        with open(os.fspath(filepath), "rb") as fs:
-            return self.sections.parse_stream(fs)
+    _parser_version: typing.Union[str, None] = None
+
+    @staticmethod
+    def parser_version() -> str:
+        "Digest of the parser code and construct version, parsed data cached by other parser versions is stale."
+        if TplgBinaryFormat._parser_version is None:
+            digest = hashlib.blake2b(construct.__version__.encode(), digest_size=16)
+            with open(__file__, "rb") as fs:
+                digest.update(fs.read())
+            TplgBinaryFormat._parser_version = digest.hexdigest()
+        return TplgBinaryFormat._parser_version
+
+    def _cache_key(self, filepath) -> tuple:
+        "The key identifying the parsed content of a TPLG file in the cache."
+        stat = os.stat(filepath)
+        return (self.parser_version(), os.path.realpath(filepath), stat.st_size, stat.st_mtime_ns,
+                self.parse_abi_version(filepath))
+
+    @staticmethod
+    def _cache_path(cache_dir, filepath) -> str:
+        "Cache file of a TPLG file, one cache file per TPLG path."
+        name = hashlib.blake2b(os.path.realpath(filepath).encode(), digest_size=8).hexdigest()
+        return os.path.join(cache_dir, f"{os.path.basename(filepath)}-{name}.pickle")
+
+    @staticmethod
+    def _load_cache(cache, key: tuple) -> typing.Union[ListContainer, None]:
+        """Load parsed data from the cache file, `None` if there is no valid cache for the key.
+
+        Unpickling can run arbitrary code, so only a cache file owned by the current user and
+        not writable by others is loaded, the cache directory may be shared.
+        """
+        try:
+            with open(cache, "rb") as fs:
+                st = os.fstat(fs.fileno())
+                if st.st_uid != os.getuid() or st.st_mode & 0o022:
+                    return None
+                if pickle.load(fs) != key:
+                    return None
+                return pickle.load(fs)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _save_cache(cache, key: tuple, sections: ListContainer):
+        "Store parsed data in the cache file, the cache is best effort and write errors are ignored."
+        tmp = f"{cache}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache), mode=0o700, exist_ok=True)
+            with open(tmp, "wb") as fs:
+                pickler = pickle.Pickler(fs, protocol=pickle.HIGHEST_PROTOCOL)
+                # Container.__setstate__() re-inserts every item in Python, the plain dict items of
+                # the default OrderedDict reduction are restored by the C unpickler several times faster.
+                pickler.dispatch_table = copyreg.dispatch_table.copy()
+                pickler.dispatch_table[Container] = lambda container: (Container, (), None, None, iter(container.items()))
+                pickler.dump(key)
+                # the key is loaded and checked alone, it must not share memo entries with sections
+                pickler.clear_memo()
+                pickler.dump(sections)
+            # replace the cache atomically, so a concurrent reader never sees a partial cache
+            os.replace(tmp, cache)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def parse_file(self, filepath, use_cache: bool = True) -> ListContainer:
+        """Parse the TPLG binary file to raw structure.
+
+        The parsed structure is cached in `tplg_cache_dir()` and loaded from the cache
+        while the file path, size, mtime, ABI version and the parser code are unchanged.
+        """
+        filepath = os.fspath(filepath)
+        cache_dir = tplg_cache_dir() if use_cache else None
+        if cache_dir is not None:
+            key = self._cache_key(filepath)
+            cache = self._cache_path(cache_dir, filepath)
+            sections = self._load_cache(cache, key)
+            if sections is not None:
+                return sections
+        with open(filepath, "rb") as fs:
+            sections = _detach_stream(self.sections.parse_stream(fs))
+        if cache_dir is not None:
+            self._save_cache(cache, key, sections)
+        return sections
+
+    def parse_file_lazy(self, filepath, use_cache: bool = True) -> "LazyTplg":
+        """Index the sections of the TPLG binary file by their headers, without decoding any block.
+
+        The blocks of a section are decoded when the section is first accessed. The parsed
+        structure cached by `parse_file()` is used instead when it is valid, but the lazy
+        parsing never writes the cache.
+        """
+        filepath = os.fspath(filepath)
+        cache_dir = tplg_cache_dir() if use_cache else None
+        if cache_dir is not None:
+            sections = self._load_cache(self._cache_path(cache_dir, filepath), self._cache_key(filepath))
+            if sections is not None:
+                return LazyTplg(self, b"", [(item["header"], 0) for item in sections], sections)
+        with open(filepath, "rb") as fs:
+            data = fs.read()
+        header_size = self._block_header.sizeof()
+        index = []
+        offset = 0
+        while offset < len(data):
+            header = _detach_stream(self._block_header.parse(data[offset:offset + header_size]))
+            offset += header_size
+            if offset + header["payload_size"] > len(data):
+                raise construct.StreamError(f"{header['type']} section at {offset - header_size} "
+                    f"needs {header['payload_size']} payload bytes, only {len(data) - offset} left")
+            index.append((header, offset))
+            offset += header["payload_size"]
+        return LazyTplg(self, data, index)
+
+    def parse_blocks(self, header: Container, payload: bytes) -> typing.Union[ListContainer, None]:
+        "Decode the blocks of a section from its payload, `None` for the block types skipped by the parser."
+        blocks = self._section_blocks.get(header["type"])
+        if blocks is None:
+            return None
+        return _detach_stream(blocks.parse(payload, header=header))
 
     def build(self, data: ListContainer) -> bytes:
         "Build the topology data to byte array."
         return self.sections.build(data)
 
+class LazyTplg:
+    r"""Topology sections indexed by their headers, the blocks are decoded on demand.
+
+    Iterating it gives the same sections as `TplgBinaryFormat.parse_file()`, but
+    `sections()` decodes only the sections of the requested types.
+    """
+
+    def __init__(self, tplg_format: TplgBinaryFormat, data: bytes, index: "list[tuple[Container, int]]",
+                 sections: typing.Union[ListContainer, None] = None):
+        "Index of (header, payload offset in data) of every section, or the already decoded sections."
+        self._format = tplg_format
+        self._data = data
+        self.headers = [header for header, _ in index]
+        self._offsets = [offset for _, offset in index]
+        self._decoded: "dict[int, Container]" = dict(enumerate(sections)) if sections is not None else {}
+
+    def __len__(self):
+        return len(self.headers)
+
+    def __getitem__(self, position: int) -> Container:
+        "Section at the position, decoded on the first access."
+        section = self._decoded.get(position)
+        if section is None:
+            header = self.headers[position]
+            offset = self._offsets[position]
+            section = Container(header=header,
+                blocks=self._format.parse_blocks(header, self._data[offset:offset + header["payload_size"]]))
+            self._decoded[position] = section
+        return section
+
+    def __iter__(self):
+        return (self[position] for position in range(len(self)))
+
+    def sections(self, *tplgtypes: TplgType) -> ListContainer:
+        "Sections of the topology types, in file order."
+        names = [tplgtype.name for tplgtype in tplgtypes]
+        return ListContainer(self[position] for position, header in enumerate(self.headers)
+                             if header["type"] in names)
+
+    def blocks(self, *tplgtypes: TplgType) -> "list[Container]":
+        "Blocks of all the sections of the topology types, in file order."
+        return [block for section in self.sections(*tplgtypes) if section["blocks"] is not None
+                for block in section["blocks"]]
+
 @dataclass(init=False)
 class GroupedTplg:
     "Grouped topology data."
@@ -759,6 +945,53 @@ class GroupedTplg:
         "Check whether this topology uses more than one coreID"
         return len(self.coreids) > 1
 
+class LazyGroupedTplg(GroupedTplg):
+    r"""Grouped topology data of a `LazyTplg`.
+
+    It has the attributes of `GroupedTplg`, each attribute decodes only the sections it
+    is grouped from on its first access, e.g. `print_pcm_info()` only decodes the PCMs.
+    """
+
+    def __init__(self, lazy_tplg: LazyTplg): # pylint: disable=W0231
+        "Group topology blocks by their types on demand."
+        self.lazy_tplg = lazy_tplg
+
+    @cached_property
+    def manifest(self) -> Container:
+        "Manifest info."
+        sections = self.lazy_tplg.sections(TplgType.MANIFEST)
+        if not sections:
+            raise AttributeError("Topology has no manifest.")
+        assert sections[-1]["header"]["count"] == 1, "Manifest should only contains one block."
+        return sections[-1]["blocks"][0]
+
+    @cached_property
+    def pcm_list(self) -> "list[Container]":
+        "PCM data list."
+        return [pcm for section in self.lazy_tplg.sections(TplgType.PCM)
+                for pcm in sorted(section["blocks"], key=lambda pcm: pcm["pcm_id"])]
+
+    @cached_property
+    def widget_list(self) -> "list[Container]":
+        "DAPM widgets list."
+        return self.lazy_tplg.blocks(TplgType.DAPM_WIDGET)
+
+    @cached_property
+    def graph_list(self) -> "list[Container]":
+        "DAPM graph elements list."
+        return self.lazy_tplg.blocks(TplgType.DAPM_GRAPH)
+
+    @cached_property
+    def link_list(self) -> "list[Container]":
+        "DAI/backend links list."
+        return [link for section in self.lazy_tplg.sections(TplgType.DAI_LINK, TplgType.BACKEND_LINK)
+                for link in sorted(section["blocks"], key=lambda link: link["id"])]
+
+    @cached_property
+    def pipeline_widgets(self) -> "list[Container]":
+        "Pipeline widgets list."
+        return [block for block in self.widget_list if block["widget"]["name"].startswith("PIPELINE.")]
+
 class TplgGraph:
     "Topology components graph for drawing and searching components through pipelines."
     # In graph, every node is corresponding to its identifier name,
@@ -1287,6 +1520,8 @@ Enables internal globbing mode: the single positional argument is not a file but
         parser.add_argument('-D', '--directory', type=str, default=".", help="output directory for generated graph")
         parser.add_argument('-F', '--format', type=str, default="png", help="output format for generated graph, defaults to 'png'."
             "check https://graphviz.gitlab.io/_pages/doc/info/output.html for all supported formats")
+        parser.add_argument('--no-cache', action="store_true", help="parse the topology files without the parsed "
+            "topology cache, the cache directory is $SOF_TPLG_CACHE_DIR or defaults to ~/.cache/sof-test/tplg")
         parser.add_argument('-V', '--live_view', action="store_true", help="generate and view topology graph")
         parser.add_argument('-w', '--without_nodeinfo', action="store_true", help="show only widget names, no additional node info ")
         parser.add_argument('-c', '--show_core', choices=['never', 'auto', 'always'], default='auto',
@@ -1356,7 +1591,11 @@ considered different from components that specific core ID 0.
 
         errors = 0
         for f in files:
-            tplg = GroupedTplg(tplgFormat.parse_file(f))
+            if 'graph' in dump_types:
+                tplg = GroupedTplg(tplgFormat.parse_file(f, use_cache=not cmd_args.no_cache))
+            else:
+                # the PCM info only needs the PCM sections
+                tplg = LazyGroupedTplg(tplgFormat.parse_file_lazy(f, use_cache=not cmd_args.no_cache))
             assert set(dump_types) <= set(supported_dump), f"unsupported type in {dump_types}"
             if 'pcm' in dump_types:
                 tplg.print_pcm_info()